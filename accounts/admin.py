@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.translation import gettext_lazy as _
-from .models import User, UserProfile, UserSocialAccount
+from .models import LoginEvent, User, UserProfile, UserSession, UserSocialAccount
+from .sessions import revoke_sessions
 
 class CustomUserAdmin(UserAdmin):
     """
@@ -47,7 +48,44 @@ class UserSocialAccountAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'provider', 'provider_id')
 
 
+class LoginEventAdmin(admin.ModelAdmin):
+    """
+    Admin interface for the LoginEvent model.
+    """
+    list_display = ('user', 'created_at', 'ip_address', 'backend', 'notified_at')
+    list_filter = ('created_at', 'notified_at', 'backend')
+    search_fields = ('user__email', 'ip_address')
+    raw_id_fields = ('user',)
+
+
+class UserSessionAdmin(admin.ModelAdmin):
+    """
+    Admin interface for the UserSession index.
+    """
+    list_display = ('user', 'user_agent', 'device', 'ip_address', 'created_at', 'last_seen')
+    list_filter = ('device', 'last_seen')
+    search_fields = ('user__email', 'ip_address')
+    raw_id_fields = ('user',)
+    exclude = ('session_key',)
+    actions = ['revoke']
+
+    def revoke(self, request, queryset):
+        count = 0
+        for user_id, ids in self.group_by_user(queryset).items():
+            count += revoke_sessions(user_id, ids=ids)
+        self.message_user(request, f"{count} sessions were logged out.")
+    revoke.short_description = "Log out selected sessions"
+
+    def group_by_user(self, queryset):
+        groups = {}
+        for pk, user_id in queryset.values_list('pk', 'user_id'):
+            groups.setdefault(user_id, []).append(pk)
+        return groups
+
+
 # Register the models with their custom admin classes
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(UserProfile, UserProfileAdmin)
-admin.site.register(UserSocialAccount, UserSocialAccountAdmin)
\ No newline at end of file
+admin.site.register(UserSocialAccount, UserSocialAccountAdmin)
+admin.site.register(LoginEvent, LoginEventAdmin)
+admin.site.register(UserSession, UserSessionAdmin)
\ No newline at end of file
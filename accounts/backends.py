@@ -1,24 +1,33 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
 
 User = get_user_model()
 
+
 class EmailBackend(ModelBackend):
     """
-    Custom authentication backend that allows users to log in using their email.
+    Authenticate with either an email address or a username.
+
+    This is the only model backend configured, so a login runs the password
+    hasher exactly once whether or not the account exists.
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            # Try to find a user matching the provided email
-            user = User.objects.get(email=username)
-            if user.check_password(password):
-                return user
-        except User.DoesNotExist:
-            # If no user with the provided email exists, try username as fallback
-            try:
-                user = User.objects.get(username=username)
-                if user.check_password(password):
-                    return user
-            except User.DoesNotExist:
-                return None
-        return None
\ No newline at end of file
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        # One query for both identifiers; an email match wins over a username match
+        candidates = list(User.objects.filter(Q(email__iexact=username) | Q(username=username))[:3])
+        candidates.sort(key=lambda user: (user.email != username, user.email.lower() != username.lower()))
+        user = candidates[0] if candidates else None
+
+        if user is None:
+            # Run the default password hasher once to keep timing close to a real check
+            User().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
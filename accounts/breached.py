@@ -0,0 +1,215 @@
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# File layout, all integers big-endian:
+#   header     MAGIC, format version, key width in bytes, key count
+#   fanout     65536 cumulative key counts, one per leading two bytes
+#              (entry n = number of keys whose first two bytes are <= n)
+#   keys       leading bytes of the SHA-1 of each password, sorted, unique
+MAGIC = b'PWNDSHA1'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>8sHBQ')
+FANOUT = struct.Struct('>65536Q')
+FANOUT_ENTRY = struct.Struct('>Q')
+
+MIN_KEY_WIDTH = 4
+MAX_KEY_WIDTH = hashlib.sha1().digest_size
+
+# Seconds between checks for a replaced index file
+RELOAD_INTERVAL = 60
+
+
+def password_key(password, width):
+    """
+    Return the first ``width`` bytes of the SHA-1 of ``password``.
+    """
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    return hashlib.sha1(password).digest()[:width]
+
+
+def write_index(path, keys, width):
+    """
+    Write sorted ``width``-byte keys to ``path`` in the binary format,
+    dropping repeats. Keys are streamed, so the input can be larger than
+    memory.
+
+    The file is written next to ``path`` and moved into place, so processes
+    that have the old file mapped keep reading a consistent copy.
+    Returns the number of keys written.
+    """
+    if not MIN_KEY_WIDTH <= width <= MAX_KEY_WIDTH:
+        raise ValueError(f'Key width must be between {MIN_KEY_WIDTH} and {MAX_KEY_WIDTH} bytes')
+
+    counts = [0] * 65536
+    count = 0
+    previous = None
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            # Placeholders, filled in once the counts are known
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, width, 0))
+            f.write(bytes(FANOUT.size))
+            for key in keys:
+                if len(key) != width:
+                    raise ValueError(f'Expected {width}-byte keys, got {len(key)} bytes')
+                if previous is not None and key <= previous:
+                    if key == previous:
+                        continue
+                    raise ValueError(f'Keys are not sorted at {key.hex()}')
+                f.write(key)
+                counts[key[0] << 8 | key[1]] += 1
+                count += 1
+                previous = key
+
+            fanout, total = [], 0
+            for n in counts:
+                total += n
+                fanout.append(total)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, width, count))
+            f.write(FANOUT.pack(*fanout))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return count
+
+
+class _Keys:
+    """
+    Sequence view of the keys, for bisect.
+    """
+    def __init__(self, mm, offset, width, count):
+        self.mm = mm
+        self.offset = offset
+        self.width = width
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = self.offset + i * self.width
+        return self.mm[start:start + self.width]
+
+
+class BreachedPasswordIndex:
+    """
+    Read-only, memory-mapped password index written by ``write_index``.
+
+    The fanout table narrows a lookup to the keys sharing its first two
+    bytes (about 7,600 of them in a 500M-key file). As the keys are hashes,
+    they are spread evenly, so the key's position in that bucket can be
+    guessed from its value; the search gallops out from the guess, which
+    keeps it within a page or two. Only the pages that are touched are read
+    from disk, and they are shared between processes.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.mtime = stat.st_mtime
+            if stat.st_size < HEADER.size + FANOUT.size:
+                raise ValueError(f'{path} is not a breached password index')
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.mm.close()
+            raise ValueError(f'{path} is not a breached password index')
+        if (
+            not MIN_KEY_WIDTH <= self.width <= MAX_KEY_WIDTH
+            or stat.st_size != HEADER.size + FANOUT.size + self.count * self.width
+            or FANOUT_ENTRY.unpack_from(self.mm, HEADER.size + FANOUT.size - FANOUT_ENTRY.size)[0] != self.count
+        ):
+            self.mm.close()
+            raise ValueError(f'{path} is truncated or corrupt')
+        if hasattr(mmap, 'MADV_RANDOM'):
+            # Lookups touch a page or two; readahead would read megabytes
+            self.mm.madvise(mmap.MADV_RANDOM)
+        self.keys = _Keys(self.mm, HEADER.size + FANOUT.size, self.width, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def _bucket(self, key):
+        n = key[0] << 8 | key[1]
+        end = FANOUT_ENTRY.unpack_from(self.mm, HEADER.size + n * FANOUT_ENTRY.size)[0]
+        start = FANOUT_ENTRY.unpack_from(self.mm, HEADER.size + (n - 1) * FANOUT_ENTRY.size)[0] if n else 0
+        return start, end
+
+    def __contains__(self, key):
+        start, end = self._bucket(key)
+        if start == end:
+            return False
+        keys = self.keys
+        fraction = int.from_bytes(key[2:], 'big') / (1 << 8 * (self.width - 2))
+        guess = min(start + int(fraction * (end - start)), end - 1)
+
+        # Widen a window around the guess until it brackets the key
+        step = 1
+        if keys[guess] < key:
+            lo, hi = guess + 1, min(guess + step, end)
+            while hi < end and keys[hi] < key:
+                lo = hi + 1
+                step *= 2
+                hi = min(guess + step, end)
+        else:
+            lo, hi = max(guess - step, start), guess
+            while lo > start and keys[lo] >= key:
+                hi = lo
+                step *= 2
+                lo = max(guess - step, start)
+        i = bisect.bisect_left(keys, key, lo, hi)
+        return i < end and keys[i] == key
+
+    def contains_password(self, password):
+        return password_key(password, self.width) in self
+
+
+_index = None
+_checked_at = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Return the index configured by ``BREACHED_PASSWORDS_INDEX``, or None if
+    there is none or it can't be read. A replaced file is picked up within
+    RELOAD_INTERVAL seconds.
+    """
+    global _index, _checked_at
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < RELOAD_INTERVAL:
+        return _index
+    with _index_lock:
+        if _checked_at is not None and now - _checked_at < RELOAD_INTERVAL:
+            return _index
+        path = getattr(settings, 'BREACHED_PASSWORDS_INDEX', None)
+        try:
+            mtime = os.stat(path).st_mtime if path else None
+        except OSError:
+            mtime = None
+        if mtime is None:
+            _index = None
+        elif _index is None or _index.path != path or _index.mtime != mtime:
+            # The old mapping is left for the garbage collector; a lookup may
+            # still be using it on another thread
+            try:
+                _index = BreachedPasswordIndex(path)
+            except (OSError, ValueError, struct.error):
+                # Checked again after RELOAD_INTERVAL; validation falls back
+                # to the common password list meanwhile
+                logger.exception('Could not open the breached password index %s', path)
+                _index = None
+        _checked_at = now
+        return _index
@@ -0,0 +1,293 @@
+import csv
+import datetime
+import json
+from django.apps import apps
+from django.contrib.auth.hashers import identify_hasher, is_password_usable, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from twofactor.models import UserTwoFactorSettings
+from .models import User, UserProfile
+
+FORMATS = ('csv', 'ndjson')
+
+# Columns read on import and written on export, in order
+USER_FIELDS = ['email', 'username', 'first_name', 'last_name', 'is_active', 'is_email_verified', 'date_joined']
+PROFILE_FIELDS = ['bio', 'location', 'date_of_birth', 'login_notifications']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f', ''}
+
+
+def guess_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'csv' if path.endswith('.csv') else 'ndjson'
+
+
+def read_rows(f, fmt):
+    """
+    Yield (line number, row dict or None, error or None) from a CSV file
+    with a header row or from newline-delimited JSON objects.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, 'More values than header columns'
+            else:
+                yield reader.line_num, row, None
+        return
+    for line, text in enumerate(f, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as e:
+            yield line, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line, None, 'Expected a JSON object'
+        else:
+            yield line, row, None
+
+
+def _text(row, field, max_length=None):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if max_length and len(value) > max_length:
+        raise ValidationError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def _boolean(row, field, default):
+    value = row.get(field)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError(f'{field} is not a boolean: {value!r}')
+
+
+def _parse(parser, value):
+    # Well formed but impossible values (month 13) raise instead of returning None
+    try:
+        return parser(str(value).strip())
+    except ValueError:
+        return None
+
+
+def clean_row(row, defaults):
+    """
+    Validate one input row. Returns (User, UserProfile) instances that are
+    not saved yet; raises ValidationError.
+    """
+    email = User.objects.normalize_email(_text(row, 'email', 254))
+    if not email:
+        raise ValidationError('email is required')
+    validate_email(email)
+
+    username = _text(row, 'username', 150) or None
+    if username:
+        User._meta.get_field('username').run_validators(username)
+
+    date_joined = row.get('date_joined')
+    if date_joined:
+        date_joined = _parse(parse_datetime, date_joined)
+        if date_joined is None:
+            raise ValidationError('date_joined is not an ISO 8601 date and time')
+        if timezone.is_naive(date_joined):
+            date_joined = timezone.make_aware(date_joined, datetime.timezone.utc)
+
+    # Only hashes are accepted; hashing a raw password per row is the slow
+    # path this import avoids, and plain text passwords don't belong in files
+    password = _text(row, 'password')
+    if password and is_password_usable(password):
+        try:
+            identify_hasher(password)
+        except ValueError:
+            raise ValidationError('password must be an encoded hash, not a raw password')
+    elif not password:
+        password = defaults['unusable_password']
+
+    date_of_birth = row.get('date_of_birth')
+    if date_of_birth:
+        date_of_birth = _parse(parse_date, date_of_birth)
+        if date_of_birth is None:
+            raise ValidationError('date_of_birth is not an ISO 8601 date')
+
+    user = User(
+        email=email,
+        username=username,
+        first_name=_text(row, 'first_name', 150),
+        last_name=_text(row, 'last_name', 150),
+        password=password,
+        is_active=_boolean(row, 'is_active', True),
+        is_email_verified=_boolean(row, 'is_email_verified', defaults['is_email_verified']),
+        date_joined=date_joined or timezone.now(),
+    )
+    profile = UserProfile(
+        bio=_text(row, 'bio') or None,
+        location=_text(row, 'location', 100) or None,
+        date_of_birth=date_of_birth or None,
+        login_notifications=_boolean(row, 'login_notifications', True),
+    )
+    return user, profile
+
+
+def get_wallet_model():
+    # The staking app is optional for the accounts app
+    if apps.is_installed('staking'):
+        return apps.get_model('staking', 'AssetWallet')
+    return None
+
+
+def _insert(pairs, create_wallets):
+    """
+    Insert users and the rows their signals would have created, with one
+    bulk insert per table.
+    """
+    users = User.objects.bulk_create([user for user, _ in pairs])
+    if users and users[0].pk is None:
+        # Backends that can't return ids from a bulk insert
+        ids = dict(User.objects.filter(email__in=[user.email for user in users]).values_list('email', 'id'))
+        for user in users:
+            user.pk = ids[user.email]
+    for user, profile in pairs:
+        profile.user = user
+    UserProfile.objects.bulk_create([profile for _, profile in pairs])
+    UserTwoFactorSettings.objects.bulk_create([UserTwoFactorSettings(user=user) for user in users])
+    wallet_model = get_wallet_model() if create_wallets else None
+    if wallet_model is not None:
+        asset_types = [choice[0] for choice in wallet_model.ASSET_CHOICES]
+        wallet_model.objects.bulk_create([
+            wallet_model(user=user, asset_type=asset_type) for user in users for asset_type in asset_types
+        ])
+
+
+def import_chunk(rows, defaults, create_wallets=True, dry_run=False):
+    """
+    Validate and insert a chunk of (line, row) pairs in one transaction.
+
+    Returns (rows created, [(line, error)]). Rows that fail validation or
+    clash with existing accounts are reported and skipped; the rest of the
+    chunk is still imported.
+    """
+    errors = []
+    valid = []
+    for line, row in rows:
+        try:
+            user, profile = clean_row(row, defaults)
+        except ValidationError as e:
+            errors.append((line, '; '.join(e.messages)))
+        else:
+            valid.append((line, user, profile))
+
+    # Duplicates within the chunk; emails compare case-insensitively like at login
+    seen_emails, seen_usernames, unique = set(), set(), []
+    for line, user, profile in valid:
+        email_key = user.email.upper()
+        if email_key in seen_emails:
+            errors.append((line, f'Duplicate email {user.email} in this file'))
+        elif user.username and user.username in seen_usernames:
+            errors.append((line, f'Duplicate username {user.username} in this file'))
+        else:
+            seen_emails.add(email_key)
+            if user.username:
+                seen_usernames.add(user.username)
+            unique.append((line, user, profile))
+
+    existing_emails = set(
+        User.objects.annotate(email_upper=Upper('email'))
+        .filter(email_upper__in=seen_emails).values_list('email_upper', flat=True)
+    ) if seen_emails else set()
+    existing_usernames = set(
+        User.objects.filter(username__in=seen_usernames).values_list('username', flat=True)
+    ) if seen_usernames else set()
+    new = []
+    for line, user, profile in unique:
+        if user.email.upper() in existing_emails:
+            errors.append((line, f'A user with email {user.email} already exists'))
+        elif user.username and user.username in existing_usernames:
+            errors.append((line, f'A user with username {user.username} already exists'))
+        else:
+            new.append((line, user, profile))
+
+    if dry_run or not new:
+        return len(new), errors
+    try:
+        with transaction.atomic():
+            _insert([(user, profile) for _, user, profile in new], create_wallets)
+        return len(new), errors
+    except IntegrityError:
+        pass
+
+    # Someone created a clashing account meanwhile; find the rows one by one
+    created = 0
+    for line, user, profile in new:
+        user.pk = None
+        try:
+            with transaction.atomic():
+                _insert([(user, profile)], create_wallets)
+        except IntegrityError as e:
+            errors.append((line, f'Could not be created: {e}'))
+        else:
+            created += 1
+    return created, errors
+
+
+def import_defaults(verified=False):
+    return {
+        'is_email_verified': verified,
+        # One unusable hash for every row without a password
+        'unusable_password': make_password(None),
+    }
+
+
+def export_values(queryset, with_password=False):
+    """
+    Yield one dict per user with the USER_FIELDS and PROFILE_FIELDS columns,
+    streamed from the database without caching model instances.
+    """
+    columns = USER_FIELDS + [f'profile__{field}' for field in PROFILE_FIELDS]
+    if with_password:
+        columns.append('password')
+    for values in queryset.order_by('pk').values(*columns).iterator(chunk_size=2000):
+        yield {column.removeprefix('profile__'): value for column, value in values.items()}
+
+
+def export_columns(with_password=False):
+    return USER_FIELDS + PROFILE_FIELDS + (['password'] if with_password else [])
+
+
+def _serialize(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+class RowWriter:
+    """
+    Write export rows to a text stream as CSV (with a header) or NDJSON.
+    """
+    def __init__(self, f, fmt, columns):
+        self.f = f
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(f, fieldnames=columns)
+            self.writer.writeheader()
+
+    def write(self, row):
+        row = {column: _serialize(value) for column, value in row.items()}
+        if self.fmt == 'csv':
+            self.writer.writerow({column: '' if value is None else value for column, value in row.items()})
+        else:
+            self.f.write(json.dumps(row, separators=(',', ':')) + '\n')
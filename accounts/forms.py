@@ -173,12 +173,15 @@ class ProfileUpdateForm(forms.ModelForm):
     
     class Meta:
         model = UserProfile
-        fields = ('avatar', 'bio', 'location', 'date_of_birth')
+        fields = ('avatar', 'bio', 'location', 'date_of_birth', 'login_notifications')
         widgets = {
             'avatar': TailwindFileInput(),
             'bio': TailwindTextarea(),
             'location': TailwindTextInput(),
             'date_of_birth': TailwindDateInput(),
+            'login_notifications': forms.CheckboxInput(attrs={
+                'class': 'h-4 w-4 rounded border-secondary-300 text-blue-600 focus:ring-blue-500',
+            }),
         }
     
     def __init__(self, *args, **kwargs):
@@ -0,0 +1,215 @@
+import bisect
+import functools
+import ipaddress
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# File layout, all integers big-endian:
+#   header     MAGIC, format version, range count, location count
+#   ranges     (start, end, location index) per range, sorted by start;
+#              addresses are 128-bit, IPv4 is stored IPv6-mapped (::ffff:a.b.c.d)
+#   offsets    location count + 1 offsets into the strings section
+#   strings    UTF-8 location labels
+MAGIC = b'GEOIPRNG'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>8sHII')
+RANGE = struct.Struct('>16s16sI')
+OFFSET = struct.Struct('>I')
+
+# Seconds between checks for a replaced database file
+RELOAD_INTERVAL = 60
+
+LOOKUP_CACHE_SIZE = 65536
+
+# One in-memory start key per block of ranges narrows each search to a block
+INDEX_STRIDE = 64
+
+IPV4_MAPPED_PREFIX = bytes(10) + b'\xff\xff'
+
+
+def ip_key(value):
+    """
+    Return the 16-byte sort key of an IPv4 or IPv6 address.
+    """
+    value = str(value)
+    try:
+        return IPV4_MAPPED_PREFIX + socket.inet_pton(socket.AF_INET, value)
+    except OSError:
+        pass
+    try:
+        return socket.inet_pton(socket.AF_INET6, value)
+    except OSError:
+        raise ValueError(f"'{value}' is not a valid IP address")
+
+
+def write_database(path, ranges):
+    """
+    Write (start_key, end_key, label) ranges to ``path`` in the binary format.
+
+    The file is written next to ``path`` and moved into place, so processes
+    that have the old file mapped keep reading a consistent copy.
+    Returns the number of ranges written.
+    """
+    ranges = sorted(ranges)
+    labels = {}
+    for _, _, label in ranges:
+        labels.setdefault(label, len(labels))
+
+    encoded = [label.encode('utf-8') for label in labels]
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(ranges), len(encoded)))
+            previous_end = None
+            for start, end, label in ranges:
+                if start > end:
+                    raise ValueError(f'Range starts after it ends: {ipaddress.ip_address(start)}')
+                if previous_end is not None and start <= previous_end:
+                    raise ValueError(f'Overlapping range at {ipaddress.ip_address(start)}')
+                previous_end = end
+                f.write(RANGE.pack(start, end, labels[label]))
+            offset = 0
+            for value in encoded:
+                f.write(OFFSET.pack(offset))
+                offset += len(value)
+            f.write(OFFSET.pack(offset))
+            for value in encoded:
+                f.write(value)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return len(ranges)
+
+
+class _RangeStarts:
+    """
+    Sequence view of the range start keys, for bisect.
+    """
+    def __init__(self, mm, count):
+        self.mm = mm
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        offset = HEADER.size + i * RANGE.size
+        return self.mm[offset:offset + 16]
+
+
+class GeoIPDatabase:
+    """
+    Read-only, memory-mapped range database written by ``write_database``.
+
+    Lookups binary-search a small in-memory index of block start keys, then
+    the block's ranges in place. Only the pages that are touched are read
+    from disk, and they are shared between processes.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.mtime = stat.st_mtime
+            if stat.st_size < HEADER.size:
+                raise ValueError(f'{path} is not a GeoIP range database')
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.range_count, self.location_count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.mm.close()
+            raise ValueError(f'{path} is not a GeoIP range database')
+        self.offsets_at = HEADER.size + self.range_count * RANGE.size
+        self.strings_at = self.offsets_at + (self.location_count + 1) * OFFSET.size
+        if (
+            stat.st_size < self.strings_at
+            or stat.st_size != self.strings_at + OFFSET.unpack_from(self.mm, self.strings_at - OFFSET.size)[0]
+        ):
+            self.mm.close()
+            raise ValueError(f'{path} is truncated or corrupt')
+        self.starts = _RangeStarts(self.mm, self.range_count)
+        self.sparse_index = [self.starts[i] for i in range(0, self.range_count, INDEX_STRIDE)]
+
+    def location(self, index):
+        start, end = struct.unpack_from('>II', self.mm, self.offsets_at + index * OFFSET.size)
+        return self.mm[self.strings_at + start:self.strings_at + end].decode('utf-8')
+
+    def lookup(self, key):
+        """
+        Return the location label of the range containing ``key``, or None.
+        """
+        block = bisect.bisect_right(self.sparse_index, key) - 1
+        if block < 0:
+            return None
+        lo = block * INDEX_STRIDE
+        i = bisect.bisect_right(self.starts, key, lo, min(lo + INDEX_STRIDE, self.range_count)) - 1
+        _, end, location = RANGE.unpack_from(self.mm, HEADER.size + i * RANGE.size)
+        if key > end:
+            return None
+        return self.location(location)
+
+
+_database = None
+_checked_at = None
+_database_lock = threading.Lock()
+
+
+def get_database():
+    """
+    Return the database configured by ``GEOIP_DATABASE``, or None if there is
+    none or it can't be read. A replaced file is picked up within
+    RELOAD_INTERVAL seconds.
+    """
+    global _database, _checked_at
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < RELOAD_INTERVAL:
+        return _database
+    with _database_lock:
+        if _checked_at is not None and now - _checked_at < RELOAD_INTERVAL:
+            return _database
+        path = getattr(settings, 'GEOIP_DATABASE', None)
+        try:
+            mtime = os.stat(path).st_mtime if path else None
+        except OSError:
+            mtime = None
+        if mtime is None:
+            _database = None
+        elif _database is None or _database.path != path or _database.mtime != mtime:
+            # The old mapping is left for the garbage collector; a lookup may
+            # still be using it on another thread
+            try:
+                _database = GeoIPDatabase(path)
+            except (OSError, ValueError, struct.error):
+                # Treated like a missing file until it is replaced
+                logger.exception('Could not open the GeoIP database %s', path)
+                _database = None
+            _lookup.cache_clear()
+        _checked_at = now
+        return _database
+
+
+@functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+def _lookup(database, ip):
+    try:
+        key = ip_key(ip)
+    except ValueError:
+        return None
+    return database.lookup(key)
+
+
+def lookup_location(ip):
+    """
+    Return a location label such as 'Lagos, Lagos, NG' for an IP address,
+    or None if it is unknown or no database is installed.
+    """
+    database = get_database() if ip else None
+    if database is None:
+        return None
+    return _lookup(database, ip)
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+def get_hashing_policy():
+    return getattr(settings, 'PASSWORD_HASHING', {})
+
+
+class PolicyHasherMixin:
+    """
+    Read the hasher's cost parameters from ``settings.PASSWORD_HASHING``.
+
+    Keyword arguments override the policy, which is how benchmark_hashers
+    builds candidates. The algorithm name is unchanged, so existing hashes
+    keep verifying and ``must_update`` rehashes them to the configured cost
+    (up or down) on the next successful login.
+    """
+    # hasher attribute -> PASSWORD_HASHING key
+    cost_settings = {}
+
+    def __init__(self, **cost):
+        policy = get_hashing_policy()
+        for attr, key in self.cost_settings.items():
+            setattr(self, attr, cost.get(attr, policy.get(key, getattr(type(self), attr))))
+
+    def cost(self):
+        return {attr: getattr(self, attr) for attr in self.cost_settings}
+
+
+class PBKDF2PasswordHasher(PolicyHasherMixin, hashers.PBKDF2PasswordHasher):
+    cost_settings = {'iterations': 'PBKDF2_ITERATIONS'}
+
+
+class ScryptPasswordHasher(PolicyHasherMixin, hashers.ScryptPasswordHasher):
+    cost_settings = {
+        'work_factor': 'SCRYPT_WORK_FACTOR',
+        'block_size': 'SCRYPT_BLOCK_SIZE',
+        'parallelism': 'SCRYPT_PARALLELISM',
+    }
+
+    def __init__(self, **cost):
+        super().__init__(**cost)
+        # hashlib.scrypt refuses to run past maxmem; size it for the configured cost
+        self.maxmem = max(self.maxmem, 256 * self.work_factor * self.block_size)
+
+
+class Argon2PasswordHasher(PolicyHasherMixin, hashers.Argon2PasswordHasher):
+    cost_settings = {
+        'time_cost': 'ARGON2_TIME_COST',
+        'memory_cost': 'ARGON2_MEMORY_COST',
+        'parallelism': 'ARGON2_PARALLELISM',
+    }
+
+
+# Hashers configurable through PASSWORD_HASHING['ALGORITHM']
+POLICY_HASHERS = {
+    PBKDF2PasswordHasher.algorithm: PBKDF2PasswordHasher,
+    ScryptPasswordHasher.algorithm: ScryptPasswordHasher,
+    Argon2PasswordHasher.algorithm: Argon2PasswordHasher,
+}
+
+
+@receiver(setting_changed)
+def reset_hashers(*, setting, **kwargs):
+    # Hasher instances are cached by Django and read the policy once
+    if setting == 'PASSWORD_HASHING':
+        hashers.get_hashers.cache_clear()
+        hashers.get_hashers_by_algorithm.cache_clear()
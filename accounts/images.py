@@ -0,0 +1,217 @@
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+# Refuse anything larger before decoding a single pixel
+MAX_IMAGE_PIXELS = 40_000_000
+
+# Longest side of the cleaned original kept in the ImageField
+MASTER_SIZE = 2048
+
+# Square avatar crops and cover widths, in pixels
+AVATAR_SIZES = (64, 128, 256)
+COVER_WIDTHS = (600, 1200)
+
+# ImageField -> JSONField holding its {size: path} renditions
+IMAGE_FIELDS = {
+    'avatar': 'avatar_renditions',
+    'cover_photo': 'cover_renditions',
+}
+
+OUTPUT_OPTIONS = {
+    'WEBP': {'quality': 80, 'method': 4},
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def validate_profile_image(upload):
+    """
+    Check an upload is a supported image of sane dimensions by reading its
+    header only. Raises ValidationError.
+    """
+    try:
+        with Image.open(upload) as img:
+            image_format, (width, height) = img.format, img.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('Upload a valid image file (JPG, PNG, GIF or WebP).')
+    finally:
+        upload.seek(0)
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError('Upload a valid image file (JPG, PNG, GIF or WebP).')
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValidationError('This image is too large.')
+
+
+def set_profile_image(profile, field, upload):
+    """
+    Validate and assign a new upload to a profile image field. Returns False
+    if the upload is the file already in place, which needs no processing.
+
+    The previous renditions are dropped so pages show the new image right
+    away; their files are deleted once the change is committed.
+    """
+    digest = getattr(upload, 'sha256', None)
+    if digest and digest == getattr(profile, f'{field}_sha256') and getattr(profile, field):
+        return False
+    validate_profile_image(upload)
+    stale = list((getattr(profile, IMAGE_FIELDS[field]) or {}).values())
+    setattr(profile, field, upload)
+    setattr(profile, IMAGE_FIELDS[field], {})
+    setattr(profile, f'{field}_sha256', digest or '')
+    if stale:
+        transaction.on_commit(lambda: [default_storage.delete(name) for name in stale])
+    return True
+
+
+def get_output_format():
+    return getattr(settings, 'PROFILE_IMAGE_FORMAT', 'WEBP').upper()
+
+
+def _decode(name, max_side):
+    """
+    Decode a stored image once, upright and without metadata.
+    """
+    with default_storage.open(name, 'rb') as f:
+        img = Image.open(f)
+        if img.width * img.height > MAX_IMAGE_PIXELS:
+            raise ValidationError('This image is too large.')
+        # Let the JPEG decoder scale down by up to 8x instead of decoding every pixel
+        img.draft('RGB', (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    # Re-encoding drops EXIF (GPS, camera serials) and every other chunk
+    return img.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _encode(img, image_format):
+    if image_format == 'JPEG' and img.mode == 'RGBA':
+        img = img.convert('RGB')
+    buffer = io.BytesIO()
+    img.save(buffer, image_format, **OUTPUT_OPTIONS.get(image_format, {}))
+    return buffer.getvalue()
+
+
+def _save(directory, suffix, data, extension):
+    """
+    Store bytes under a content-hashed name; identical output is written once.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    name = f'{directory}/{digest}{suffix}.{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def _renditions(field, img):
+    """
+    Yield (size, image) pairs: square avatar crops, or covers scaled to each
+    width without upscaling.
+    """
+    if field == 'avatar':
+        for size in AVATAR_SIZES:
+            yield size, ImageOps.fit(img, (size, size), Image.LANCZOS)
+        return
+    for width in COVER_WIDTHS:
+        if width >= img.width:
+            yield img.width, img
+            return
+        yield width, img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+
+
+def process_profile_image(profile_id, field):
+    """
+    Replace a profile's uploaded image with a cleaned master and record its
+    renditions, all built from a single decode.
+
+    The row is only updated if the field still holds the file that was
+    processed, so a newer upload is never overwritten by an older job.
+    """
+    profile = UserProfile.objects.filter(pk=profile_id).values(field, IMAGE_FIELDS[field]).first()
+    if not profile or not profile[field]:
+        return
+    source = profile[field]
+    old_renditions = profile[IMAGE_FIELDS[field]] or {}
+
+    image_format = get_output_format()
+    extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+    # Per-profile directory: files are deleted when replaced, so never share them
+    upload_to = UserProfile._meta.get_field(field).upload_to.rstrip('/')
+    directory = f'{upload_to}/r/{profile_id}'
+
+    img = _decode(source, MASTER_SIZE)
+    if max(img.size) > MASTER_SIZE:
+        img.thumbnail((MASTER_SIZE, MASTER_SIZE), Image.LANCZOS)
+    master = _save(directory, '', _encode(img, image_format), extension)
+    renditions = {
+        str(size): _save(directory, f'-{size}', _encode(rendition, image_format), extension)
+        for size, rendition in _renditions(field, img)
+    }
+
+    updated = UserProfile.objects.filter(pk=profile_id, **{field: source}).update(
+        **{field: master, IMAGE_FIELDS[field]: renditions},
+    )
+    if not updated:
+        return
+    stale = {source} | set(old_renditions.values())
+    for name in stale - set(renditions.values()) - {master}:
+        default_storage.delete(name)
+
+
+def process_profile_images(profile_id, fields):
+    """
+    Worker entry point: process several fields, logging failures.
+    """
+    try:
+        for field in fields:
+            try:
+                process_profile_image(profile_id, field)
+            except Exception:
+                logger.exception('Could not process %s of profile %s', field, profile_id)
+    finally:
+        # Connections are per thread; don't leave this one open in the pool
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PROFILE_IMAGE_WORKERS', 2),
+                    thread_name_prefix='profile-images',
+                )
+    return _executor
+
+
+def schedule_profile_images(profile, fields):
+    """
+    Process the given image fields of a profile once the current transaction
+    commits. With PROFILE_IMAGE_WORKERS = 0 the work runs inline.
+    """
+    fields = list(fields)
+
+    def submit():
+        if getattr(settings, 'PROFILE_IMAGE_WORKERS', 2) <= 0:
+            for field in fields:
+                process_profile_image(profile.pk, field)
+        else:
+            get_executor().submit(process_profile_images, profile.pk, fields)
+    transaction.on_commit(submit)
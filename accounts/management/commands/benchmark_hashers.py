@@ -0,0 +1,85 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from accounts.hashers import POLICY_HASHERS
+
+# Password of a typical length; the cost of every hasher here is independent of it
+SAMPLE_PASSWORD = 'correct-horse-battery'
+
+
+def _run_hasher(algorithm, cost, duration):
+    """
+    Hash SAMPLE_PASSWORD for ``duration`` seconds; return (hashes, seconds).
+    """
+    hasher = POLICY_HASHERS[algorithm](**cost)
+    hasher.encode(SAMPLE_PASSWORD, hasher.salt())  # warm up, loads argon2 if needed
+    count = 0
+    started = time.perf_counter()
+    while True:
+        hasher.encode(SAMPLE_PASSWORD, hasher.salt())
+        count += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= duration:
+            return count, elapsed
+
+
+def _parse_cost(algorithm, value):
+    """
+    Parse 'attr=value,attr=value' into cost overrides for ``algorithm``.
+    """
+    allowed = POLICY_HASHERS[algorithm].cost_settings
+    cost = {}
+    for item in filter(None, value.split(',')):
+        attr, _, number = item.partition('=')
+        if attr not in allowed or not number.isdigit():
+            raise CommandError(f"Invalid cost '{item}' for {algorithm}; expected one of {', '.join(allowed)}")
+        cost[attr] = int(number)
+    return cost
+
+
+class Command(BaseCommand):
+    help = 'Measure password hashes per second per core for candidate hashers and costs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--candidate', action='append', metavar='ALGORITHM[:attr=value,...]',
+            help='Hasher to measure, e.g. pbkdf2_sha256:iterations=600000 or '
+                 'argon2:time_cost=3,memory_cost=65536 (repeatable; default: every '
+                 'algorithm at the configured cost)',
+        )
+        parser.add_argument('--duration', type=float, default=2.0, help='Seconds to hash per candidate and core')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Cores to run in parallel')
+
+    def handle(self, *args, **options):
+        candidates = []
+        for spec in options['candidate'] or POLICY_HASHERS:
+            algorithm, _, cost = spec.partition(':')
+            if algorithm not in POLICY_HASHERS:
+                raise CommandError(f"Unknown algorithm '{algorithm}'; choose from {', '.join(POLICY_HASHERS)}")
+            candidates.append((algorithm, _parse_cost(algorithm, cost)))
+
+        workers = max(options['workers'], 1)
+        self.stdout.write(f'{workers} worker(s), {options["duration"]:.1f}s per candidate\n')
+        self.stdout.write(f'{"candidate":<58} {"ms/hash":>9} {"hashes/s/core":>14} {"hashes/s total":>15}')
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for algorithm, cost in candidates:
+                full_cost = POLICY_HASHERS[algorithm](**cost).cost()
+                label = f"{algorithm} {' '.join(f'{k}={v}' for k, v in full_cost.items())}"
+                futures = [pool.submit(_run_hasher, algorithm, full_cost, options['duration']) for _ in range(workers)]
+                try:
+                    results = [future.result() for future in futures]
+                except (ValueError, MemoryError) as e:
+                    self.stderr.write(f'{label:<58} failed: {e}')
+                    continue
+
+                per_core = sum(count / elapsed for count, elapsed in results) / workers
+                self.stdout.write(
+                    f'{label:<58} {1000 / per_core:>9.1f} {per_core:>14.1f} {per_core * workers:>15.1f}'
+                )
+
+        self.stdout.write(
+            '\nLogin latency grows with ms/hash; a login node can serve at most '
+            '"hashes/s total" password checks per second.'
+        )
@@ -0,0 +1,94 @@
+import time
+from contextlib import contextmanager
+from django.contrib.auth import authenticate, login
+from django.contrib.auth.hashers import get_hashers
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from accounts.forms import LoginForm
+from accounts.models import User
+
+SAMPLE_EMAIL = 'benchmark-login@example.invalid'
+SAMPLE_PASSWORD = 'correct-horse-battery'
+
+
+@contextmanager
+def count_hasher_calls():
+    """
+    Count encode() and verify() calls on the configured hashers. verify()
+    calling encode() internally is one password hash, not two.
+    """
+    calls = {'count': 0, 'depth': 0}
+
+    def counting(method):
+        def wrapper(*args, **kwargs):
+            if not calls['depth']:
+                calls['count'] += 1
+            calls['depth'] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                calls['depth'] -= 1
+        return wrapper
+
+    hashers = get_hashers()
+    for hasher in hashers:
+        hasher.encode = counting(hasher.encode)
+        hasher.verify = counting(hasher.verify)
+    try:
+        yield calls
+    finally:
+        for hasher in hashers:
+            del hasher.encode
+            del hasher.verify
+
+
+def previous_login(request):
+    # What login_view used to do: the form authenticates, then again by hand
+    form = LoginForm(request, data=request.POST)
+    if form.is_valid():
+        user = authenticate(request, username=form.cleaned_data['username'], password=form.cleaned_data['password'])
+        login(request, user)
+
+
+def current_login(request):
+    form = LoginForm(request, data=request.POST)
+    if form.is_valid():
+        user = form.get_user()
+        login(request, user, backend=user.backend)
+
+
+class Command(BaseCommand):
+    help = 'Compare password hasher calls and wall time per login for the old and new login flow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='Logins to time per flow')
+
+    def handle(self, *args, **options):
+        if options['logins'] < 1:
+            raise CommandError('--logins must be at least 1.')
+        factory = RequestFactory()
+
+        def make_request():
+            request = factory.post('/accounts/login/', {'username': SAMPLE_EMAIL, 'password': SAMPLE_PASSWORD})
+            SessionMiddleware(lambda request: None).process_request(request)
+            return request
+
+        # Everything written here (the user, sessions) is rolled back
+        with transaction.atomic():
+            User.objects.filter(email=SAMPLE_EMAIL).delete()
+            User.objects.create_user(email=SAMPLE_EMAIL, password=SAMPLE_PASSWORD, is_email_verified=True)
+            current_login(make_request())  # warm up
+
+            for label, flow in (('before', previous_login), ('after', current_login)):
+                with count_hasher_calls() as calls:
+                    started = time.perf_counter()
+                    for _ in range(options['logins']):
+                        flow(make_request())
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label:<7} {calls['count'] / options['logins']:.1f} hasher calls/login "
+                    f"{elapsed / options['logins'] * 1000:>8.1f} ms/login"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,84 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from accounts.useragents import parse_user_agent
+
+# Real-world User-Agent strings across browsers, platforms and crawlers
+SAMPLE_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.2478.67',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 OPR/109.0.0.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 6.1; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Safari/605.1.15',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14.4; rv:125.0) Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (X11; CrOS x86_64 14541.0.0) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 16_7_7 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/124.0.6367.88 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) FxiOS/125.0 Mobile/15E148 Safari/605.1.15',
+    'Mozilla/5.0 (iPad; CPU OS 17_4_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) SamsungBrowser/24.0 Chrome/117.0.0.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.6367.82 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 13; SM-X700) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Android 14; Mobile; rv:125.0) Gecko/125.0 Firefox/125.0',
+    'Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36 EdgA/124.0.2478.64',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+    'python-requests/2.31.0',
+    'curl/8.4.0',
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare cached and uncached User-Agent parsing throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Corpus with one User-Agent per line (default: built-in sample)')
+        parser.add_argument('--requests', type=int, default=200000, help='Lookups to simulate')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the request mix')
+
+    def handle(self, *args, **options):
+        corpus = SAMPLE_USER_AGENTS
+        if options['file']:
+            try:
+                with open(options['file'], encoding='utf-8') as f:
+                    corpus = [line.strip() for line in f if line.strip()]
+            except OSError as e:
+                raise CommandError(f'Could not read corpus: {e}')
+            if not corpus:
+                raise CommandError('The corpus is empty')
+
+        # Popular UAs dominate real traffic; weight the corpus accordingly
+        rng = random.Random(options['seed'])
+        weights = [1 / (rank + 1) for rank in range(len(corpus))]
+        traffic = rng.choices(corpus, weights=weights, k=options['requests'])
+
+        uncached = parse_user_agent.__wrapped__
+        started = time.perf_counter()
+        for user_agent in traffic:
+            uncached(user_agent)
+        uncached_seconds = time.perf_counter() - started
+
+        parse_user_agent.cache_clear()
+        started = time.perf_counter()
+        for user_agent in traffic:
+            parse_user_agent(user_agent)
+        cached_seconds = time.perf_counter() - started
+        info = parse_user_agent.cache_info()
+
+        self.stdout.write(f'{len(corpus)} distinct User-Agents, {len(traffic)} lookups')
+        for label, seconds in (('uncached', uncached_seconds), ('cached', cached_seconds)):
+            self.stdout.write(
+                f'{label:<9} {len(traffic) / seconds:>12,.0f} lookups/s {seconds / len(traffic) * 1e6:>8.2f} us/lookup'
+            )
+        self.stdout.write(
+            f'cache hit rate {info.hits / max(info.hits + info.misses, 1):.1%} '
+            f'({info.currsize}/{info.maxsize} entries)'
+        )
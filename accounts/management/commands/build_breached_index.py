@@ -0,0 +1,186 @@
+import contextlib
+import gzip
+import heapq
+import itertools
+import os
+import re
+import sys
+import tempfile
+import time
+from django.conf import settings
+from django.contrib.auth import password_validation
+from django.core.management.base import BaseCommand, CommandError
+from accounts.breached import MAX_KEY_WIDTH, MIN_KEY_WIDTH, password_key, write_index
+
+SHA1_LINE = re.compile(rb'^[0-9A-Fa-f]{40}(:\d+)?\s*$')
+
+RUN_READ_KEYS = 65536
+
+# The list CommonPasswordValidator uses by default
+COMMON_PASSWORDS_PATH = os.path.join(os.path.dirname(password_validation.__file__), 'common-passwords.txt.gz')
+
+
+def open_source(path):
+    if path == '-':
+        # Leave stdin open for whoever else uses it
+        return contextlib.nullcontext(sys.stdin.buffer)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def guess_format(path):
+    """
+    Return 'sha1' if the first line of ``path`` is a SHA-1 hash (with an
+    optional ':count'), otherwise 'plain'.
+    """
+    if path == '-':
+        raise CommandError("Pass --format when reading stdin")
+    with open_source(path) as f:
+        for line in f:
+            if line.strip():
+                return 'sha1' if SHA1_LINE.match(line) else 'plain'
+    return 'plain'
+
+
+def read_keys(f, name, file_format, width, min_count):
+    """
+    Yield the index key of every password in ``f``.
+    """
+    for line_number, line in enumerate(f, start=1):
+        if file_format == 'sha1':
+            digest, _, count = line.strip().partition(b':')
+            if not digest:
+                continue
+            if len(digest) != 40:
+                raise CommandError(f'{name}, line {line_number}: expected a SHA-1 hash')
+            if min_count > 1 and count and int(count) < min_count:
+                continue
+            try:
+                yield bytes.fromhex(digest[:width * 2].decode('ascii'))
+            except ValueError:
+                raise CommandError(f'{name}, line {line_number}: expected a SHA-1 hash')
+        else:
+            # Hashed as stored (UTF-8), the way the validator encodes passwords
+            password = line.rstrip(b'\r\n')
+            if password:
+                yield password_key(password, width)
+
+
+class Run:
+    """
+    A sorted chunk of keys spilled to a temporary file.
+    """
+    def __init__(self, directory, keys, width):
+        self.width = width
+        self.first, self.last = keys[0], keys[-1]
+        fd, self.path = tempfile.mkstemp(suffix='.run', dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b''.join(keys))
+
+    def __iter__(self):
+        size = self.width * RUN_READ_KEYS
+        with open(self.path, 'rb') as f:
+            while block := f.read(size):
+                for i in range(0, len(block), self.width):
+                    yield block[i:i + self.width]
+
+
+def chain_runs(runs):
+    """
+    Group runs into chains of runs that follow each other without
+    overlapping, so a chain can be read end to end. Input that is already
+    sorted ends up as a single chain and needs no merging.
+    """
+    chains = []
+    for run in sorted(runs, key=lambda run: run.first):
+        for chain in chains:
+            if chain[-1].last <= run.first:
+                chain.append(run)
+                break
+        else:
+            chains.append([run])
+    return chains
+
+
+class Command(BaseCommand):
+    help = 'Convert breached password lists into the memory-mapped index used by BreachedPasswordValidator'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='+',
+            help="Password lists, plain text or SHA-1 hashes (HASH[:count]) one per line, "
+                 "optionally gzipped ('-' reads stdin)",
+        )
+        parser.add_argument(
+            '--format', choices=['auto', 'sha1', 'plain'], default='auto',
+            help='Format of the input files (default: detected from the first line)',
+        )
+        parser.add_argument(
+            '--min-count', type=int, default=1,
+            help="Skip SHA-1 entries seen fewer times than this (the ':count' suffix)",
+        )
+        parser.add_argument(
+            '--key-bytes', type=int, default=8,
+            help='Bytes of each SHA-1 kept; fewer make a smaller file with more false positives (default: 8)',
+        )
+        parser.add_argument('--output', help='Index path (default: settings.BREACHED_PASSWORDS_INDEX)')
+        parser.add_argument(
+            '--no-common', action='store_true',
+            help="Don't add Django's list of common passwords",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5_000_000,
+            help='Keys sorted in memory at a time (default: 5000000)',
+        )
+        parser.add_argument('--tmp-dir', help='Directory for sorted runs (default: next to the output)')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'BREACHED_PASSWORDS_INDEX', None)
+        if not output:
+            raise CommandError('Pass --output or set BREACHED_PASSWORDS_INDEX')
+        width = options['key_bytes']
+        if not MIN_KEY_WIDTH <= width <= MAX_KEY_WIDTH:
+            raise CommandError(f'--key-bytes must be between {MIN_KEY_WIDTH} and {MAX_KEY_WIDTH}')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        output_dir = os.path.dirname(os.path.abspath(output))
+        os.makedirs(output_dir, exist_ok=True)
+
+        for path in options['files']:
+            if path != '-' and not os.path.exists(path):
+                raise CommandError(f'{path} does not exist')
+        sources = [
+            (path, guess_format(path) if options['format'] == 'auto' else options['format'])
+            for path in options['files']
+        ]
+        if not options['no_common']:
+            sources.append((COMMON_PASSWORDS_PATH, 'plain'))
+
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory(dir=options['tmp_dir'] or output_dir) as directory:
+            runs = []
+            read = 0
+            for path, file_format in sources:
+                with open_source(path) as f:
+                    keys = read_keys(f, path, file_format, width, options['min_count'])
+                    # Runs don't span files, so each sorted file stays one chain
+                    while chunk := list(itertools.islice(keys, options['chunk_size'])):
+                        chunk.sort()
+                        runs.append(Run(directory, chunk, width))
+                        read += len(chunk)
+                self.stdout.write(f'Read {path} ({read} keys so far)')
+
+            chains = chain_runs(runs)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Merging {len(runs)} sorted runs in {len(chains)} chains')
+            merged = heapq.merge(*(itertools.chain.from_iterable(chain) for chain in chains))
+            try:
+                count = write_index(output, merged, width)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} keys to {output} ({os.path.getsize(output) / 1024 / 1024:.1f} MiB) '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from accounts.images import IMAGE_FIELDS, process_profile_images
+from accounts.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Build cleaned masters and renditions for profile images uploaded before the image pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild profiles that already have renditions')
+        parser.add_argument('--workers', type=int, default=4, help='Images processed in parallel (0 processes them inline)')
+
+    def handle(self, *args, **options):
+        jobs = []
+        for field, renditions_field in IMAGE_FIELDS.items():
+            profiles = UserProfile.objects.exclude(Q(**{f'{field}__isnull': True}) | Q(**{field: ''}))
+            if not options['all']:
+                profiles = profiles.filter(**{renditions_field: {}})
+            jobs.extend((pk, field) for pk in profiles.values_list('pk', flat=True).iterator())
+
+        if options['workers'] <= 0:
+            for pk, field in jobs:
+                process_profile_images(pk, [field])
+            self.stdout.write(self.style.SUCCESS(f'Processed {len(jobs)} profile images'))
+            return
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(process_profile_images, pk, [field]) for pk, field in jobs]
+            for done, _ in enumerate(as_completed(futures), start=1):
+                if done % 100 == 0:
+                    self.stdout.write(f'{done}/{len(futures)} images processed')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(jobs)} profile images'))
@@ -0,0 +1,46 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from accounts.bulk import FORMATS, RowWriter, export_columns, export_values, guess_format
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Stream users and their profiles to a CSV or NDJSON file that import_users can read'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='Output file (default stdout)')
+        parser.add_argument('--format', choices=FORMATS, help='Output format (guessed from the file extension)')
+        parser.add_argument('--joined-since', help='Only users who joined on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--active-only', action='store_true', help='Leave out deactivated users')
+        parser.add_argument('--with-password-hashes', action='store_true',
+                            help='Include password hashes so imported users keep their passwords')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['joined_since']:
+            since = parse_date(options['joined_since'])
+            if since is None:
+                raise CommandError('--joined-since must be a date like 2025-01-31.')
+            users = users.filter(date_joined__date__gte=since)
+        if options['active_only']:
+            users = users.filter(is_active=True)
+
+        path = options['output']
+        fmt = guess_format(path, options['format'])
+        with_password = options['with_password_hashes']
+        try:
+            f = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot write {path}: {e}')
+        count = 0
+        try:
+            writer = RowWriter(f, fmt, export_columns(with_password))
+            for row in export_values(users, with_password):
+                writer.write(row)
+                count += 1
+        finally:
+            if f is not sys.stdout:
+                f.close()
+        if f is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS(f'Exported {count} users to {path}.'))
@@ -0,0 +1,67 @@
+import csv
+import ipaddress
+import os
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from accounts.geoip import ip_key, write_database
+
+
+def _address_key(value):
+    # Some range files store addresses as integers
+    value = value.strip()
+    if value.isdigit():
+        value = ipaddress.ip_address(int(value))
+    return ip_key(value)
+
+
+class Command(BaseCommand):
+    help = 'Convert a CSV of IP ranges into the memory-mapped GeoIP database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file',
+            help="CSV rows of start_ip,end_ip,country[,region[,city]] ('-' reads stdin)",
+        )
+        parser.add_argument('--output', help='Database path (default: settings.GEOIP_DATABASE)')
+        parser.add_argument('--skip-header', action='store_true', help='Ignore the first row')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'GEOIP_DATABASE', None)
+        if not output:
+            raise CommandError('Pass --output or set GEOIP_DATABASE')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+        started = time.perf_counter()
+        ranges = []
+        f = sys.stdin if options['file'] == '-' else open(options['file'], newline='', encoding='utf-8')
+        try:
+            reader = csv.reader(f)
+            if options['skip_header']:
+                next(reader, None)
+            for line, row in enumerate(reader, start=2 if options['skip_header'] else 1):
+                if not row:
+                    continue
+                if len(row) < 3:
+                    raise CommandError(f'Line {line}: expected start_ip,end_ip,country[,region[,city]]')
+                try:
+                    start, end = _address_key(row[0]), _address_key(row[1])
+                except ValueError as e:
+                    raise CommandError(f'Line {line}: {e}')
+                # Most specific first: 'City, Region, Country'
+                label = ', '.join(part.strip() for part in reversed(row[2:5]) if part.strip())
+                ranges.append((start, end, label))
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+        try:
+            count = write_database(output, ranges)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} ranges to {output} ({os.path.getsize(output) / 1024 / 1024:.1f} MiB) '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
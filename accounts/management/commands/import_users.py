@@ -0,0 +1,69 @@
+import itertools
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from accounts.bulk import FORMATS, guess_format, import_chunk, import_defaults, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import users from a CSV or NDJSON file with bulk inserts, reporting bad rows without stopping'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, or "-" for stdin')
+        parser.add_argument('--format', choices=FORMATS, help='Input format (guessed from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows validated and inserted per transaction')
+        parser.add_argument('--verified', action='store_true',
+                            help='Mark users as email-verified unless the row says otherwise')
+        parser.add_argument('--no-wallets', action='store_true', help="Don't create the staking wallets")
+        parser.add_argument('--errors', help='Write rejected rows here as "line<TAB>error" instead of to stderr')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, insert nothing')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        path = options['path']
+        fmt = guess_format(path, options['format'])
+        try:
+            f = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        try:
+            errors_file = open(options['errors'], 'w', encoding='utf-8') if options['errors'] else None
+        except OSError as e:
+            raise CommandError(f'Cannot write {options["errors"]}: {e}')
+
+        defaults = import_defaults(verified=options['verified'])
+        created = rejected = 0
+        started = time.perf_counter()
+        try:
+            rows = read_rows(f, fmt)
+            while True:
+                chunk = list(itertools.islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                errors = [(line, error) for line, _, error in chunk if error]
+                chunk_created, chunk_errors = import_chunk(
+                    [(line, row) for line, row, error in chunk if not error],
+                    defaults,
+                    create_wallets=not options['no_wallets'],
+                    dry_run=options['dry_run'],
+                )
+                errors.extend(chunk_errors)
+                created += chunk_created
+                rejected += len(errors)
+                for line, error in sorted(errors):
+                    if errors_file:
+                        errors_file.write(f'{line}\t{error}\n')
+                    else:
+                        self.stderr.write(f'line {line}: {error}')
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{created + rejected} rows read, {created} users imported')
+        finally:
+            if f is not sys.stdin:
+                f.close()
+            if errors_file:
+                errors_file.close()
+
+        verb = 'would be imported' if options['dry_run'] else 'imported'
+        message = f'{created} users {verb}, {rejected} rows rejected in {time.perf_counter() - started:.1f}s.'
+        self.stdout.write(self.style.SUCCESS(message) if not rejected else self.style.WARNING(message))
@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts.sessions import prune_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions and their entries in the active session list'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        deleted = prune_sessions()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} stale session entries in {time.perf_counter() - started:.1f}s'
+        ))
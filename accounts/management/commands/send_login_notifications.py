@@ -0,0 +1,112 @@
+import logging
+import time
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import LoginEvent
+from accounts.utils import build_login_notification
+
+logger = logging.getLogger(__name__)
+
+# Pending events examined per pass
+SCAN_LIMIT = 5000
+
+# Longest wait between polls while sending keeps failing, in seconds
+MAX_BACKOFF = 900
+
+
+class Command(BaseCommand):
+    help = 'Email coalesced login notifications for recorded login events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window', type=int, default=getattr(settings, 'LOGIN_NOTIFICATION_WINDOW_SECONDS', 600),
+            help='Seconds to wait for further logins from the same browser before emailing',
+        )
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails rendered and sent per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep running and poll for new events')
+        parser.add_argument('--interval', type=int, default=30, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        failures = 0
+        while True:
+            try:
+                sent, skipped = self.process(options['window'], options['batch_size'])
+            except Exception:
+                if not options['loop']:
+                    raise
+                # A mail server outage must not stop the worker; the failed
+                # batch is still pending and is retried after a backoff
+                failures += 1
+                delay = min(options['interval'] * 2 ** min(failures, 10), max(MAX_BACKOFF, options['interval']))
+                logger.exception('Sending login notifications failed, retrying in %ds', delay)
+                time.sleep(delay)
+                continue
+            failures = 0
+            if sent or skipped or not options['loop']:
+                self.stdout.write(f'Sent {sent} notification(s), skipped {skipped} opted-out group(s)')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def ready_groups(self, window):
+        """
+        Group pending events by (user, browser) and return the groups whose
+        first login is older than ``window``, as lists of event ids.
+        """
+        cutoff = timezone.now() - timezone.timedelta(seconds=window)
+        groups = {}
+        pending = LoginEvent.objects.filter(notified_at__isnull=True).order_by('created_at').values_list(
+            'pk', 'user_id', 'ua_hash', 'created_at',
+        )[:SCAN_LIMIT]
+        for pk, user_id, ua_hash, created_at in pending:
+            groups.setdefault((user_id, ua_hash), []).append((pk, created_at))
+        return [[pk for pk, _ in events] for events in groups.values() if events[0][1] <= cutoff]
+
+    def claim(self, group_ids):
+        """
+        Mark a batch of groups as notified so concurrent workers skip them.
+        Returns the events that were still pending, with users and profiles.
+        """
+        ids = [pk for group in group_ids for pk in group]
+        with transaction.atomic():
+            claimed = list(
+                LoginEvent.objects.select_for_update(skip_locked=True)
+                .filter(pk__in=ids, notified_at__isnull=True)
+                .values_list('pk', flat=True)
+            )
+            LoginEvent.objects.filter(pk__in=claimed).update(notified_at=timezone.now())
+        return list(
+            LoginEvent.objects.filter(pk__in=claimed).select_related('user__profile').order_by('created_at')
+        )
+
+    def process(self, window, batch_size):
+        site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+        sent = skipped = 0
+        ready = self.ready_groups(window)
+
+        with get_connection() as connection:
+            for i in range(0, len(ready), batch_size):
+                events = self.claim(ready[i:i + batch_size])
+                groups = {}
+                for event in events:
+                    groups.setdefault((event.user_id, event.ua_hash), []).append(event)
+
+                messages = []
+                for group in groups.values():
+                    user = group[0].user
+                    profile = getattr(user, 'profile', None)
+                    if profile is not None and not profile.login_notifications:
+                        skipped += 1
+                        continue
+                    messages.append(build_login_notification(user, group, site_url))
+
+                try:
+                    sent += connection.send_messages(messages) or 0
+                except Exception:
+                    # Leave the batch pending so the next run retries it
+                    LoginEvent.objects.filter(pk__in=[event.pk for event in events]).update(notified_at=None)
+                    raise
+        return sent, skipped
@@ -0,0 +1,28 @@
+from django.utils import timezone
+from .sessions import SESSION_INDEX_KEY, buffer, get_ip_address, index_session
+
+
+class UserSessionMiddleware:
+    """
+    Keep the UserSession index of logged-in sessions up to date: new
+    sessions are indexed right away, last-seen times are written in batches.
+    Place it after AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        session = getattr(request, 'session', None)
+        if user is None or not user.is_authenticated or session is None or not session.session_key:
+            return response
+
+        indexed = session.get(SESSION_INDEX_KEY)
+        # Logging in again or changing the password gives the session a new key
+        if not indexed or indexed[0] != session.session_key:
+            index_session(request)
+        else:
+            buffer.touch(indexed[1], timezone.now(), get_ip_address(request))
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-19 04:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_accounts_user_email_upper'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='login_notifications',
+            field=models.BooleanField(default=True, help_text='Email the user when their account is signed in to from a new session.'),
+        ),
+        migrations.CreateModel(
+            name='LoginEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.CharField(blank=True, max_length=512)),
+                ('ua_hash', models.CharField(max_length=64)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='login_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['notified_at', 'created_at'], name='accounts_login_pending'), models.Index(fields=['user', 'created_at'], name='accounts_login_user')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_profile_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='cover_photo_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
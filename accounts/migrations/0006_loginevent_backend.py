@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_profile_image_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loginevent',
+            name='backend',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 
@@ -78,6 +79,10 @@ class User(AbstractUser):
         verbose_name = _('user')
         verbose_name_plural = _('users')
         swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            # Backs case-insensitive email lookups at login
+            models.Index(Upper('email'), name='accounts_user_email_upper'),
+        ]
 
 
 class UserProfile(models.Model):
@@ -87,9 +92,19 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar = models.ImageField(upload_to='profile_avatars/', blank=True, null=True)
     cover_photo = models.ImageField(upload_to='profile_covers/', blank=True, null=True)
+    # {size: path} of the resized copies built by accounts.images
+    avatar_renditions = models.JSONField(default=dict, blank=True)
+    cover_renditions = models.JSONField(default=dict, blank=True)
+    # SHA-256 of the last upload, so re-uploading the same file is a no-op
+    avatar_sha256 = models.CharField(max_length=64, blank=True)
+    cover_photo_sha256 = models.CharField(max_length=64, blank=True)
     bio = models.TextField(blank=True, null=True)
     location = models.CharField(max_length=100, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
+    login_notifications = models.BooleanField(
+        default=True,
+        help_text=_('Email the user when their account is signed in to from a new session.'),
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -114,3 +129,53 @@ class UserSocialAccount(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.provider}"
+
+
+class LoginEvent(models.Model):
+    """
+    A successful login, recorded at request time and notified later in batches.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='login_events')
+    created_at = models.DateTimeField(auto_now_add=True)
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    user_agent = models.CharField(max_length=512, blank=True)
+    # Groups logins from the same browser when coalescing notifications
+    ua_hash = models.CharField(max_length=64)
+    # Dotted path of the authentication backend that accepted the login
+    backend = models.CharField(max_length=100, blank=True)
+    notified_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['notified_at', 'created_at'], name='accounts_login_pending'),
+            models.Index(fields=['user', 'created_at'], name='accounts_login_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.created_at}"
+
+
+class UserSession(models.Model):
+    """
+    Index of a user's logged-in sessions, so they can be listed and revoked
+    without decoding every stored session.
+    """
+    session_key = models.CharField(max_length=40, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_sessions')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Written in batches by UserSessionMiddleware, so up to a minute or so behind
+    last_seen = models.DateTimeField()
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    # Summary such as 'Chrome 124 on Windows 10'
+    user_agent = models.CharField(max_length=200, blank=True)
+    device = models.CharField(max_length=20, blank=True)
+
+    class Meta:
+        ordering = ['-last_seen']
+        indexes = [
+            models.Index(fields=['user', 'last_seen'], name='accounts_session_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.user_agent or self.session_key[:8]}"
@@ -0,0 +1,142 @@
+import ipaddress
+import logging
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+from core.ratelimit import get_client_ip
+from .models import UserSession
+from .useragents import describe_browser, describe_os, parse_user_agent
+
+logger = logging.getLogger(__name__)
+
+# Session entry holding [session key, UserSession id] once it is indexed
+SESSION_INDEX_KEY = '_user_session'
+
+
+def get_ip_address(request):
+    value = get_client_ip(request)
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+
+def index_session(request):
+    """
+    Create (or take over) the index row of the request's session.
+    """
+    agent = parse_user_agent(request.META.get('HTTP_USER_AGENT', ''))
+    row, _ = UserSession.objects.update_or_create(
+        session_key=request.session.session_key,
+        defaults={
+            'user': request.user,
+            'last_seen': timezone.now(),
+            'ip_address': get_ip_address(request),
+            'user_agent': f'{describe_browser(agent)} on {describe_os(agent)}'[:200],
+            'device': agent.device,
+        },
+    )
+    request.session[SESSION_INDEX_KEY] = [row.session_key, row.pk]
+    return row
+
+
+class LastSeenBuffer:
+    """
+    Collect last-seen times in memory and write them all at once every
+    USER_SESSION_FLUSH_INTERVAL seconds, instead of one UPDATE per request.
+    """
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def touch(self, session_id, when, ip_address):
+        interval = getattr(settings, 'USER_SESSION_FLUSH_INTERVAL', 60)
+        with self.lock:
+            self.pending[session_id] = (when, ip_address)
+            due = time.monotonic() - self.flushed_at >= interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+        if not pending:
+            return
+        rows = [
+            UserSession(pk=session_id, last_seen=when, ip_address=ip_address)
+            for session_id, (when, ip_address) in pending.items()
+        ]
+        try:
+            # Rows revoked in the meantime are simply not matched
+            UserSession.objects.bulk_update(rows, ['last_seen', 'ip_address'], batch_size=500)
+        except Exception:
+            logger.exception('Could not record last-seen times of %d sessions', len(rows))
+
+
+buffer = LastSeenBuffer()
+
+
+def session_cutoff():
+    """
+    Sessions not seen since this time have outlived SESSION_COOKIE_AGE.
+    """
+    return timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+
+
+def active_sessions(user):
+    """
+    The user's indexed sessions that may still be in use.
+    """
+    return UserSession.objects.filter(user=user, last_seen__gte=session_cutoff())
+
+
+def prune_sessions():
+    """
+    Delete expired sessions from the session store (like clearsessions) and
+    the index rows of sessions that have expired or no longer exist.
+    Returns the number of index rows deleted.
+    """
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    try:
+        store.clear_expired()
+    except NotImplementedError:
+        # Such as signed cookies, which expire on their own
+        pass
+    count, _ = UserSession.objects.filter(last_seen__lt=session_cutoff()).delete()
+    if issubclass(store, DBStore):
+        # Sessions deleted behind the index's back, e.g. by clearsessions
+        orphans, _ = UserSession.objects.exclude(
+            session_key__in=store.get_model_class().objects.values('session_key')
+        ).delete()
+        count += orphans
+    return count
+
+
+def revoke_sessions(user, keep=None, ids=None):
+    """
+    Log out the user's indexed sessions, except the one with session key
+    ``keep`` and, if ``ids`` is given, only those UserSession ids.
+    Returns the number of sessions revoked.
+    """
+    sessions = UserSession.objects.filter(user=user)
+    if keep:
+        sessions = sessions.exclude(session_key=keep)
+    if ids is not None:
+        sessions = sessions.filter(pk__in=ids)
+
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if issubclass(store, DBStore) and not issubclass(store, CachedDBStore):
+        # One DELETE with a subquery, however many sessions the user has
+        store.get_model_class().objects.filter(session_key__in=sessions.values('session_key')).delete()
+    else:
+        for session_key in sessions.values_list('session_key', flat=True):
+            store(session_key).delete()
+    count, _ = sessions.delete()
+    return count
@@ -1,7 +1,8 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from django.contrib.auth.signals import user_logged_out
+from .models import UserProfile, UserSession
 
 User = get_user_model()
 
@@ -12,3 +13,13 @@ def create_user_profile(sender, instance, created, **kwargs):
     """
     if created and not hasattr(instance, 'profile'):
         UserProfile.objects.create(user=instance)
+
+
+@receiver(user_logged_out)
+def drop_user_session(sender, request, user, **kwargs):
+    """
+    Remove a session from the session index when its user logs out.
+    """
+    session_key = getattr(request, 'session', None) and request.session.session_key
+    if session_key:
+        UserSession.objects.filter(session_key=session_key).delete()
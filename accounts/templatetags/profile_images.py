@@ -0,0 +1,36 @@
+from django import template
+from django.core.files.storage import default_storage
+from accounts.images import IMAGE_FIELDS
+
+register = template.Library()
+
+
+def _renditions(profile, field):
+    return sorted(
+        (int(size), name) for size, name in (getattr(profile, IMAGE_FIELDS[field]) or {}).items()
+    )
+
+
+@register.simple_tag
+def profile_image_url(profile, field, size):
+    """
+    URL of the smallest rendition at least ``size`` pixels wide, falling back
+    to the largest one, then to the uploaded file while it is processed.
+    """
+    renditions = _renditions(profile, field)
+    for width, name in renditions:
+        if width >= size:
+            return default_storage.url(name)
+    if renditions:
+        return default_storage.url(renditions[-1][1])
+    image = getattr(profile, field)
+    return image.url if image else ''
+
+
+@register.simple_tag
+def profile_image_srcset(profile, field):
+    """
+    ``srcset`` value listing every rendition, so the browser picks the
+    smallest one for the layout size and pixel density.
+    """
+    return ', '.join(f'{default_storage.url(name)} {width}w' for width, name in _renditions(profile, field))
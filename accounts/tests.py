@@ -1,3 +1,1022 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.hashers import MD5PasswordHasher, identify_hasher, make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.template import Context, Template
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+from accounts import breached, bulk, geoip, images
+from accounts.backends import EmailBackend
+from accounts.breached import BreachedPasswordIndex, get_index, password_key, write_index
+from accounts.images import process_profile_image, validate_profile_image
+from accounts.geoip import GeoIPDatabase, ip_key, lookup_location, write_database
+from accounts.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher
+from accounts.forms import CustomPasswordChangeForm, CustomSetPasswordForm, SignupForm
+from accounts.models import LoginEvent, User, UserProfile, UserSession
+from accounts.sessions import buffer as session_buffer
+from accounts.useragents import UNKNOWN, describe_browser, describe_os, parse_user_agent
+from accounts.validators import BreachedPasswordValidator
+from twofactor.models import UserTwoFactorSettings
 
-# Create your tests here.
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+BREACHED = ['hunter2-hunter2', 'Tr0ub4dor&3', 'correct horse battery staple', 'ümlaut-pässword']
+
+
+class TempDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+
+def build_index(path, passwords, width=8):
+    return write_index(path, sorted(password_key(password, width) for password in passwords), width)
+
+
+class BreachedIndexTests(TempDirMixin, SimpleTestCase):
+    def test_lookup(self):
+        path = self.path('index.bin')
+        self.assertEqual(build_index(path, BREACHED), len(BREACHED))
+        index = BreachedPasswordIndex(path)
+        self.assertEqual(len(index), len(BREACHED))
+        for password in BREACHED:
+            self.assertTrue(index.contains_password(password))
+        for password in ('hunter2-hunter3', 'tr0ub4dor&3', ''):
+            self.assertFalse(index.contains_password(password))
+
+    def test_lookup_in_full_buckets(self):
+        # Thousands of keys, so buckets hold several keys and the search has to gallop
+        passwords = [f'password-{i}' for i in range(20000)]
+        path = self.path('index.bin')
+        build_index(path, passwords, width=5)
+        index = BreachedPasswordIndex(path)
+        self.assertTrue(all(index.contains_password(password) for password in passwords))
+        self.assertFalse(any(index.contains_password(f'other-{i}') for i in range(2000)))
+
+    def test_repeats_dropped(self):
+        path = self.path('index.bin')
+        keys = sorted(password_key(password, 8) for password in BREACHED * 3)
+        self.assertEqual(write_index(path, keys, 8), len(BREACHED))
+
+    def test_unsorted_keys_rejected_without_leftovers(self):
+        path = self.path('index.bin')
+        keys = sorted(password_key(password, 8) for password in BREACHED)
+        with self.assertRaises(ValueError):
+            write_index(path, reversed(keys), 8)
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_wrong_width_rejected(self):
+        with self.assertRaises(ValueError):
+            write_index(self.path('index.bin'), [b'abc'], 3)
+        with self.assertRaises(ValueError):
+            write_index(self.path('index.bin'), [b'abcdefg'], 8)
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_unreadable_files_rejected(self):
+        good = self.path('good.bin')
+        build_index(good, BREACHED)
+        with open(good, 'rb') as f:
+            data = f.read()
+        for name, content in [
+            ('empty.bin', b''),
+            ('short.bin', data[:100]),
+            ('truncated.bin', data[:-3]),
+            ('foreign.bin', b'GEOIPRNG' + data[8:]),
+        ]:
+            with self.subTest(name):
+                with open(self.path(name), 'wb') as f:
+                    f.write(content)
+                with self.assertRaises(ValueError):
+                    BreachedPasswordIndex(self.path(name))
+
+
+class GetIndexTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.reset)
+        self.reset()
+
+    def reset(self):
+        breached._index = None
+        breached._checked_at = None
+
+    def test_missing_file(self):
+        with override_settings(BREACHED_PASSWORDS_INDEX=self.path('missing.bin')):
+            self.assertIsNone(get_index())
+
+    def test_empty_file_is_logged_not_raised(self):
+        path = self.path('index.bin')
+        open(path, 'wb').close()
+        with override_settings(BREACHED_PASSWORDS_INDEX=path):
+            with self.assertLogs('accounts.breached', 'ERROR'):
+                self.assertIsNone(get_index())
+
+    def test_replaced_file_reloaded(self):
+        path = self.path('index.bin')
+        build_index(path, BREACHED[:1])
+        with override_settings(BREACHED_PASSWORDS_INDEX=path):
+            self.assertEqual(len(get_index()), 1)
+            build_index(path, BREACHED)
+            os.utime(path, (0, 12345))
+            # Not checked again until RELOAD_INTERVAL has passed
+            self.assertEqual(len(get_index()), 1)
+            breached._checked_at = None
+            self.assertEqual(len(get_index()), len(BREACHED))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class BreachedPasswordValidatorTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.index_path = self.path('index.bin')
+        build_index(self.index_path, BREACHED + ['password-lower'])
+        self.reset()
+        self.addCleanup(self.reset)
+        settings_override = override_settings(BREACHED_PASSWORDS_INDEX=self.index_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def reset(self):
+        breached._index = None
+        breached._checked_at = None
+
+    def test_breached_password_rejected(self):
+        validator = BreachedPasswordValidator()
+        with self.assertRaises(ValidationError) as cm:
+            validator.validate('Tr0ub4dor&3')
+        self.assertEqual(cm.exception.error_list[0].code, 'password_breached')
+        validator.validate('Tr0ub4dor&4')
+
+    def test_lowercased_password_checked(self):
+        with self.assertRaises(ValidationError):
+            BreachedPasswordValidator().validate('Password-Lower')
+
+    def test_falls_back_to_common_passwords_without_index(self):
+        os.unlink(self.index_path)
+        validator = BreachedPasswordValidator()
+        with self.assertRaises(ValidationError) as cm:
+            validator.validate('password123')
+        self.assertEqual(cm.exception.error_list[0].code, 'password_too_common')
+        validator.validate('Tr0ub4dor&3')
+
+    def test_falls_back_to_common_passwords_with_corrupt_index(self):
+        with open(self.index_path, 'wb') as f:
+            f.write(b'not an index')
+        validator = BreachedPasswordValidator()
+        with self.assertLogs('accounts.breached', 'ERROR'):
+            with self.assertRaises(ValidationError):
+                validator.validate('password123')
+        validator.validate('Tr0ub4dor&3')
+
+    def test_forms_use_validator(self):
+        user = User.objects.create_user(email='user@example.com', password='Old-password-1')
+        password = 'correct horse battery staple'
+        forms = [
+            SignupForm({
+                'first_name': 'A', 'last_name': 'B', 'email': 'new@example.com',
+                'password1': password, 'password2': password,
+            }),
+            CustomSetPasswordForm(user, {'new_password1': password, 'new_password2': password}),
+            CustomPasswordChangeForm(user, {
+                'old_password': 'Old-password-1', 'new_password1': password, 'new_password2': password,
+            }),
+        ]
+        for form in forms:
+            with self.subTest(form.__class__.__name__):
+                self.assertFalse(form.is_valid())
+                self.assertIn('data breach', str(form.errors))
+
+    def test_signup_with_safe_password(self):
+        form = SignupForm({
+            'first_name': 'A', 'last_name': 'B', 'email': 'new@example.com',
+            'password1': 'Unlisted-Pass-9', 'password2': 'Unlisted-Pass-9',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+
+
+class BuildBreachedIndexCommandTests(TempDirMixin, SimpleTestCase):
+    def write(self, name, lines):
+        with open(self.path(name), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return self.path(name)
+
+    def build(self, *files, **options):
+        output = self.path('index.bin')
+        call_command('build_breached_index', *files, output=output, stdout=open(os.devnull, 'w'), **options)
+        return BreachedPasswordIndex(output)
+
+    def test_plain_and_sha1_sources(self):
+        plain = self.write('plain.txt', BREACHED[:2])
+        hashes = sorted(
+            (hashlib.sha1(password.encode()).hexdigest().upper(), count)
+            for password, count in [(BREACHED[2], 5), (BREACHED[3], 1)]
+        )
+        sha1 = self.write('hashes.txt', [f'{digest}:{count}' for digest, count in hashes])
+        index = self.build(plain, sha1, no_common=True, chunk_size=1)
+        self.assertEqual(len(index), 4)
+        self.assertTrue(all(index.contains_password(password) for password in BREACHED))
+
+    def test_min_count(self):
+        lines = [f'{hashlib.sha1(b"rare").hexdigest()}:1', f'{hashlib.sha1(b"frequent").hexdigest()}:9']
+        index = self.build(self.write('hashes.txt', lines), no_common=True, min_count=2)
+        self.assertTrue(index.contains_password('frequent'))
+        self.assertFalse(index.contains_password('rare'))
+
+    def test_common_passwords_included(self):
+        index = self.build(self.write('plain.txt', ['Unlisted-Pass-9']), key_bytes=6)
+        self.assertEqual(index.width, 6)
+        self.assertTrue(index.contains_password('password123'))
+        self.assertTrue(index.contains_password('Unlisted-Pass-9'))
+
+    def test_bad_hash_keeps_previous_index(self):
+        self.build(self.write('plain.txt', BREACHED), no_common=True)
+        bad = self.write('hashes.txt', [hashlib.sha1(b'x').hexdigest(), 'not-a-hash'])
+        with self.assertRaises(CommandError):
+            self.build(bad, no_common=True, format='sha1')
+        self.assertEqual(len(BreachedPasswordIndex(self.path('index.bin'))), len(BREACHED))
+        self.assertFalse(os.path.exists(self.path('index.bin.tmp')))
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            self.build(self.path('missing.txt'))
+
+
+class GeoIPDatabaseTests(TempDirMixin, SimpleTestCase):
+    RANGES = [
+        (ip_key('1.0.0.0'), ip_key('1.0.0.255'), 'AU'),
+        (ip_key('41.58.0.0'), ip_key('41.58.255.255'), 'Lagos, Lagos, NG'),
+        (ip_key('2001:db8::'), ip_key('2001:db8::ffff'), 'Berlin, DE'),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.reset)
+        self.reset()
+
+    def reset(self):
+        geoip._database = None
+        geoip._checked_at = None
+        geoip._lookup.cache_clear()
+
+    def test_lookup(self):
+        path = self.path('ranges.bin')
+        self.assertEqual(write_database(path, reversed(self.RANGES)), 3)
+        database = GeoIPDatabase(path)
+        self.assertEqual(database.lookup(ip_key('41.58.10.1')), 'Lagos, Lagos, NG')
+        self.assertEqual(database.lookup(ip_key('1.0.0.0')), 'AU')
+        self.assertEqual(database.lookup(ip_key('2001:db8::1')), 'Berlin, DE')
+        self.assertIsNone(database.lookup(ip_key('1.0.1.0')))
+        self.assertIsNone(database.lookup(ip_key('0.0.0.1')))
+
+    def test_overlap_leaves_no_temp_file(self):
+        path = self.path('ranges.bin')
+        with self.assertRaises(ValueError):
+            write_database(path, self.RANGES + [(ip_key('1.0.0.128'), ip_key('1.0.1.0'), 'X')])
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_truncated_file_rejected(self):
+        path = self.path('ranges.bin')
+        write_database(path, self.RANGES)
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)
+        with self.assertRaises(ValueError):
+            GeoIPDatabase(path)
+
+    def test_lookup_location(self):
+        path = self.path('ranges.bin')
+        write_database(path, self.RANGES)
+        with override_settings(GEOIP_DATABASE=path):
+            self.assertEqual(lookup_location('41.58.1.1'), 'Lagos, Lagos, NG')
+            self.assertIsNone(lookup_location('not-an-ip'))
+            self.assertIsNone(lookup_location(None))
+
+    def test_missing_file(self):
+        with override_settings(GEOIP_DATABASE=self.path('missing.bin')):
+            self.assertIsNone(lookup_location('41.58.1.1'))
+
+    def test_empty_file_treated_as_missing(self):
+        path = self.path('ranges.bin')
+        open(path, 'wb').close()
+        with override_settings(GEOIP_DATABASE=path):
+            with self.assertLogs('accounts.geoip', 'ERROR'):
+                self.assertIsNone(lookup_location('41.58.1.1'))
+
+    def test_import_command(self):
+        csv_path = self.path('ranges.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write('start,end,country,region,city\n41.58.0.0,41.58.255.255,NG,Lagos,Lagos\n16777216,16777471,AU\n')
+        output = self.path('ranges.bin')
+        call_command('import_geoip_ranges', csv_path, output=output, skip_header=True, stdout=StringIO())
+        database = GeoIPDatabase(output)
+        self.assertEqual(database.lookup(ip_key('41.58.0.9')), 'Lagos, Lagos, NG')
+        self.assertEqual(database.lookup(ip_key('1.0.0.9')), 'AU')
+
+
+def image_bytes(size, image_format='PNG', color=(200, 30, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, PROFILE_IMAGE_FORMAT='WEBP', PROFILE_IMAGE_WORKERS=0)
+class ProfileImageTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media = override_settings(MEDIA_ROOT=self.tmp)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user(email='user@example.com', password='x', is_email_verified=True)
+        self.profile = self.user.profile
+
+    def test_validate_profile_image(self):
+        validate_profile_image(SimpleUploadedFile('a.png', image_bytes((10, 10))))
+        with self.assertRaises(ValidationError):
+            validate_profile_image(SimpleUploadedFile('a.png', b'GIF89a but not really'))
+        with self.assertRaises(ValidationError):
+            validate_profile_image(SimpleUploadedFile('a.bmp', image_bytes((10, 10), 'BMP')))
+        with mock.patch.object(images, 'MAX_IMAGE_PIXELS', 99):
+            with self.assertRaises(ValidationError):
+                validate_profile_image(SimpleUploadedFile('a.png', image_bytes((10, 10))))
+
+    def test_avatar_renditions(self):
+        self.profile.avatar.save('me.png', SimpleUploadedFile('me.png', image_bytes((300, 200))))
+        source = self.profile.avatar.name
+        process_profile_image(self.profile.pk, 'avatar')
+
+        self.profile.refresh_from_db()
+        self.assertEqual(sorted(self.profile.avatar_renditions), ['128', '256', '64'])
+        self.assertTrue(self.profile.avatar.name.endswith('.webp'))
+        self.assertFalse(default_storage.exists(source))
+        for size, name in self.profile.avatar_renditions.items():
+            with default_storage.open(name) as f, Image.open(f) as img:
+                self.assertEqual((img.format, img.size), ('WEBP', (int(size), int(size))))
+
+    def test_cover_is_not_upscaled(self):
+        self.profile.cover_photo.save('c.jpg', SimpleUploadedFile('c.jpg', image_bytes((1000, 250), 'JPEG')))
+        process_profile_image(self.profile.pk, 'cover_photo')
+        self.profile.refresh_from_db()
+        self.assertEqual(sorted(self.profile.cover_renditions, key=int), ['600', '1000'])
+
+        template = Template('{% load profile_images %}{% profile_image_url profile "cover_photo" 700 %}')
+        self.assertEqual(
+            template.render(Context({'profile': self.profile})),
+            default_storage.url(self.profile.cover_renditions['1000']),
+        )
+
+    def test_stale_job_does_not_overwrite_newer_upload(self):
+        self.profile.avatar.save('old.png', SimpleUploadedFile('old.png', image_bytes((50, 50))))
+        decode = images._decode
+
+        def newer_upload_lands(name, max_side):
+            UserProfile.objects.filter(pk=self.profile.pk).update(avatar='profile_avatars/new.png')
+            return decode(name, max_side)
+
+        with mock.patch.object(images, '_decode', side_effect=newer_upload_lands):
+            process_profile_image(self.profile.pk, 'avatar')
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.avatar.name, 'profile_avatars/new.png')
+        self.assertEqual(self.profile.avatar_renditions, {})
+
+    def test_upload_view_builds_renditions(self):
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('accounts:profile_edit_images'), {
+                'avatar': SimpleUploadedFile('me.png', image_bytes((80, 80)), content_type='image/png'),
+            })
+        self.assertEqual(response.status_code, 302)
+        self.profile.refresh_from_db()
+        self.assertEqual(len(self.profile.avatar_renditions), 3)
+
+    def test_same_upload_again_is_a_no_op(self):
+        self.client.force_login(self.user)
+        data = image_bytes((80, 80))
+        url = reverse('accounts:profile_edit_images')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'avatar': SimpleUploadedFile('me.png', data, content_type='image/png')})
+        self.profile.refresh_from_db()
+        first = self.profile.avatar.name, self.profile.avatar_renditions
+        with mock.patch.object(images, 'process_profile_image') as process:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {'avatar': SimpleUploadedFile('again.png', data, content_type='image/png')})
+        self.assertEqual(response.status_code, 302)
+        process.assert_not_called()
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.avatar.name, self.profile.avatar_renditions), first)
+
+    def test_refused_upload_reported(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('accounts:profile_edit_images'),
+            {'avatar': SimpleUploadedFile('me.png', b'<svg/>', content_type='image/png')},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.json(), {'success': False, 'message': 'Upload a valid image file.'})
+
+    def test_build_profile_images_command(self):
+        self.profile.avatar.save('me.png', SimpleUploadedFile('me.png', image_bytes((80, 80))))
+        stdout = StringIO()
+        call_command('build_profile_images', workers=0, stdout=stdout)
+        self.assertIn('Processed 1 profile images', stdout.getvalue())
+        self.profile.refresh_from_db()
+        self.assertEqual(len(self.profile.avatar_renditions), 3)
+
+
+CHROME_ON_WINDOWS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
+)
+
+
+class UserAgentTests(SimpleTestCase):
+    AGENTS = [
+        (CHROME_ON_WINDOWS, ('Chrome', '124.0.0.0', 'Windows', '10', 'Desktop')),
+        (
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+            'Chrome/124.0.0.0 Safari/537.36 Edg/124.0.2478.80',
+            ('Edge', '124.0.2478.80', 'Windows', '10', 'Desktop'),
+        ),
+        (
+            'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 '
+            '(KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1',
+            ('Safari', '17.4', 'iOS', '17.4', 'Mobile'),
+        ),
+        (
+            'Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 '
+            '(KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
+            ('Safari', '16.6', 'iPadOS', '16.6', 'Tablet'),
+        ),
+        (
+            'Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) '
+            'SamsungBrowser/24.0 Chrome/117.0.0.0 Mobile Safari/537.36',
+            ('Samsung Internet', '24.0', 'Android', '14', 'Mobile'),
+        ),
+        (
+            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:125.0) Gecko/20100101 Firefox/125.0',
+            ('Firefox', '125.0', 'macOS', '10.15', 'Desktop'),
+        ),
+        (
+            'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+            ('Bot', '', 'Unknown', '', 'Bot'),
+        ),
+    ]
+
+    def test_classification(self):
+        for user_agent, expected in self.AGENTS:
+            with self.subTest(expected[0]):
+                self.assertEqual(tuple(parse_user_agent(user_agent)), expected)
+
+    def test_empty_and_unknown(self):
+        self.assertEqual(parse_user_agent(''), UNKNOWN)
+        self.assertEqual(parse_user_agent('curl/8.4.0')[:4], ('Unknown', '', 'Unknown', ''))
+
+    def test_cached(self):
+        parse_user_agent.cache_clear()
+        parse_user_agent(CHROME_ON_WINDOWS)
+        parse_user_agent(CHROME_ON_WINDOWS)
+        self.assertEqual(parse_user_agent.cache_info().hits, 1)
+
+    def test_descriptions(self):
+        agent = parse_user_agent(CHROME_ON_WINDOWS)
+        self.assertEqual(describe_browser(agent), 'Chrome 124')
+        self.assertEqual(describe_os(agent), 'Windows 10')
+        self.assertEqual(describe_browser(UNKNOWN), 'Unknown')
+
+    def test_benchmark_command(self):
+        stdout = StringIO()
+        call_command('benchmark_user_agents', requests=500, stdout=stdout)
+        self.assertIn('hit rate', stdout.getvalue().lower())
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    RATELIMIT_ENABLE=False,
+    RATELIMIT_TRUSTED_PROXIES=0,
+    USER_SESSION_FLUSH_INTERVAL=3600,
+)
+class UserSessionTests(TestCase):
+    password = 'Sup3r-secret-pw!'
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password=self.password, is_email_verified=True)
+        session_buffer.pending.clear()
+        self.addCleanup(session_buffer.pending.clear)
+
+    def login(self, email='user@example.com', password=None, **extra):
+        client = Client(HTTP_USER_AGENT=CHROME_ON_WINDOWS, **extra)
+        response = client.post(reverse('accounts:login'), {'username': email, 'password': password or self.password})
+        self.assertEqual(response.status_code, 302)
+        return client
+
+    def row(self, client):
+        return UserSession.objects.get(session_key=client.session.session_key)
+
+    def is_logged_in(self, client):
+        return client.get(reverse('twofactor:security_settings')).status_code == 200
+
+    def test_login_indexes_session(self):
+        client = self.login(REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR='198.51.100.1')
+        row = self.row(client)
+        self.assertEqual(row.user, self.user)
+        self.assertEqual(row.user_agent, 'Chrome 124 on Windows 10')
+        self.assertEqual(row.device, 'Desktop')
+        # The client-supplied X-Forwarded-For is not trusted
+        self.assertEqual(row.ip_address, '203.0.113.7')
+
+    def test_last_seen_is_buffered(self):
+        client = self.login()
+        row = self.row(client)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('twofactor:security_settings'))
+        self.assertFalse([q for q in queries if 'accounts_usersession" SET' in q['sql']])
+        self.assertIn(row.pk, session_buffer.pending)
+
+        session_buffer.flush()
+        self.assertEqual(session_buffer.pending, {})
+        self.assertGreater(self.row(client).last_seen, row.last_seen)
+
+    def test_logout_removes_row(self):
+        client = self.login()
+        client.get(reverse('accounts:logout'))
+        self.assertFalse(UserSession.objects.exists())
+
+    def test_revoke_one_session(self):
+        current, other = self.login(), self.login()
+        response = current.post(reverse('accounts:revoke_session', args=[self.row(other).pk]))
+        self.assertRedirects(response, reverse('twofactor:security_settings'))
+        self.assertFalse(self.is_logged_in(other))
+        self.assertTrue(self.is_logged_in(current))
+        self.assertEqual(UserSession.objects.count(), 1)
+
+    def test_current_session_not_revoked(self):
+        client = self.login()
+        client.post(reverse('accounts:revoke_session', args=[self.row(client).pk]))
+        self.assertTrue(self.is_logged_in(client))
+
+    def test_cannot_revoke_another_users_session(self):
+        User.objects.create_user(email='other@example.com', password=self.password, is_email_verified=True)
+        victim = self.login('other@example.com')
+        attacker = self.login()
+        response = attacker.post(reverse('accounts:revoke_session', args=[self.row(victim).pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(self.is_logged_in(victim))
+
+    def test_revoke_requires_post(self):
+        current, other = self.login(), self.login()
+        response = current.get(reverse('accounts:revoke_session', args=[self.row(other).pk]))
+        self.assertEqual(response.status_code, 405)
+        self.assertTrue(self.is_logged_in(other))
+
+    def test_revoke_other_sessions(self):
+        current, others = self.login(), [self.login(), self.login()]
+        with CaptureQueriesContext(connection) as queries:
+            current.post(reverse('accounts:revoke_other_sessions'))
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE FROM "django_session"')]
+        self.assertEqual(len(deletes), 1)
+        for client in others:
+            self.assertFalse(self.is_logged_in(client))
+        self.assertTrue(self.is_logged_in(current))
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_password_change_revokes_other_sessions(self):
+        current, other = self.login(), self.login()
+        response = current.post(reverse('accounts:password_change'), {
+            'old_password': self.password,
+            'new_password1': 'An0ther-secret-pw!',
+            'new_password2': 'An0ther-secret-pw!',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self.is_logged_in(other))
+        self.assertTrue(self.is_logged_in(current))
+        self.assertEqual(UserSession.objects.count(), 1)
+
+    def test_password_reset_revokes_all_sessions(self):
+        client = self.login()
+        # The token covers last_login, which logging in just changed
+        self.user.refresh_from_db()
+        uidb64 = urlsafe_base64_encode(force_bytes(self.user.pk))
+        token = default_token_generator.make_token(self.user)
+        response = Client().post(reverse('accounts:password_reset_confirm', args=[uidb64, token]), {
+            'new_password1': 'An0ther-secret-pw!',
+            'new_password2': 'An0ther-secret-pw!',
+        })
+        self.assertRedirects(response, reverse('accounts:login'))
+        self.assertFalse(self.is_logged_in(client))
+        self.assertFalse(UserSession.objects.exists())
+
+    def test_disabling_2fa_revokes_other_sessions(self):
+        current, other = self.login(), self.login()
+        UserTwoFactorSettings.objects.filter(user=self.user).update(
+            is_enabled=True, method='totp', totp_secret='JBSWY3DPEHPK3PXP', last_verified=timezone.now()
+        )
+        response = current.post(reverse('twofactor:disable_2fa'), {'confirm': 'on'})
+        self.assertRedirects(response, reverse('twofactor:security_settings'))
+        self.assertFalse(self.is_logged_in(other))
+        self.assertTrue(self.is_logged_in(current))
+
+    def test_security_page_lists_live_sessions(self):
+        current, other, stale = self.login(), self.login(), self.login()
+        UserSession.objects.filter(pk=self.row(stale).pk).update(
+            last_seen=timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE + 60)
+        )
+        response = current.get(reverse('twofactor:security_settings'))
+        sessions = list(response.context['user_sessions'])
+        self.assertEqual({s.pk for s in sessions}, {self.row(current).pk, self.row(other).pk})
+        content = response.content.decode()
+        self.assertEqual(content.count('This device'), 1)
+        self.assertIn(reverse('accounts:revoke_session', args=[self.row(other).pk]), content)
+        self.assertNotIn(reverse('accounts:revoke_session', args=[self.row(current).pk]), content)
+        self.assertNotIn(current.session.session_key, content)
+
+    def test_prune_sessions(self):
+        live, stale, orphan = self.login(), self.login(), self.login()
+        UserSession.objects.filter(pk=self.row(stale).pk).update(
+            last_seen=timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE + 60)
+        )
+        # As if clearsessions had deleted it
+        Session.objects.filter(session_key=orphan.session.session_key).delete()
+        Session.objects.filter(session_key=live.session.session_key).update(expire_date=timezone.now() + timedelta(days=1))
+        out = StringIO()
+        call_command('prune_user_sessions', stdout=out)
+        self.assertIn('Deleted 2 stale session entries', out.getvalue())
+        self.assertEqual(list(UserSession.objects.values_list('session_key', flat=True)), [live.session.session_key])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class EmailBackendTests(TestCase):
+    def setUp(self):
+        self.backend = EmailBackend()
+        self.user = User.objects.create_user(email='Jane@Example.com', username='jane', password='Pass-word-1')
+
+    def test_email_is_case_insensitive(self):
+        self.assertEqual(self.backend.authenticate(None, username='jane@example.com', password='Pass-word-1'), self.user)
+
+    def test_username(self):
+        self.assertEqual(self.backend.authenticate(None, username='jane', password='Pass-word-1'), self.user)
+
+    def test_email_match_wins_over_username_match(self):
+        # Someone picked another user's email address as their username
+        other = User.objects.create_user(email='other@example.com', username='jane@example.com', password='Pass-word-1')
+        self.assertEqual(self.backend.authenticate(None, username='jane@example.com', password='Pass-word-1'), self.user)
+        self.assertEqual(self.backend.authenticate(None, username='other@example.com', password='Pass-word-1'), other)
+
+    def test_wrong_password_and_inactive_user(self):
+        self.assertIsNone(self.backend.authenticate(None, username='jane', password='wrong'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.authenticate(None, username='jane', password='Pass-word-1'))
+
+    def test_missing_credentials(self):
+        self.assertIsNone(self.backend.authenticate(None, username=None, password='Pass-word-1'))
+        self.assertIsNone(self.backend.authenticate(None, username='jane', password=None))
+
+    def test_one_query_and_one_hash_per_attempt(self):
+        for username in ('jane@example.com', 'nobody@example.com'):
+            with self.subTest(username):
+                with mock.patch.object(MD5PasswordHasher, 'encode', autospec=True,
+                                       side_effect=MD5PasswordHasher.encode) as encode:
+                    with self.assertNumQueries(1):
+                        self.backend.authenticate(None, username=username, password='wrong')
+                self.assertEqual(encode.call_count, 1)
+
+    def test_get_user_returns_a_fresh_instance(self):
+        # Nothing is shared between requests (or ASGI tasks on one thread)
+        first, second = self.backend.get_user(self.user.pk), self.backend.get_user(self.user.pk)
+        self.assertEqual(first, self.user)
+        self.assertIsNot(first, second)
+        self.assertIsNone(self.backend.get_user(self.user.pk + 100))
+
+    def test_single_model_backend(self):
+        self.assertNotIn('django.contrib.auth.backends.ModelBackend', settings.AUTHENTICATION_BACKENDS)
+        self.assertEqual(settings.AUTHENTICATION_BACKENDS.count('accounts.backends.EmailBackend'), 1)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, RATELIMIT_ENABLE=False)
+class LoginViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='Pass-word-1', is_email_verified=True)
+
+    def test_password_verified_once(self):
+        with mock.patch.object(MD5PasswordHasher, 'encode', autospec=True, side_effect=MD5PasswordHasher.encode) as encode:
+            response = self.client.post(
+                reverse('accounts:login'), {'username': 'user@example.com', 'password': 'Pass-word-1'},
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+        self.assertEqual(self.client.session['_auth_user_backend'], 'accounts.backends.EmailBackend')
+        self.assertEqual(LoginEvent.objects.get(user=self.user).backend, 'accounts.backends.EmailBackend')
+
+    def test_wrong_password_not_logged_in(self):
+        response = self.client.post(reverse('accounts:login'), {'username': 'user@example.com', 'password': 'nope'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertFalse(LoginEvent.objects.exists())
+
+    def test_benchmark_login(self):
+        stdout = StringIO()
+        call_command('benchmark_login', logins=2, stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertIn('before  2.0 hasher calls/login', lines[0])
+        self.assertIn('after   1.0 hasher calls/login', lines[1])
+        self.assertFalse(User.objects.exclude(pk=self.user.pk).exists())
+
+
+POLICY_HASHERS = [
+    'accounts.hashers.PBKDF2PasswordHasher',
+    'accounts.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+
+@override_settings(PASSWORD_HASHERS=POLICY_HASHERS, PASSWORD_HASHING={'PBKDF2_ITERATIONS': 1000})
+class PasswordHashingTests(TestCase):
+    def iterations(self, user):
+        user.refresh_from_db()
+        algorithm, iterations, _, _ = user.password.split('$')
+        return algorithm, int(iterations)
+
+    def test_cost_read_from_policy(self):
+        self.assertTrue(make_password('secret').startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 1500}):
+            self.assertTrue(make_password('secret').startswith('pbkdf2_sha256$1500$'))
+
+    def test_explicit_cost_overrides_policy(self):
+        self.assertEqual(PBKDF2PasswordHasher(iterations=5).iterations, 5)
+        hasher = ScryptPasswordHasher(work_factor=2 ** 15)
+        # Missing from the policy: Django's default
+        self.assertEqual(hasher.cost(), {'work_factor': 2 ** 15, 'block_size': 8, 'parallelism': 5})
+        self.assertGreaterEqual(hasher.maxmem, 256 * 2 ** 15 * 8)
+
+    def test_login_rehashes_to_configured_cost(self):
+        user = User.objects.create_user(email='user@example.com', password='Correct-horse-1')
+        self.assertEqual(self.iterations(user), ('pbkdf2_sha256', 1000))
+        for iterations in (2000, 500):
+            with override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': iterations}):
+                self.assertEqual(EmailBackend().authenticate(None, 'user@example.com', 'Correct-horse-1'), user)
+                self.assertEqual(self.iterations(user), ('pbkdf2_sha256', iterations))
+
+    def test_login_rehashes_other_algorithm(self):
+        user = User.objects.create_user(email='user@example.com', password='x')
+        User.objects.filter(pk=user.pk).update(password=make_password('Correct-horse-1', hasher='md5'))
+        self.assertIsNotNone(EmailBackend().authenticate(None, 'user@example.com', 'Correct-horse-1'))
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, 'pbkdf2_sha256')
+
+    def test_failed_login_keeps_hash(self):
+        user = User.objects.create_user(email='user@example.com', password='Correct-horse-1')
+        with override_settings(PASSWORD_HASHING={'PBKDF2_ITERATIONS': 2000}):
+            self.assertIsNone(EmailBackend().authenticate(None, 'user@example.com', 'wrong'))
+        self.assertEqual(self.iterations(user), ('pbkdf2_sha256', 1000))
+
+    def test_benchmark_hashers(self):
+        stdout = StringIO()
+        call_command(
+            'benchmark_hashers', candidate=['pbkdf2_sha256:iterations=1000'], duration=0.05, workers=1, stdout=stdout,
+        )
+        self.assertIn('pbkdf2_sha256 iterations=1000', stdout.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_hashers', candidate=['pbkdf2_sha256:rounds=3'], stdout=StringIO())
+
+
+class StopLoop(Exception):
+    pass
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, RATELIMIT_ENABLE=False)
+class LoginNotificationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='Pass-word-1', is_email_verified=True)
+
+    def record(self, user_agent=CHROME_ON_WINDOWS, age=3600, user=None):
+        event = LoginEvent.objects.create(
+            user=user or self.user, user_agent=user_agent, ip_address='203.0.113.7',
+            ua_hash=hashlib.sha256(user_agent.encode()).hexdigest(),
+        )
+        LoginEvent.objects.filter(pk=event.pk).update(created_at=timezone.now() - timedelta(seconds=age))
+        return event
+
+    def run_command(self, **options):
+        call_command('send_login_notifications', stdout=StringIO(), **options)
+
+    def test_login_records_event_without_sending(self):
+        Client(HTTP_USER_AGENT=CHROME_ON_WINDOWS).post(
+            reverse('accounts:login'), {'username': 'user@example.com', 'password': 'Pass-word-1'}
+        )
+        event = LoginEvent.objects.get()
+        self.assertEqual(event.user, self.user)
+        self.assertEqual(event.backend, 'accounts.backends.EmailBackend')
+        self.assertIsNone(event.notified_at)
+        self.assertEqual(mail.outbox, [])
+
+    def test_logins_from_one_browser_coalesced(self):
+        for age in (3600, 3000, 2400):
+            self.record(age=age)
+        self.record(user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15')
+        self.run_command()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+        self.assertFalse(LoginEvent.objects.filter(notified_at__isnull=True).exists())
+        # Nothing is sent twice
+        self.run_command()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_recent_logins_wait_for_window(self):
+        self.record(age=10)
+        self.run_command(window=600)
+        self.assertEqual(mail.outbox, [])
+        self.assertTrue(LoginEvent.objects.filter(notified_at__isnull=True).exists())
+
+    def test_opted_out_users_skipped(self):
+        UserProfile.objects.filter(user=self.user).update(login_notifications=False)
+        self.record()
+        self.run_command()
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(LoginEvent.objects.filter(notified_at__isnull=True).exists())
+
+    def test_failed_send_left_pending_and_raised_once(self):
+        self.record()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            with self.assertRaises(OSError):
+                self.run_command()
+        self.assertTrue(LoginEvent.objects.filter(notified_at__isnull=True).exists())
+
+    def test_loop_survives_send_failures(self):
+        self.record()
+        real_send = mail.backends.locmem.EmailBackend.send_messages
+        failures = [OSError('down'), OSError('still down')]
+
+        def send_messages(backend, messages):
+            if failures:
+                raise failures.pop(0)
+            return real_send(backend, messages)
+
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 3:
+                raise StopLoop
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send_messages), \
+                mock.patch('accounts.management.commands.send_login_notifications.time.sleep', sleep):
+            with self.assertLogs('accounts.management.commands.send_login_notifications', 'ERROR') as logs:
+                with self.assertRaises(StopLoop):
+                    self.run_command(loop=True, interval=30)
+        self.assertEqual(len(logs.records), 2)
+        # Backs off after each failure, then returns to the normal interval
+        self.assertEqual(sleeps, [60, 120, 30])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(LoginEvent.objects.filter(notified_at__isnull=True).exists())
+
+
+IMPORT_CSV = """email,username,first_name,password,is_email_verified,date_of_birth,bio
+alice@Example.com,alice,Alice,,yes,1990-02-01,Hi
+not-an-email,,,,,,
+ALICE@example.com,,,,,,
+bob@example.com,bob,Bob,hunter2,,,
+carol@example.com,carol,Carol,,maybe,,
+dave@example.com,dave,Dave,,,1990-13-01,
+existing@EXAMPLE.com,,,,,,
+erin@example.com,alice,,,,,
+"""
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ImportUsersTests(TempDirMixin, TestCase):
+    def write(self, name, content):
+        with open(self.path(name), 'w', encoding='utf-8') as f:
+            f.write(content)
+        return self.path(name)
+
+    def import_users(self, *args):
+        stdout = StringIO()
+        call_command('import_users', *args, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def rejected(self):
+        with open(self.path('errors.tsv'), encoding='utf-8') as f:
+            return [line.split('\t', 1) for line in f.read().splitlines()]
+
+    def test_import_csv(self):
+        User.objects.create_user(email='existing@example.com', password='x')
+        path = self.write('users.csv', IMPORT_CSV)
+        output = self.import_users(path, '--errors', self.path('errors.tsv'))
+        self.assertIn('1 users imported, 7 rows rejected', output)
+        self.assertEqual([line for line, _ in self.rejected()], ['3', '4', '5', '6', '7', '8', '9'])
+        errors = dict(self.rejected())
+        self.assertIn('Duplicate email', errors['4'])
+        self.assertIn('not a raw password', errors['5'])
+        self.assertIn('not a boolean', errors['6'])
+        self.assertIn('not an ISO 8601 date', errors['7'])
+        self.assertIn('already exists', errors['8'])
+        self.assertIn('Duplicate username alice', errors['9'])
+
+        user = User.objects.get(email='alice@example.com')
+        self.assertEqual(user.username, 'alice')
+        self.assertTrue(user.is_email_verified)
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(str(user.profile.date_of_birth), '1990-02-01')
+        self.assertEqual(user.profile.bio, 'Hi')
+        # The rows the post_save receivers would have created
+        self.assertTrue(UserTwoFactorSettings.objects.filter(user=user).exists())
+        wallet_model = bulk.get_wallet_model()
+        self.assertEqual(wallet_model.objects.filter(user=user).count(), len(wallet_model.ASSET_CHOICES))
+
+    def test_import_ndjson(self):
+        password = make_password('s3cret-pass')
+        path = self.write('users.ndjson', '\n'.join([
+            f'{{"email": "alice@example.com", "password": "{password}", "is_active": false}}',
+            '{"email": ',
+            '["bob@example.com"]',
+            '',
+            '{"email": "carol@example.com", "date_joined": "2024-01-02T03:04:05"}',
+        ]))
+        output = self.import_users(path, '--errors', self.path('errors.tsv'), '--no-wallets', '--chunk-size', '2')
+        self.assertIn('2 users imported, 2 rows rejected', output)
+        self.assertEqual([line for line, _ in self.rejected()], ['2', '3'])
+        alice = User.objects.get(email='alice@example.com')
+        self.assertTrue(alice.check_password('s3cret-pass'))
+        self.assertFalse(alice.is_active)
+        carol = User.objects.get(email='carol@example.com')
+        self.assertEqual(carol.date_joined.isoformat(), '2024-01-02T03:04:05+00:00')
+        self.assertFalse(bulk.get_wallet_model().objects.exists())
+
+    def test_dry_run(self):
+        path = self.write('users.csv', 'email\nalice@example.com\n')
+        self.assertIn('1 users would be imported', self.import_users(path, '--dry-run'))
+        self.assertFalse(User.objects.exists())
+
+    def test_clash_during_insert(self):
+        rows = [(1, {'email': 'alice@example.com'}), (2, {'email': 'bob@example.com'})]
+        # The batch clashes with an account created meanwhile, then only bob's row does
+        with mock.patch.object(bulk, '_insert', side_effect=[IntegrityError, None, IntegrityError('bob')]) as insert:
+            created, errors = bulk.import_chunk(rows, bulk.import_defaults())
+        self.assertEqual(created, 1)
+        self.assertEqual(errors, [(2, 'Could not be created: bob')])
+        self.assertEqual(insert.call_count, 3)
+
+    def test_missing_file(self):
+        with self.assertRaisesMessage(CommandError, 'Cannot read'):
+            self.import_users(self.path('missing.csv'))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ExportUsersTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user(email='alice@example.com', password='s3cret-pass', first_name='Alice')
+        self.alice.profile.date_of_birth = '1990-02-01'
+        self.alice.profile.save()
+        User.objects.create_user(email='bob@example.com', password='x', is_active=False)
+
+    def export(self, name, *args):
+        call_command('export_users', '--output', self.path(name), *args, stdout=StringIO())
+        with open(self.path(name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_export_csv(self):
+        lines = self.export('users.csv', '--active-only').splitlines()
+        self.assertEqual(lines[0], ','.join(bulk.export_columns()))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('alice@example.com,,Alice,,True,'))
+        self.assertIn('1990-02-01', lines[1])
+        self.assertNotIn('md5$', lines[1])
+
+    def test_round_trip(self):
+        self.export('users.ndjson', '--with-password-hashes')
+        User.objects.all().delete()
+        call_command('import_users', self.path('users.ndjson'), stdout=StringIO(), stderr=StringIO())
+        alice = User.objects.get(email='alice@example.com')
+        self.assertTrue(alice.check_password('s3cret-pass'))
+        self.assertEqual(alice.first_name, 'Alice')
+        self.assertEqual(str(alice.profile.date_of_birth), '1990-02-01')
+        self.assertFalse(User.objects.get(email='bob@example.com').is_active)
+
+    def test_joined_since(self):
+        User.objects.filter(email='bob@example.com').update(date_joined=timezone.now() - timedelta(days=10))
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.assertEqual(len(self.export('users.ndjson', '--joined-since', since).splitlines()), 1)
+        with self.assertRaisesMessage(CommandError, '--joined-since must be a date'):
+            self.export('users.ndjson', '--joined-since', 'yesterday')
@@ -17,6 +17,10 @@ urlpatterns = [
          views.password_reset_confirm_view, name='password_reset_confirm'),
     path('password-change/', views.password_change_view, name='password_change'),
     
+    # Sessions
+    path('sessions/<int:session_id>/revoke/', views.revoke_session_view, name='revoke_session'),
+    path('sessions/revoke-others/', views.revoke_other_sessions_view, name='revoke_other_sessions'),
+    
     # Profile management
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.profile_update_view, name='profile_edit'),
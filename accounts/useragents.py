@@ -0,0 +1,92 @@
+import functools
+import re
+from collections import namedtuple
+
+UserAgent = namedtuple('UserAgent', ['browser', 'browser_version', 'os', 'os_version', 'device'])
+
+UNKNOWN = UserAgent('Unknown', '', 'Unknown', '', 'Desktop')
+
+# Distinct User-Agent strings remembered by parse_user_agent
+CACHE_SIZE = 4096
+
+# First match wins. Browsers that embed another browser's token must come
+# first: Edge and Opera UAs contain "Chrome", Chrome UAs contain "Safari".
+BROWSER_RULES = [
+    (re.compile(pattern), name) for pattern, name in [
+        (r'\b(?:bot|crawler|spider|slurp)\b|Googlebot|bingbot', 'Bot'),
+        (r'(?:Edg|Edge|EdgA|EdgiOS)/(\d+[\d.]*)', 'Edge'),
+        (r'(?:OPR|Opera)/(\d+[\d.]*)', 'Opera'),
+        (r'SamsungBrowser/(\d+[\d.]*)', 'Samsung Internet'),
+        (r'(?:Firefox|FxiOS)/(\d+[\d.]*)', 'Firefox'),
+        (r'(?:Chrome|CriOS|Chromium)/(\d+[\d.]*)', 'Chrome'),
+        (r'Version/(\d+[\d.]*).*Safari/', 'Safari'),
+        (r'(?:MSIE |Trident/.*rv:)(\d+[\d.]*)', 'Internet Explorer'),
+    ]
+]
+
+# iOS and Android UAs also mention "like Mac OS X" and "Linux"
+OS_RULES = [
+    (re.compile(pattern), name) for pattern, name in [
+        (r'Windows NT (\d+\.\d+)', 'Windows'),
+        (r'iPad(?:.*? OS (\d+[_\d]*))?', 'iPadOS'),
+        (r'(?:iPhone|CPU) OS (\d+[_\d]*)', 'iOS'),
+        (r'Android ?(\d+[\d.]*)?', 'Android'),
+        (r'CrOS', 'Chrome OS'),
+        (r'Mac OS X (\d+[_.\d]*)', 'macOS'),
+        (r'Linux', 'Linux'),
+    ]
+]
+
+WINDOWS_VERSIONS = {'10.0': '10', '6.3': '8.1', '6.2': '8', '6.1': '7'}
+
+BOT_RE = BROWSER_RULES[0][0]
+TABLET_RE = re.compile(r'iPad|Tablet|Android(?!.*Mobile)')
+MOBILE_RE = re.compile(r'Mobi|iPhone|iPod|Windows Phone')
+
+
+def _match(rules, user_agent):
+    for pattern, name in rules:
+        match = pattern.search(user_agent)
+        if match:
+            version = match.group(1) if match.groups() else None
+            return name, (version or '').replace('_', '.')
+    return 'Unknown', ''
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_user_agent(user_agent):
+    """
+    Classify a User-Agent string as a UserAgent tuple of browser, browser
+    version, OS, OS version and device ('Desktop', 'Mobile', 'Tablet' or
+    'Bot'). Results are cached per distinct string.
+    """
+    if not user_agent:
+        return UNKNOWN
+
+    browser, browser_version = _match(BROWSER_RULES, user_agent)
+    os_name, os_version = _match(OS_RULES, user_agent)
+    if os_name == 'Windows':
+        os_version = WINDOWS_VERSIONS.get(os_version, os_version)
+
+    if BOT_RE.search(user_agent):
+        device = 'Bot'
+    elif TABLET_RE.search(user_agent):
+        device = 'Tablet'
+    elif MOBILE_RE.search(user_agent):
+        device = 'Mobile'
+    else:
+        device = 'Desktop'
+    return UserAgent(browser, browser_version, os_name, os_version, device)
+
+
+def describe_browser(agent):
+    """
+    Short label such as 'Chrome 124' for emails and session listings.
+    """
+    if not agent.browser_version:
+        return agent.browser
+    return f"{agent.browser} {agent.browser_version.split('.')[0]}"
+
+
+def describe_os(agent):
+    return f'{agent.os} {agent.os_version}'.strip()
@@ -1,3 +1,4 @@
+import hashlib
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.mail import EmailMessage
@@ -7,6 +8,9 @@ from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_str
 from django.contrib.auth import get_user_model
+from .geoip import lookup_location
+from .models import LoginEvent
+from .useragents import describe_browser, describe_os, parse_user_agent
 
 User = get_user_model()
 
@@ -120,53 +124,43 @@ def send_welcome_email(user, request):
     email.content_subtype = 'html'
     email.send()
 
-def send_login_notification(user, request):
+def record_login_event(user, request):
+    """
+    Record a successful login; send_login_notifications emails it later.
+    """
+    user_agent = request.META.get('HTTP_USER_AGENT', '')[:512]
+    return LoginEvent.objects.create(
+        user=user,
+        ip_address=request.META.get('REMOTE_ADDR') or None,
+        user_agent=user_agent,
+        ua_hash=hashlib.sha256(user_agent.encode()).hexdigest(),
+        backend=getattr(user, 'backend', '') or '',
+    )
+
+def build_login_notification(user, events, site_url):
     """
-    Send login notification email.
+    Build (without sending) one login notification email covering ``events``,
+    a list of LoginEvent rows from the same browser ordered by time.
     """
-    site_url = get_site_url(request)
-    mail_subject = 'New login to your account'
-    
-    # Get IP address from request
-    ip_address = request.META.get('REMOTE_ADDR', 'Unknown')
-    
-    # Get user agent information
-    user_agent = request.META.get('HTTP_USER_AGENT', 'Unknown')
-    
-    # Simple user agent parsing (in a real app, you might use a library for this)
-    browser = 'Unknown'
-    device = 'Unknown'
-    
-    if 'Mobile' in user_agent:
-        device = 'Mobile'
-    elif 'Tablet' in user_agent:
-        device = 'Tablet'
-    else:
-        device = 'Desktop'
-        
-    if 'Firefox' in user_agent:
-        browser = 'Firefox'
-    elif 'Chrome' in user_agent:
-        browser = 'Chrome'
-    elif 'Safari' in user_agent:
-        browser = 'Safari'
-    elif 'Edge' in user_agent:
-        browser = 'Edge'
-    elif 'MSIE' in user_agent or 'Trident' in user_agent:
-        browser = 'Internet Explorer'
-    
+    latest = events[-1]
+    agent = parse_user_agent(latest.user_agent)
+
     message = render_to_string('accounts/emails/login_notification.html', {
         'user': user,
         'site_url': site_url,
-        'ip_address': ip_address,
-        'device': device,
-        'browser': browser,
-        'location': 'Unknown',  # In a real app, you might use IP geolocation
+        'ip_address': latest.ip_address or 'Unknown',
+        'device': agent.device,
+        'browser': describe_browser(agent),
+        'operating_system': describe_os(agent),
+        'location': lookup_location(latest.ip_address) or 'Unknown',
+        'login_at': latest.created_at,
+        'first_login_at': events[0].created_at,
+        'login_count': len(events),
     })
-    
-    email = EmailMessage(mail_subject, message, to=[user.email])
+
+    email = EmailMessage('New login to your account', message, to=[user.email])
     email.content_subtype = 'html'
-    email.send()
+    return email
 
 def verify_account_activation_token(uidb64, token):
     """
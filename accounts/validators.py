@@ -0,0 +1,34 @@
+from django.contrib.auth.password_validation import CommonPasswordValidator
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext as _
+from .breached import get_index
+
+
+class BreachedPasswordValidator:
+    """
+    Reject passwords found in the breached password index built by
+    `python manage.py build_breached_index`. Like CommonPasswordValidator,
+    the lowercased password is checked as well.
+
+    Until the index exists, Django's list of common passwords is used instead.
+    """
+    def __init__(self):
+        self._fallback = None
+
+    def validate(self, password, user=None):
+        index = get_index()
+        if index is None:
+            if self._fallback is None:
+                self._fallback = CommonPasswordValidator()
+            self._fallback.validate(password, user)
+            return
+
+        candidates = {password, password.lower().strip()}
+        if any(index.contains_password(candidate) for candidate in candidates):
+            raise ValidationError(
+                _('This password has appeared in a data breach and can’t be used.'),
+                code='password_breached',
+            )
+
+    def get_help_text(self):
+        return _('Your password can’t be one that has appeared in a known data breach.')
@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, authenticate, logout, get_user_model, update_session_auth_hash
+from django.contrib.auth import login, logout, get_user_model, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib import messages
@@ -8,12 +8,17 @@ from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
 from django.views.decorators.http import require_http_methods
 from django.urls import reverse
+from django.core.exceptions import ValidationError
+from core.ratelimit import ratelimit
+from core.uploadhandlers import get_upload_errors
 
 from .forms import (
     SignupForm, LoginForm, CustomPasswordResetForm, 
     CustomSetPasswordForm, CustomPasswordChangeForm, ProfileUpdateForm, EmailChangeForm
 )
-from .models import UserProfile
+from .images import schedule_profile_images, set_profile_image
+from .models import UserProfile, UserSession
+from .sessions import revoke_sessions
 from .tokens import account_activation_token
 from .utils import (
     send_activation_email, 
@@ -21,7 +26,7 @@ from .utils import (
     verify_account_activation_token,
     send_password_change_notification, 
     send_welcome_email,
-    send_login_notification,
+    record_login_event,
     send_email_change_verification
 )
 
@@ -40,11 +45,9 @@ def signup_view(request):
             user = form.save(commit=False)
             user.is_active = True
             user.is_email_verified = False
+            # Saving also creates the profile and 2FA settings (see signals)
             user.save()
-            
-            # Create user profile if it doesn't exist
-            UserProfile.objects.get_or_create(user=user)
-            
+
             # Send activation email
             send_activation_email(user, request)
             
@@ -103,6 +106,8 @@ def verify_email_change_view(request, uidb64, token):
         messages.error(request, 'Verification link is invalid or has expired.')
         return redirect('accounts:login')
 
+@ratelimit('login', key='ip', rate='30/5m')
+@ratelimit('login', key='post:username', rate='10/15m')
 def login_view(request):
     """
     Handle user login.
@@ -113,19 +118,16 @@ def login_view(request):
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
         if form.is_valid():
-            email = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(request, username=email, password=password)
+            # The form already authenticated; checking the password again
+            # would run the (deliberately slow) hasher a second time
+            user = form.get_user()
+            login(request, user, backend=user.backend)
             
-            if user is not None:
-                login(request, user)
-                
-                # Send login notification email
-                # You might want to add a user preference to enable/disable these
-                send_login_notification(user, request)
-                
-                next_url = request.GET.get('next', 'home')
-                return redirect(next_url)
+            # Emailed later by the send_login_notifications worker
+            record_login_event(user, request)
+            
+            next_url = request.GET.get('next', 'home')
+            return redirect(next_url)
         # Form errors will be displayed by the template
     else:
         form = LoginForm()
@@ -151,6 +153,8 @@ def password_change_view(request):
             user = form.save()
             # Update the session to prevent the user from being logged out
             update_session_auth_hash(request, user)
+            # ...and log out every other session
+            revoke_sessions(user, keep=request.session.session_key)
             
             # Send password change notification
             send_password_change_notification(user, request)
@@ -162,6 +166,8 @@ def password_change_view(request):
     
     return render(request, 'accounts/auth/password_change.html', {'form': form})
 
+@ratelimit('password_reset', key='ip', rate='10/h')
+@ratelimit('password_reset', key='post:email', rate='3/h')
 def password_reset_view(request):
     """
     Handle password reset request and ensure user is logged out afterward.
@@ -202,6 +208,7 @@ def password_reset_confirm_view(request, uidb64, token):
         form = CustomSetPasswordForm(user, request.POST)
         if form.is_valid():
             form.save()
+            revoke_sessions(user)
             messages.success(request, 'Your password has been reset. You can now log in.')
             return redirect('accounts:login')
     else:
@@ -209,6 +216,30 @@ def password_reset_confirm_view(request, uidb64, token):
     
     return render(request, 'accounts/auth/password_reset_confirm.html', {'form': form})
 
+@login_required
+@require_http_methods(['POST'])
+def revoke_session_view(request, session_id):
+    """
+    Log out one of the user's other sessions.
+    """
+    session = get_object_or_404(UserSession, pk=session_id, user=request.user)
+    if session.session_key == request.session.session_key:
+        messages.error(request, 'Use log out to end the session you are using.')
+    else:
+        revoke_sessions(request.user, ids=[session.pk])
+        messages.success(request, f'{session.user_agent or "The session"} has been logged out.')
+    return redirect('twofactor:security_settings')
+
+@login_required
+@require_http_methods(['POST'])
+def revoke_other_sessions_view(request):
+    """
+    Log out every session of the user except this one.
+    """
+    count = revoke_sessions(request.user, keep=request.session.session_key)
+    messages.success(request, f'Logged out {count} other session{"s" if count != 1 else ""}.')
+    return redirect('twofactor:security_settings')
+
 @login_required
 def profile_view(request):
     """
@@ -241,6 +272,7 @@ def profile_update_view(request):
             profile.bio = form.cleaned_data['bio']
             profile.location = form.cleaned_data['location']
             profile.date_of_birth = form.cleaned_data['date_of_birth']
+            profile.login_notifications = form.cleaned_data['login_notifications']
             profile.save()
             
             # For regular requests, add a message and redirect
@@ -281,19 +313,38 @@ def profile_images_update_view(request):
         avatar_updated = False
         cover_updated = False
         
-        # Handle avatar update
-        if 'avatar' in request.FILES:
-            profile.avatar = request.FILES['avatar']
-            avatar_updated = True
+        # Files refused while streaming never reach request.FILES
+        upload_errors = get_upload_errors(request)
+        if upload_errors:
+            error_msg = next(iter(upload_errors.values()))
+            if not is_ajax:
+                messages.error(request, error_msg)
+                return redirect('accounts:profile_edit_images')
+            return JsonResponse({'success': False, 'message': error_msg})
         
-        # Handle cover photo update
-        if 'cover_photo' in request.FILES:
-            profile.cover_photo = request.FILES['cover_photo']
-            cover_updated = True
+        # Handle avatar and cover photo updates
+        changed = []
+        try:
+            if 'avatar' in request.FILES:
+                if set_profile_image(profile, 'avatar', request.FILES['avatar']):
+                    changed.append('avatar')
+                avatar_updated = True
+            if 'cover_photo' in request.FILES:
+                if set_profile_image(profile, 'cover_photo', request.FILES['cover_photo']):
+                    changed.append('cover_photo')
+                cover_updated = True
+        except ValidationError as e:
+            if not is_ajax:
+                messages.error(request, e.messages[0])
+                return redirect('accounts:profile_edit_images')
+            return JsonResponse({'success': False, 'message': e.messages[0]})
         
         # Save changes if any
         if avatar_updated or cover_updated:
-            profile.save()
+            if changed:
+                profile.save()
+                # Strip metadata and build the resized copies off-request
+                schedule_profile_images(profile, changed)
             
             # Create appropriate success message
             if avatar_updated and cover_updated:
@@ -0,0 +1,10 @@
+// Files scanned for class names; anything not found here is purged.
+// Forms and widgets set Tailwind classes from Python.
+module.exports = [
+    './*/templates/**/*.html',
+    './templates/**/*.html',
+    './*/forms.py',
+    './*/widgets.py',
+    './*/templatetags/*.py',
+    './static/js/**/*.js',
+];
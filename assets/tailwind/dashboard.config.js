@@ -0,0 +1,24 @@
+// staking/templates/dash_base.html
+module.exports = {
+    content: require('./content'),
+    darkMode: 'class',
+    theme: {
+        extend: {
+            colors: {
+                primary: {
+                    50: '#f0f9ff',
+                    100: '#e0f2fe',
+                    400: '#38bdf8',
+                    500: '#0ea5e9',
+                    600: '#0284c7',
+                    700: '#0369a1'
+                },
+                dark: {
+                    700: '#374151',
+                    800: '#1f2937',
+                    900: '#111827'
+                }
+            }
+        }
+    }
+};
@@ -0,0 +1,68 @@
+// core/templates/main_base.html
+module.exports = {
+    content: require('./content'),
+    darkMode: 'class',
+    theme: {
+        extend: {
+            colors: {
+                primary: {
+                    50: '#f0f9ff',
+                    100: '#e0f2fe',
+                    200: '#bae6fd',
+                    300: '#7dd3fc',
+                    400: '#38bdf8',
+                    500: '#0ea5e9',
+                    600: '#0284c7',
+                    700: '#0369a1',
+                    800: '#075985',
+                    900: '#0c4a6e',
+                },
+                dark: {
+                    800: '#1e293b',
+                    900: '#0f172a'
+                }
+            },
+            animation: {
+                'gradient-x': 'gradient-x 8s ease infinite',
+                'gradient-y': 'gradient-y 8s ease infinite',
+                'gradient-xy': 'gradient-xy 8s ease infinite',
+                'float': 'float 6s ease-in-out infinite',
+                'pulse-slow': 'pulse 4s cubic-bezier(0.4, 0, 0.6, 1) infinite'
+            },
+            keyframes: {
+                'gradient-x': {
+                    '0%, 100%': {
+                        'background-size': '200% 200%',
+                        'background-position': 'left center'
+                    },
+                    '50%': {
+                        'background-size': '200% 200%',
+                        'background-position': 'right center'
+                    }
+                },
+                'gradient-y': {
+                    '0%, 100%': {
+                        'background-size': '400% 400%',
+                        'background-position': 'center top'
+                    },
+                    '50%': {
+                        'background-size': '200% 200%',
+                        'background-position': 'center bottom'
+                    }
+                },
+                'gradient-xy': {
+                    '0%, 100%': {
+                        'background-position': '0% 50%'
+                    },
+                    '50%': {
+                        'background-position': '100% 50%'
+                    }
+                },
+                'float': {
+                    '0%, 100%': { transform: 'translateY(0)' },
+                    '50%': { transform: 'translateY(-20px)' }
+                }
+            }
+        }
+    }
+};
@@ -0,0 +1,6 @@
+"""
+Repeatable performance benchmarks for the hot views and admin actions.
+
+Run them with ``python manage.py run_benchmarks``; everything they write to
+the database is rolled back.
+"""
@@ -0,0 +1,300 @@
+import datetime
+import itertools
+import random
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.utils import timezone
+from accounts.models import User, UserProfile
+from staking.models import AssetWallet, Plan, Stake, Transaction
+from staking.management.commands.init_exchange_rates import DEFAULT_USDT_RATES
+from staking.rates import bulk_upsert_rates, invalidate_rates
+from twofactor.models import UserTwoFactorSettings
+
+EMAIL_DOMAIN = 'benchmark.invalid'
+PASSWORD = 'benchmark-password'
+
+ASSET_TYPES = [choice[0] for choice in AssetWallet.ASSET_CHOICES]
+
+# (name, duration_days, roi_percentage, minimum_amount)
+PLANS = [
+    ('Benchmark 30', 30, Decimal('5.00'), Decimal('10.00')),
+    ('Benchmark 90', 90, Decimal('12.50'), Decimal('100.00')),
+    ('Benchmark 365', 365, Decimal('40.00'), Decimal('1000.00')),
+]
+
+# Relative weights of (transaction_type, status) in the generated history
+TRANSACTION_MIX = [
+    (('DEPOSIT', 'CONFIRMED'), 30),
+    (('DEPOSIT', 'PENDING'), 10),
+    (('WITHDRAWAL', 'CONFIRMED'), 10),
+    (('WITHDRAWAL', 'PENDING'), 5),
+    (('STAKE', 'CONFIRMED'), 15),
+    (('REWARD', 'CONFIRMED'), 15),
+    (('SWAP', 'CONFIRMED'), 15),
+]
+
+# Shape parameter of the 'pareto' count distribution; lower is more skewed
+PARETO_ALPHA = 1.5
+
+
+class Distribution:
+    """
+    How many stakes and transactions each generated user gets and what
+    their rows look like.
+
+    ``shape`` spreads the per-user counts around their mean: 'fixed' (every
+    user gets the mean), 'uniform' (0 to twice the mean), 'exponential' or
+    'pareto' (a few heavy users).
+    """
+    SHAPES = ('fixed', 'uniform', 'exponential', 'pareto')
+
+    def __init__(self, stakes_per_user=2, transactions_per_user=20, shape='uniform', two_factor_ratio=0.1,
+                 max_balance=1000, transaction_mix=TRANSACTION_MIX):
+        if shape not in self.SHAPES:
+            raise ValueError(f'Unknown distribution shape: {shape}')
+        self.stakes_per_user = stakes_per_user
+        self.transactions_per_user = transactions_per_user
+        self.shape = shape
+        self.two_factor_ratio = two_factor_ratio
+        self.max_balance = max_balance
+        self.transaction_kinds, self.transaction_weights = zip(*transaction_mix)
+
+    def count(self, rng, mean):
+        if self.shape == 'fixed' or not mean:
+            return mean
+        if self.shape == 'uniform':
+            return rng.randint(0, 2 * mean)
+        if self.shape == 'exponential':
+            return int(rng.expovariate(1 / mean))
+        return int(mean * (PARETO_ALPHA - 1) / PARETO_ALPHA * rng.paretovariate(PARETO_ALPHA))
+
+
+class Dataset:
+    """
+    Handles to the rows seed_dataset() created.
+    """
+    def __init__(self, user_ids, plans, sample_user, two_factor_user):
+        self.user_ids = user_ids
+        self.plans = plans
+        # Has exactly the mean number of stakes and transactions, no 2FA
+        self.sample_user = sample_user
+        # Has 2FA enabled and recently verified
+        self.two_factor_user = two_factor_user
+
+
+def email_for(index, prefix='user'):
+    return f'{prefix}{index:07d}@{EMAIL_DOMAIN}'
+
+
+# Columns written by _insert_rows, in the order of the generated tuples
+WALLET_FIELDS = ('user', 'asset_type', 'balance')
+STAKE_FIELDS = ('user', 'plan', 'asset_wallet', 'amount', 'start_date', 'end_date', 'is_active', 'status')
+TRANSACTION_FIELDS = (
+    'user', 'asset_wallet', 'transaction_type', 'amount', 'status', 'timestamp',
+    'transaction_hash', 'destination_address', 'to_asset_wallet', 'to_amount', 'exchange_rate',
+)
+
+EIGHT_PLACES = Decimal('1E-8')
+
+
+def _amount(rng, low, high):
+    # Decimal columns take their text form; only swaps need a Decimal
+    return f'{rng.uniform(low, high):.8f}'
+
+
+def _db_value(model, field, value):
+    return model._meta.get_field(field).get_db_prep_save(value, connection)
+
+
+def _bulk_create(model, rows, batch_size):
+    """
+    Insert rows from an iterable in batches without holding them all in
+    memory. Returns the number of rows inserted.
+    """
+    rows = iter(rows)
+    total = 0
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return total
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        total += len(batch)
+
+
+def _insert_rows(model, fields, rows, batch_size):
+    """
+    Insert tuples of database-ready values for ``fields`` with executemany.
+    Returns the number of rows inserted.
+
+    At millions of rows, building a model instance per row and preparing
+    every value in bulk_create costs several times the insert itself. Rows
+    must supply every non-null column, as model defaults aren't applied.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+    sql = f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})"
+    rows = iter(rows)
+    total = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                return total
+            cursor.executemany(sql, batch)
+            total += len(batch)
+
+
+def insert_users(indices, rng, distribution, password, plans, batch_size=1000, prefix='user'):
+    """
+    Bulk insert one user per index with a profile, 2FA settings, a wallet
+    per asset, stakes and transactions drawn from ``distribution``.
+
+    Signals are not sent, so the profile and 2FA rows they would create are
+    inserted here. ``password`` is an already hashed password shared by all
+    users. Returns (user ids, {model name: rows inserted}).
+    """
+    now = timezone.now()
+    user_ids = []
+    for start in range(0, len(indices), batch_size):
+        created = User.objects.bulk_create([
+            User(email=email_for(index, prefix), password=password, is_email_verified=True)
+            for index in indices[start:start + batch_size]
+        ])
+        user_ids.extend(user.pk for user in created)
+    if user_ids and user_ids[0] is None:
+        # Backends that can't return ids from a bulk insert
+        emails = [email_for(index, prefix) for index in indices]
+        ids_by_email = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+        user_ids = [ids_by_email[email] for email in emails]
+
+    counts = {'users': len(user_ids)}
+    two_factor_ids = {user_id for user_id in user_ids if rng.random() < distribution.two_factor_ratio}
+    counts['profiles'] = _bulk_create(UserProfile, (UserProfile(user_id=user_id) for user_id in user_ids), batch_size)
+    counts['two_factor_settings'] = _bulk_create(UserTwoFactorSettings, (
+        UserTwoFactorSettings(
+            user_id=user_id,
+            is_enabled=user_id in two_factor_ids,
+            totp_secret='JBSWY3DPEHPK3PXP' if user_id in two_factor_ids else None,
+            last_verified=now if user_id in two_factor_ids else None,
+        )
+        for user_id in user_ids
+    ), batch_size)
+    counts['wallets'] = _insert_rows(AssetWallet, WALLET_FIELDS, (
+        (user_id, asset_type, _amount(rng, 0, distribution.max_balance))
+        for user_id in user_ids for asset_type in ASSET_TYPES
+    ), batch_size * len(ASSET_TYPES))
+
+    # Everything that doesn't vary per row is prepared once
+    created_at = _db_value(Transaction, 'timestamp', now)
+    end_dates = {}
+    plan_bounds = [
+        (plan.pk, plan.duration_days, float(plan.minimum_amount), float(plan.minimum_amount) * 10) for plan in plans
+    ]
+    kinds = distribution.transaction_kinds
+    cum_weights = list(itertools.accumulate(distribution.transaction_weights))
+    swap_rates = {
+        (from_asset, to_asset): (DEFAULT_USDT_RATES[from_asset] / DEFAULT_USDT_RATES[to_asset]).quantize(Decimal('1E-12'))
+        for from_asset in ASSET_TYPES for to_asset in ASSET_TYPES if from_asset != to_asset
+    }
+
+    counts['stakes'] = counts['transactions'] = 0
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        wallets = {}
+        for wallet_id, user_id, asset_type in AssetWallet.objects.filter(user_id__in=chunk).values_list('id', 'user_id', 'asset_type'):
+            wallets.setdefault(user_id, {})[asset_type] = wallet_id
+
+        stakes, transactions = [], []
+        for user_id in chunk:
+            user_wallets = wallets[user_id]
+            for _ in range(distribution.count(rng, distribution.stakes_per_user)):
+                plan_id, duration_days, low, high = rng.choice(plan_bounds)
+                days = rng.randint(1, duration_days)
+                end_date = end_dates.get(days)
+                if end_date is None:
+                    end_date = end_dates[days] = _db_value(Stake, 'end_date', now + datetime.timedelta(days=days))
+                stakes.append((
+                    user_id, plan_id, user_wallets[rng.choice(ASSET_TYPES)], _amount(rng, low, high),
+                    created_at, end_date, True, 'ACTIVE',
+                ))
+            for _ in range(distribution.count(rng, distribution.transactions_per_user)):
+                transaction_type, status = rng.choices(kinds, cum_weights=cum_weights)[0]
+                from_asset, to_asset = rng.sample(ASSET_TYPES, 2)
+                amount = _amount(rng, 0.001, 100)
+                transaction_hash = destination_address = to_wallet_id = to_amount = exchange_rate = None
+                if transaction_type == 'SWAP':
+                    to_wallet_id = user_wallets[to_asset]
+                    rate = swap_rates[from_asset, to_asset]
+                    to_amount = str((Decimal(amount) * rate).quantize(EIGHT_PLACES))
+                    exchange_rate = str(rate)
+                elif transaction_type == 'DEPOSIT':
+                    transaction_hash = f'{rng.getrandbits(256):064x}'
+                elif transaction_type == 'WITHDRAWAL':
+                    destination_address = f'bc1q{rng.getrandbits(160):040x}'
+                transactions.append((
+                    user_id, user_wallets[from_asset], transaction_type, amount, status, created_at,
+                    transaction_hash, destination_address, to_wallet_id, to_amount, exchange_rate,
+                ))
+        counts['stakes'] += _insert_rows(Stake, STAKE_FIELDS, stakes, batch_size)
+        counts['transactions'] += _insert_rows(Transaction, TRANSACTION_FIELDS, transactions, batch_size)
+    return user_ids, counts
+
+
+def get_or_create_plans():
+    """
+    The existing staking plans, or the PLANS above when there are none.
+    """
+    plans = list(Plan.objects.order_by('pk'))
+    if not plans:
+        plans = Plan.objects.bulk_create([
+            Plan(name=name, duration_days=days, roi_percentage=roi, minimum_amount=minimum)
+            for name, days, roi, minimum in PLANS
+        ])
+    return plans
+
+
+def seed_dataset(users, seed=0, distribution=None, batch_size=1000):
+    """
+    Insert a synthetic dataset with bulk inserts: users with profiles and 2FA
+    settings, a wallet per asset each, stakes, transactions, plans and rates.
+
+    The first user gets exactly the mean number of stakes and transactions
+    and no 2FA, the second has 2FA enabled. The same arguments always produce
+    the same rows (apart from auto_now_add timestamps). Run it inside a
+    transaction that is rolled back.
+    """
+    distribution = distribution or Distribution()
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)  # hashed once, not once per user
+
+    plans = Plan.objects.bulk_create([
+        Plan(name=name, duration_days=days, roi_percentage=roi, minimum_amount=minimum)
+        for name, days, roi, minimum in PLANS
+    ])
+    bulk_upsert_rates(DEFAULT_USDT_RATES)
+    # The rate caches are normally refreshed on commit, which never comes
+    invalidate_rates()
+
+    pinned = {
+        'stakes_per_user': distribution.stakes_per_user,
+        'transactions_per_user': distribution.transactions_per_user,
+        'max_balance': distribution.max_balance,
+        'transaction_mix': list(zip(distribution.transaction_kinds, distribution.transaction_weights)),
+    }
+    groups = [
+        (range(0, min(users, 1)), Distribution(shape='fixed', two_factor_ratio=0, **pinned)),
+        (range(1, min(users, 2)), Distribution(shape='fixed', two_factor_ratio=1, **pinned)),
+        (range(2, users), distribution),
+    ]
+    user_ids = []
+    for indices, group_distribution in groups:
+        ids, _ = insert_users(indices, rng, group_distribution, password, plans, batch_size, prefix='bench')
+        user_ids.extend(ids)
+
+    return Dataset(
+        user_ids,
+        plans,
+        User.objects.get(pk=user_ids[0]) if user_ids else None,
+        User.objects.get(pk=user_ids[1]) if len(user_ids) > 1 else None,
+    )
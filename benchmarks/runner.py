@@ -0,0 +1,104 @@
+import math
+import time
+import tracemalloc
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+# A slower p50/p95 is only a regression if it also grew by this many ms,
+# so sub-millisecond jitter on fast paths doesn't fail a comparison
+MIN_REGRESSION_MS = 0.5
+
+# Metrics compared against a baseline: (key, lower bound of a real change)
+COMPARED_METRICS = [
+    ('p50_ms', MIN_REGRESSION_MS),
+    ('p95_ms', MIN_REGRESSION_MS),
+    ('peak_memory_kib', 64),
+]
+
+
+def percentile(sorted_values, fraction):
+    """
+    Linearly interpolated percentile of an already sorted list.
+    """
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(timings):
+    """
+    Latency summary in milliseconds of a list of durations in seconds.
+    """
+    values = sorted(seconds * 1000 for seconds in timings)
+    return {
+        'iterations': len(values),
+        'min_ms': values[0],
+        'p50_ms': percentile(values, 0.50),
+        'p95_ms': percentile(values, 0.95),
+        'p99_ms': percentile(values, 0.99),
+        'max_ms': values[-1],
+        'mean_ms': sum(values) / len(values),
+    }
+
+
+def run_once(func, rollback):
+    """
+    Call func() and return its duration. With rollback its writes are undone
+    in a savepoint so every iteration starts from the same data.
+    """
+    if not rollback:
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
+    with transaction.atomic():
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        transaction.set_rollback(True)
+    return elapsed
+
+
+def measure(func, iterations, warmup=3, rollback=False):
+    """
+    Time func() over several iterations, then count its queries and peak
+    Python memory in one extra traced call (tracing would skew the timings).
+    """
+    for _ in range(warmup):
+        run_once(func, rollback)
+    timings = [run_once(func, rollback) for _ in range(iterations)]
+
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            run_once(func, rollback)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = summarize(timings)
+    # Savepoints only bracket the real work (the runner's own among them)
+    result['queries'] = sum(1 for query in queries.captured_queries if 'SAVEPOINT' not in query['sql'])
+    result['peak_memory_kib'] = peak / 1024
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline run. Returns a list of
+    (name, metric, baseline value, current value) for every metric that got
+    worse by more than ``threshold`` (a fraction) and any query count that
+    grew at all.
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append((name, 'queries', previous['queries'], current['queries']))
+        for metric, minimum in COMPARED_METRICS:
+            old, new = previous[metric], current[metric]
+            if new > old * (1 + threshold) and new - old >= minimum:
+                regressions.append((name, metric, old, new))
+    return regressions
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.messages.storage import default_storage
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from staking.models import AssetWallet, Stake, Transaction
+from twofactor.middleware import TwoFactorMiddleware
+from .dataset import PASSWORD
+
+
+class BenchmarkContext:
+    """
+    What the scenarios share for one seeded dataset: the dataset itself and
+    a client logged in as its sample user.
+    """
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.client = self.make_client()
+        self.client.force_login(dataset.sample_user)
+        self.factory = RequestFactory(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+    def make_client(self):
+        return Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+    def admin_request(self):
+        request = self.factory.post('/admin/')
+        request.user = self.dataset.sample_user
+        SessionMiddleware(lambda request: None).process_request(request)
+        request._messages = default_storage(request)
+        return request
+
+
+def expect(response, status_code):
+    if response.status_code != status_code:
+        raise AssertionError(f'{response.request["PATH_INFO"]} returned {response.status_code}, expected {status_code}')
+    return response
+
+
+# Each scenario takes the context and returns (callable to time, whether
+# its writes must be rolled back after every call)
+
+def dashboard(context):
+    url = reverse('dashboard')
+    return lambda: expect(context.client.get(url), 200), False
+
+
+def swap_get(context):
+    url = reverse('swap')
+    return lambda: expect(context.client.get(url), 200), False
+
+
+def swap_post(context):
+    url = reverse('swap')
+    wallets = dict(
+        AssetWallet.objects.filter(user=context.dataset.sample_user).values_list('asset_type', 'id')
+    )
+    data = {'from_wallet': wallets['BTC'], 'to_wallet': wallets['ETH'], 'amount': '0.00010000'}
+    return lambda: expect(context.client.post(url, data), 302), True
+
+
+def transactions(context):
+    url = reverse('transactions')
+    return lambda: expect(context.client.get(url), 200), False
+
+
+def login(context):
+    url = reverse('accounts:login')
+    data = {'username': context.dataset.sample_user.email, 'password': PASSWORD}
+    # A fresh client each time, logged in users are redirected away
+    return lambda: expect(context.make_client().post(url, data), 302), True
+
+
+def two_factor_middleware(context):
+    """
+    The middleware alone, for a user with 2FA enabled and verified, around
+    a view that does nothing.
+    """
+    middleware = TwoFactorMiddleware(lambda request: HttpResponse())
+    request = context.factory.get(reverse('dashboard'))
+    request.user = context.dataset.two_factor_user
+    return lambda: expect(middleware(request), 200), False
+
+
+SCENARIOS = [
+    ('dashboard', dashboard),
+    ('swap_get', swap_get),
+    ('swap_post', swap_post),
+    ('transactions', transactions),
+    ('login', login),
+    ('two_factor_middleware', two_factor_middleware),
+]
+
+# The password hasher is slow on purpose; cap its iterations
+MAX_ITERATIONS = {
+    'login': 10,
+}
+
+
+# Admin actions also take the number of selected rows and return None when
+# the dataset has too few rows for that batch
+
+def complete_stakes(context, batch_size):
+    ids = list(Stake.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)[:batch_size])
+    if len(ids) < batch_size:
+        return None
+    model_admin = admin.site._registry[Stake]
+    return lambda: model_admin.complete_stakes(context.admin_request(), Stake.objects.filter(pk__in=ids)), True
+
+
+def approve_transactions(context, batch_size):
+    ids = list(Transaction.objects.filter(status='PENDING').order_by('pk').values_list('pk', flat=True)[:batch_size])
+    if len(ids) < batch_size:
+        return None
+    model_admin = admin.site._registry[Transaction]
+    return lambda: model_admin.approve_transactions(context.admin_request(), Transaction.objects.filter(pk__in=ids)), True
+
+
+ADMIN_ACTIONS = [
+    ('complete_stakes', complete_stakes),
+    ('approve_transactions', approve_transactions),
+]
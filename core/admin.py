@@ -1,9 +1,60 @@
 from django.contrib import admin
 from django_ckeditor_5.widgets import CKEditor5Widget
 from django import forms
-from .models import SiteSettings, StaticPage
+import os
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import RequestProfile, SiteSettings, StaticPage
+from .profiling import profile_path
 
 
 admin.site.register(SiteSettings)
 
 admin.site.register(StaticPage)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'view_name', 'status_code', 'duration_ms', 'mode', 'sampled', 'download_link')
+    list_filter = ('mode', 'sampled', 'status_code', 'created_at')
+    search_fields = ('path', 'view_name')
+    readonly_fields = [field.name for field in RequestProfile._meta.fields] + ['download_link']
+    raw_id_fields = ('user',)
+
+    def has_add_permission(self, request):
+        # Profiles are created by core.middleware.ProfilerMiddleware
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view), name='core_requestprofile_download'),
+        ] + super().get_urls()
+
+    @admin.display(description='Profile')
+    def download_link(self, obj):
+        return format_html('<a href="{}">{}</a>', reverse('admin:core_requestprofile_download', args=[obj.pk]), obj.file_name)
+
+    def download_view(self, request, pk):
+        profile = self.get_object(request, str(pk))
+        if profile is None or not self.has_view_permission(request, profile):
+            raise Http404
+        path_on_disk = profile_path(os.path.basename(profile.file_name))
+        if not os.path.exists(path_on_disk):
+            raise Http404('The profile file has been removed')
+        return FileResponse(open(path_on_disk, 'rb'), as_attachment=True, filename=profile.file_name)
+
+    def delete_model(self, request, obj):
+        self.delete_files([obj])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        self.delete_files(queryset)
+        super().delete_queryset(request, queryset)
+
+    def delete_files(self, profiles):
+        for profile in profiles:
+            try:
+                os.remove(profile_path(os.path.basename(profile.file_name)))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,59 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from accounts.models import User
+from core.metrics import registry
+
+METRICS_MIDDLEWARE = 'core.middleware.MetricsMiddleware'
+SAMPLE_EMAIL = 'benchmark-metrics@example.invalid'
+
+
+class Command(BaseCommand):
+    help = 'Measure the overhead of the metrics middleware on the staking dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per round and configuration')
+        parser.add_argument('--rounds', type=int, default=5, help='Alternating rounds; the median is reported')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['rounds'] < 1:
+            raise CommandError('--requests and --rounds must be at least 1.')
+        without = [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]
+        configurations = [
+            ('without metrics', without),
+            ('with metrics', [METRICS_MIDDLEWARE] + without),
+        ]
+        url = reverse('dashboard')
+        timings = {label: [] for label, _ in configurations}
+
+        # The user, wallets and sessions created here are rolled back
+        with transaction.atomic():
+            User.objects.filter(email=SAMPLE_EMAIL).delete()
+            user = User.objects.create_user(email=SAMPLE_EMAIL, password=None, is_email_verified=True)
+            # Alternate configurations so drift affects both equally
+            for _ in range(options['rounds']):
+                for label, middleware in configurations:
+                    with override_settings(MIDDLEWARE=middleware, METRICS_ENABLED=True, DEBUG=False):
+                        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+                        client.force_login(user)
+                        response = client.get(url)  # warm up, creates the wallets
+                        if response.status_code != 200:
+                            raise CommandError(f'{url} returned {response.status_code}')
+                        started = time.perf_counter()
+                        for _ in range(options['requests']):
+                            client.get(url)
+                        timings[label].append((time.perf_counter() - started) / options['requests'])
+            transaction.set_rollback(True)
+        registry.reset()
+
+        baseline = statistics.median(timings['without metrics'])
+        for label, _ in configurations:
+            median = statistics.median(timings[label])
+            self.stdout.write(
+                f'{label:<16} {median * 1000:>8.3f} ms/request '
+                f'({(median - baseline) / baseline:+.2%})'
+            )
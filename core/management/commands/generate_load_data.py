@@ -0,0 +1,171 @@
+import functools
+import operator
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+from accounts.models import User
+from benchmarks.dataset import TRANSACTION_MIX, Distribution, email_for, get_or_create_plans, insert_users
+from staking.models import Transaction
+
+EMAIL_PREFIX = 'load'
+DEFAULT_PASSWORD = 'load-test-password'
+
+
+def init_worker():
+    # Spawned (not forked) workers start without Django set up
+    if not apps.ready:
+        django.setup()
+
+
+def load_chunk(start, count, seed, distribution, password, plans, batch_size):
+    """
+    Insert users start..start+count-1 in one transaction. The random state
+    depends only on the seed and the chunk, not on which worker runs it.
+    """
+    rng = random.Random(f'{seed}:{start}')
+    with transaction.atomic():
+        _, counts = insert_users(
+            range(start, start + count), rng, distribution, password, plans, batch_size, prefix=EMAIL_PREFIX,
+        )
+    return counts
+
+
+def existing_users(start, stop):
+    """
+    Generated users whose index is in [start, stop).
+
+    Emails are zero-padded to at least seven digits, so emails of the same
+    length sort like their indices; each length is one range on the email
+    index.
+    """
+    ranges = []
+    low = start
+    while low < stop:
+        high = min(stop, 10 ** max(len(str(low)), 7)) - 1
+        first, last = email_for(low, EMAIL_PREFIX), email_for(high, EMAIL_PREFIX)
+        ranges.append(Q(email__gte=first, email__lte=last, email_length=len(first)))
+        low = high + 1
+    return User.objects.annotate(email_length=Length('email')).filter(functools.reduce(operator.or_, ranges))
+
+
+def parse_mix(value):
+    """
+    Parse 'DEPOSIT:CONFIRMED=30,SWAP:CONFIRMED=15' into a transaction mix.
+    """
+    types = {choice[0] for choice in Transaction.TRANSACTION_TYPES}
+    statuses = {choice[0] for choice in Transaction.STATUS_CHOICES}
+    mix = []
+    for item in value.split(','):
+        try:
+            kind, weight = item.split('=')
+            transaction_type, status = kind.strip().upper().split(':')
+            weight = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid --mix entry "{item}", expected TYPE:STATUS=WEIGHT.')
+        if transaction_type not in types or status not in statuses or weight < 0:
+            raise CommandError(f'Invalid --mix entry "{item}".')
+        mix.append(((transaction_type, status), weight))
+    if not sum(weight for _, weight in mix):
+        raise CommandError('--mix needs at least one positive weight.')
+    return mix
+
+
+class Command(BaseCommand):
+    help = 'Bulk load synthetic users, wallets, stakes and transactions for capacity testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, required=True, help='Users to create')
+        parser.add_argument('--offset', type=int, default=0, help='Index of the first user, to add to an earlier load')
+        parser.add_argument('--stakes-per-user', type=int, default=2, help='Mean stakes per user')
+        parser.add_argument('--transactions-per-user', type=int, default=20, help='Mean transactions per user')
+        parser.add_argument('--shape', choices=Distribution.SHAPES, default='uniform',
+                            help='How per-user counts spread around their mean')
+        parser.add_argument('--two-factor-ratio', type=float, default=0.1, help='Share of users with 2FA enabled')
+        parser.add_argument('--max-balance', type=float, default=1000, help='Upper bound of generated wallet balances')
+        parser.add_argument('--mix', help='Transaction mix as TYPE:STATUS=WEIGHT,... '
+                                          '(default: mostly confirmed deposits, stakes, rewards and swaps)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of every generated user')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Users per worker task and transaction')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT statement')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation')
+
+    def handle(self, *args, **options):
+        users, offset = options['users'], options['offset']
+        if users < 1 or offset < 0 or options['chunk_size'] < 1 or options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--users, --chunk-size, --batch-size and --workers must be positive, --offset not negative.')
+        if not 0 <= options['two_factor_ratio'] <= 1:
+            raise CommandError('--two-factor-ratio must be between 0 and 1.')
+        distribution = Distribution(
+            stakes_per_user=options['stakes_per_user'],
+            transactions_per_user=options['transactions_per_user'],
+            shape=options['shape'],
+            two_factor_ratio=options['two_factor_ratio'],
+            max_balance=options['max_balance'],
+            transaction_mix=parse_mix(options['mix']) if options['mix'] else TRANSACTION_MIX,
+        )
+        if existing_users(offset, offset + users).exists():
+            raise CommandError('Generated users already exist in this range; pick another --offset.')
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            # SQLite takes one writer at a time; parallel writers would only wait on each other
+            self.stdout.write(self.style.WARNING('SQLite allows a single writer, loading in this process.'))
+            workers = 1
+
+        if options['interactive']:
+            database = connection.settings_dict['NAME']
+            answer = input(
+                f"This writes {users} users with about {users * options['transactions_per_user']} transactions "
+                f"to {database}. Type 'yes' to continue: "
+            )
+            if answer != 'yes':
+                raise CommandError('Load cancelled.')
+
+        # Hashed once; every generated user gets the same hash
+        password = make_password(options['password'])
+        plans = get_or_create_plans()
+        chunks = [
+            (start, min(options['chunk_size'], offset + users - start))
+            for start in range(offset, offset + users, options['chunk_size'])
+        ]
+        task_args = (options['seed'], distribution, password, plans, options['batch_size'])
+
+        totals = {}
+        started = time.perf_counter()
+        if workers == 1:
+            for start, count in chunks:
+                self.report(totals, load_chunk(start, count, *task_args), users, started)
+        else:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                futures = [executor.submit(load_chunk, start, count, *task_args) for start, count in chunks]
+                for future in as_completed(futures):
+                    self.report(totals, future.result(), users, started)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Loaded ' + ', '.join(f'{count} {name}' for name, count in totals.items()) + f' in {elapsed:.1f}s.'
+        ))
+        if connection.vendor == 'postgresql':
+            self.stdout.write('Run ANALYZE so the planner sees the new row counts.')
+
+    def report(self, totals, counts, users, started):
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{totals['users']}/{users} users, {totals['transactions']} transactions "
+            f"({totals['transactions'] / elapsed:.0f}/s)"
+        )
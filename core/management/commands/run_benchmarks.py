@@ -0,0 +1,141 @@
+import json
+import os
+import platform
+import time
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from benchmarks.dataset import seed_dataset
+from benchmarks.runner import compare, measure
+from benchmarks.scenarios import ADMIN_ACTIONS, MAX_ITERATIONS, SCENARIOS, BenchmarkContext
+from core.metrics import registry
+from staking.rates import invalidate_rates
+
+
+def parse_sizes(value):
+    try:
+        sizes = [int(size) for size in value.split(',') if size.strip()]
+    except ValueError:
+        raise CommandError(f'Invalid size list: {value}')
+    if not sizes or min(sizes) < 1:
+        raise CommandError(f'Sizes must be positive integers: {value}')
+    return sizes
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the hot views and admin actions against seeded datasets of several sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000', help='Comma-separated numbers of users to seed')
+        parser.add_argument('--batch-sizes', default='10,100', help='Comma-separated rows selected for admin actions')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed calls per benchmark')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed calls before timing')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset')
+        parser.add_argument('--only', action='append', default=[], help='Run benchmarks whose name contains this (repeatable)')
+        parser.add_argument('--output', help='JSON file for the results (default benchmarks/results/<timestamp>.json)')
+        parser.add_argument('--compare', metavar='BASELINE', help='Results JSON of an earlier run to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Slowdown (fraction) reported as a regression')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be at least 1 and --warmup not negative.')
+        sizes = parse_sizes(options['sizes'])
+        batch_sizes = parse_sizes(options['batch_sizes'])
+        baseline = self.load_baseline(options['compare']) if options['compare'] else None
+
+        results = {}
+        # Rate limits would reject the repeated logins; the slow query log
+        # shouldn't fill up with the seeding
+        with override_settings(DEBUG=False, RATELIMIT_ENABLE=False, SLOW_QUERY_THRESHOLD_MS=float('inf')):
+            for size in sizes:
+                results.update(self.run_size(size, batch_sizes, options))
+        registry.reset()
+        invalidate_rates()
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', 'results', f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': self.describe_run(options), 'results': results}, f, indent=2, sort_keys=True)
+        self.stdout.write(f'Results written to {output}')
+
+        if baseline is not None:
+            self.report_regressions(results, baseline, options['threshold'])
+
+    def selected(self, name, options):
+        return not options['only'] or any(pattern in name for pattern in options['only'])
+
+    def run_size(self, size, batch_sizes, options):
+        results = {}
+        # Everything seeded and written by the benchmarks is rolled back
+        with transaction.atomic():
+            started = time.perf_counter()
+            dataset = seed_dataset(size, seed=options['seed'])
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{size} users seeded in {time.perf_counter() - started:.1f}s'
+            ))
+            context = BenchmarkContext(dataset)
+
+            benchmarks = [
+                (f'{name}[users={size}]', MAX_ITERATIONS.get(name, options['iterations']), setup, ())
+                for name, setup in SCENARIOS
+            ] + [
+                (f'{name}[users={size},batch={batch_size}]', options['iterations'], setup, (batch_size,))
+                for name, setup in ADMIN_ACTIONS for batch_size in batch_sizes
+            ]
+            for name, iterations, setup, setup_args in benchmarks:
+                if not self.selected(name, options):
+                    continue
+                prepared = setup(context, *setup_args)
+                if prepared is None:
+                    self.stdout.write(self.style.WARNING(f'{name}: skipped, not enough rows'))
+                    continue
+                func, rollback = prepared
+                result = results[name] = measure(
+                    func, min(iterations, options['iterations']), options['warmup'], rollback,
+                )
+                self.stdout.write(
+                    f"{name:<48} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                    f"p99 {result['p99_ms']:>8.2f} ms  {result['queries']:>4} queries  "
+                    f"{result['peak_memory_kib']:>8.0f} KiB"
+                )
+            transaction.set_rollback(True)
+        return results
+
+    def describe_run(self, options):
+        return {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'machine': platform.machine(),
+            'sizes': options['sizes'],
+            'batch_sizes': options['batch_sizes'],
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+        }
+
+    def load_baseline(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)['results']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not read baseline {path}: {e}')
+
+    def report_regressions(self, results, baseline, threshold):
+        missing = sorted(set(results) - set(baseline))
+        if missing:
+            self.stdout.write(f"Not in the baseline: {', '.join(missing)}")
+        regressions = compare(results, baseline, threshold)
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'No regressions beyond {threshold:.0%} against the baseline.'))
+            return
+        for name, metric, old, new in regressions:
+            change = f' ({(new - old) / old:+.0%})' if old else ''
+            old, new = (f'{value:.2f}' if isinstance(value, float) else value for value in (old, new))
+            self.stdout.write(self.style.ERROR(f'REGRESSION {name} {metric}: {old} -> {new}{change}'))
+        raise CommandError(f'{len(regressions)} regression(s) against the baseline.')
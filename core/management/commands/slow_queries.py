@@ -0,0 +1,48 @@
+import os
+from django.core.management.base import BaseCommand
+from core.slowqueries import get_log_dir, read_logs
+
+SORT_KEYS = {
+    'total': 'total_ms',
+    'count': 'count',
+    'max': 'max_ms',
+}
+
+
+class Command(BaseCommand):
+    help = 'Show the slowest query fingerprints logged by every process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10, help='Fingerprints to show')
+        parser.add_argument('--sort', choices=list(SORT_KEYS), default='total', help='Rank by total time, count or worst case')
+        parser.add_argument('--no-explain', action='store_true', help='Leave out query plans')
+        parser.add_argument('--reset', action='store_true', help='Delete the dumped logs afterwards')
+
+    def handle(self, *args, **options):
+        entries = read_logs()
+        if not entries:
+            self.stdout.write('No slow queries have been logged.')
+            return
+        key = SORT_KEYS[options['sort']]
+        entries.sort(key=lambda entry: entry[key], reverse=True)
+
+        for rank, entry in enumerate(entries[:options['top']], start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"#{rank} {entry['fingerprint']}: {entry['count']} calls, "
+                f"{entry['total_ms']:.0f} ms total, {entry['total_ms'] / entry['count']:.1f} ms avg, "
+                f"{entry['max_ms']:.1f} ms max"
+            ))
+            self.stdout.write(f"  {entry['sql']}")
+            for site, count in sorted(entry['call_sites'].items(), key=lambda item: -item[1]):
+                self.stdout.write(f'  {count:>6}x {site}')
+            if entry['explain'] and not options['no_explain']:
+                for line in entry['explain'].splitlines():
+                    self.stdout.write(f'  | {line}')
+            self.stdout.write('')
+
+        if options['reset']:
+            directory = get_log_dir()
+            for name in os.listdir(directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(directory, name))
+            self.stdout.write('Slow query logs cleared.')
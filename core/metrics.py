@@ -0,0 +1,167 @@
+import bisect
+import threading
+from django.conf import settings
+
+# Request latency histogram bounds, in seconds (Prometheus defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Requests that matched no URL pattern share one label, keeping cardinality bounded
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class ViewStats:
+    """
+    Counters for one view in one thread.
+    """
+    __slots__ = ('requests', 'errors', 'latency_sum', 'buckets', 'queries', 'sql_seconds')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        # One slot per bound plus +Inf; cumulated when exported
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.latency_sum += other.latency_sum
+        for i, count in enumerate(other.buckets):
+            self.buckets[i] += count
+        self.queries += other.queries
+        self.sql_seconds += other.sql_seconds
+
+
+class MetricsRegistry:
+    """
+    In-process request metrics.
+
+    Each thread writes only to its own {view: ViewStats} buffer, so recording
+    a request takes no lock. Scrapes sum the buffers. Buffers of threads that
+    have exited are folded into a shared total whenever a new thread
+    registers, so they don't pile up under ASGI, where sync code runs in a
+    fresh thread per request.
+    """
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.buffers = []  # (thread, {view: ViewStats})
+        self.retired = {}
+
+    def buffer(self):
+        try:
+            return self.local.stats
+        except AttributeError:
+            stats = self.local.stats = {}
+            with self.lock:
+                self._retire_exited()
+                self.buffers.append((threading.current_thread(), stats))
+            return stats
+
+    def _retire_exited(self):
+        # Call with the lock held. An exited thread no longer writes to its
+        # buffer, so it can be merged without racing it.
+        alive = []
+        for thread, stats in self.buffers:
+            if thread.is_alive():
+                alive.append((thread, stats))
+            else:
+                _merge_into(self.retired, stats)
+        self.buffers = alive
+
+    def observe(self, view, seconds, status, queries, sql_seconds):
+        stats = self.buffer()
+        view_stats = stats.get(view)
+        if view_stats is None:
+            view_stats = stats[view] = ViewStats()
+        view_stats.requests += 1
+        if status >= 500:
+            view_stats.errors += 1
+        view_stats.latency_sum += seconds
+        view_stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        view_stats.queries += queries
+        view_stats.sql_seconds += sql_seconds
+
+    def collect(self):
+        """
+        Return {view: ViewStats} summed over every thread.
+        """
+        with self.lock:
+            self._retire_exited()
+            totals = {}
+            _merge_into(totals, self.retired)
+            for _, stats in self.buffers:
+                # Copy first: the owning thread may add a view meanwhile
+                _merge_into(totals, dict(stats))
+        return totals
+
+    def reset(self):
+        with self.lock:
+            for _, stats in self.buffers:
+                stats.clear()
+            self.retired = {}
+
+
+def _merge_into(totals, stats):
+    for view, view_stats in stats.items():
+        if view not in totals:
+            totals[view] = ViewStats()
+        totals[view].merge(view_stats)
+
+
+registry = MetricsRegistry()
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(stats=None):
+    """
+    Render the collected metrics in the Prometheus text exposition format.
+    """
+    stats = registry.collect() if stats is None else stats
+    lines = [
+        '# HELP django_http_requests_total Requests handled, by view.',
+        '# TYPE django_http_requests_total counter',
+    ]
+    views = sorted(stats)
+    for view in views:
+        lines.append(f'django_http_requests_total{{view="{_label(view)}"}} {stats[view].requests}')
+    lines += [
+        '# HELP django_http_errors_total Requests answered with a 5xx status, by view.',
+        '# TYPE django_http_errors_total counter',
+    ]
+    for view in views:
+        lines.append(f'django_http_errors_total{{view="{_label(view)}"}} {stats[view].errors}')
+    lines += [
+        '# HELP django_http_request_duration_seconds Request latency, by view.',
+        '# TYPE django_http_request_duration_seconds histogram',
+    ]
+    for view in views:
+        label = _label(view)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats[view].buckets):
+            cumulative += count
+            lines.append(f'django_http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'django_http_request_duration_seconds_sum{{view="{label}"}} {stats[view].latency_sum:.6f}')
+        lines.append(f'django_http_request_duration_seconds_count{{view="{label}"}} {stats[view].requests}')
+    lines += [
+        '# HELP django_db_queries_total SQL queries executed, by view.',
+        '# TYPE django_db_queries_total counter',
+    ]
+    for view in views:
+        lines.append(f'django_db_queries_total{{view="{_label(view)}"}} {stats[view].queries}')
+    lines += [
+        '# HELP django_db_query_duration_seconds_total Time spent in SQL, by view.',
+        '# TYPE django_db_query_duration_seconds_total counter',
+    ]
+    for view in views:
+        lines.append(f'django_db_query_duration_seconds_total{{view="{_label(view)}"}} {stats[view].sql_seconds:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
@@ -0,0 +1,136 @@
+import itertools
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .metrics import UNRESOLVED_VIEW, metrics_enabled, registry
+from .models import RequestProfile
+from .profiling import MODES, profile_call
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency, SQL query count and SQL time per view
+    (resolved URL name) into core.metrics. Place it first so the latency
+    covers the other middleware too.
+
+    Runs natively under both WSGI and ASGI, so async requests don't pay a
+    thread hop for it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        sql = [0, 0.0]
+        started = time.perf_counter()
+        with count_queries(sql):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, sql)
+        return response
+
+    async def __acall__(self, request):
+        sql = [0, 0.0]
+        started = time.perf_counter()
+        # Sync views and middleware run in threads that share this request's
+        # connection objects, so their queries are counted too
+        with count_queries(sql):
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, sql)
+        return response
+
+    def record(self, request, response, elapsed, sql):
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else UNRESOLVED_VIEW
+        registry.observe(view, elapsed, response.status_code, sql[0], sql[1])
+
+
+@contextmanager
+def count_queries(sql):
+    """
+    Add the number and duration of the queries run inside the block to
+    ``sql`` ([count, seconds]).
+    """
+    def count_query(execute, sql_text, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql_text, params, many, context)
+        finally:
+            sql[0] += 1
+            sql[1] += time.perf_counter() - started
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(count_query))
+        yield
+
+
+class ProfilerMiddleware:
+    """
+    Profile requests on demand: staff add ?_profile=1 or an X-Profile header
+    (value 'sampler' for a stack sampler instead of cProfile), and with
+    PROFILER_SAMPLE_RATE = N one in N requests is profiled automatically.
+
+    Unless PROFILER_ENABLED is set the middleware removes itself at startup.
+    Place it after AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0)
+        self.counter = itertools.count(1)
+
+    def requested_mode(self, request):
+        value = request.headers.get('X-Profile') or request.GET.get('_profile')
+        if not value or not request.user.is_staff:
+            return None
+        return value if value in MODES else 'cprofile'
+
+    def __call__(self, request):
+        mode = self.requested_mode(request)
+        sampled = False
+        if mode is None and self.sample_rate and next(self.counter) % self.sample_rate == 0:
+            mode, sampled = getattr(settings, 'PROFILER_SAMPLE_MODE', 'sampler'), True
+        if mode is None:
+            return self.get_response(request)
+
+        response, mode, file_name, elapsed = profile_call(mode, self.get_response, request)
+        try:
+            profile = self.record(request, response, mode, file_name, elapsed, sampled)
+        except Exception:
+            # Never fail the request because its profile couldn't be indexed
+            logger.exception('Could not record profile %s', file_name)
+        else:
+            if not sampled:
+                response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def record(self, request, response, mode, file_name, elapsed, sampled):
+        match = request.resolver_match
+        user = getattr(request, 'user', None)
+        return RequestProfile.objects.create(
+            method=request.method,
+            path=request.path[:500],
+            view_name=(match.view_name if match else '')[:200],
+            status_code=response.status_code,
+            duration_ms=elapsed * 1000,
+            mode=mode,
+            file_name=file_name,
+            user=user if user is not None and user.is_authenticated else None,
+            sampled=sampled,
+        )
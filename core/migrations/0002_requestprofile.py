@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-19 04:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('method', models.CharField(max_length=10, verbose_name='method')),
+                ('path', models.CharField(max_length=500, verbose_name='path')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='view name')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='status code')),
+                ('duration_ms', models.FloatField(verbose_name='duration (ms)')),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile (.pstats)'), ('sampler', 'Stack sampler (.folded)')], max_length=10, verbose_name='mode')),
+                ('file_name', models.CharField(max_length=100, verbose_name='file name')),
+                ('sampled', models.BooleanField(default=False, help_text='Picked by PROFILER_SAMPLE_RATE rather than requested', verbose_name='sampled')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'request profile',
+                'verbose_name_plural': 'request profiles',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
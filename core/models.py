@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -50,4 +51,32 @@ class StaticPage(models.Model):
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
-        return reverse('static_page', kwargs={'slug': self.slug})
\ No newline at end of file
+        return reverse('static_page', kwargs={'slug': self.slug})
+
+class RequestProfile(models.Model):
+    """
+    A profiled request; the profile itself is a file under PROFILER_DIR.
+    """
+    MODE_CHOICES = [
+        ('cprofile', 'cProfile (.pstats)'),
+        ('sampler', 'Stack sampler (.folded)'),
+    ]
+
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    method = models.CharField(_('method'), max_length=10)
+    path = models.CharField(_('path'), max_length=500)
+    view_name = models.CharField(_('view name'), max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField(_('status code'))
+    duration_ms = models.FloatField(_('duration (ms)'))
+    mode = models.CharField(_('mode'), max_length=10, choices=MODE_CHOICES)
+    file_name = models.CharField(_('file name'), max_length=100)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    sampled = models.BooleanField(_('sampled'), default=False, help_text=_('Picked by PROFILER_SAMPLE_RATE rather than requested'))
+
+    class Meta:
+        verbose_name = _('request profile')
+        verbose_name_plural = _('request profiles')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,112 @@
+import cProfile
+import collections
+import os
+import sys
+import threading
+import time
+import uuid
+from django.conf import settings
+
+MODES = ('cprofile', 'sampler')
+
+# Stack frames kept per sample; deeper frames are cut from the root side
+MAX_STACK_DEPTH = 200
+
+
+def get_profile_dir():
+    return getattr(settings, 'PROFILER_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def profile_path(name):
+    return os.path.join(get_profile_dir(), name)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Sample one thread's Python stack at a fixed interval from a helper thread.
+
+    Stacks are counted in collapsed form ('outer;inner;leaf'), the input
+    format of flamegraph.pl, speedscope and similar tools.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+
+    def sample(self, thread_id):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            if frame is None:
+                # Drop the frames above the profiled call (server, test runner...)
+                stack = stack[self.base_depth:]
+            if stack:
+                self.stacks[';'.join(stack)] += 1
+
+    def run(self, func, *args):
+        frame, self.base_depth = sys._getframe(), 0
+        while frame is not None:
+            self.base_depth += 1
+            frame = frame.f_back
+        sampler = threading.Thread(
+            target=self.sample, args=(threading.get_ident(),), name='request-profiler', daemon=True,
+        )
+        sampler.start()
+        try:
+            return func(*args)
+        finally:
+            self.stopped.set()
+            sampler.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+# Only one cProfile profiler can run per process on newer Pythons
+_cprofile_lock = threading.Lock()
+
+
+def profile_call(mode, func, *args):
+    """
+    Run func(*args) under the given profiler. Returns (result, mode, file
+    name, seconds); the output is written under PROFILER_DIR as .pstats
+    (cProfile) or .folded (collapsed stacks). While another request is under
+    cProfile, the stack sampler is used instead.
+    """
+    os.makedirs(get_profile_dir(), exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    if mode == 'cprofile' and not _cprofile_lock.acquire(blocking=False):
+        mode = 'sampler'
+
+    started = time.perf_counter()
+    if mode == 'sampler':
+        profiler = StackSampler(getattr(settings, 'PROFILER_SAMPLE_INTERVAL', 0.001))
+        try:
+            result = profiler.run(func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+        name += '.folded'
+        profiler.write(profile_path(name))
+    else:
+        try:
+            profiler = cProfile.Profile()
+            try:
+                result = profiler.runcall(func, *args)
+            finally:
+                elapsed = time.perf_counter() - started
+            name += '.pstats'
+            profiler.dump_stats(profile_path(name))
+        finally:
+            _cprofile_lock.release()
+    return result, mode, name, elapsed
@@ -0,0 +1,214 @@
+import functools
+import hashlib
+import math
+import re
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse '10/m', '5/15m' or '100/h' into (limit, window seconds).
+    """
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate '{rate}'")
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * UNIT_SECONDS[unit]
+
+
+class CacheRateLimitBackend:
+    """
+    Window counters stored in a Django cache, shared by every worker that
+    uses the same cache. Each check is one get_many plus one incr.
+    """
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'RATELIMIT_CACHE', 'default')]
+
+    def _key(self, key, index):
+        return f'rl:{key}:{index}'
+
+    def get_counts(self, key, index):
+        """
+        Return the (previous, current) window counts.
+        """
+        previous_key, current_key = self._key(key, index - 1), self._key(key, index)
+        counts = self.cache.get_many([previous_key, current_key])
+        return counts.get(previous_key, 0), counts.get(current_key, 0)
+
+    def incr(self, key, index, window):
+        cache_key = self._key(key, index)
+        # The counter must outlive the next window, which weighs it in
+        if not self.cache.add(cache_key, 1, window * 2):
+            try:
+                self.cache.incr(cache_key)
+            except ValueError:
+                # Expired between add() and incr()
+                self.cache.set(cache_key, 1, window * 2)
+
+
+class InMemoryRateLimitBackend:
+    """
+    Process-local window counters, for single-process deployments and tests.
+    """
+    max_entries = 100000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (window index, current count, previous count)
+        self._counters = {}
+
+    def _counts(self, key, index):
+        stored_index, current, previous = self._counters.get(key, (index, 0, 0))
+        if stored_index == index:
+            return previous, current
+        if stored_index == index - 1:
+            return current, 0
+        return 0, 0
+
+    def get_counts(self, key, index):
+        with self._lock:
+            return self._counts(key, index)
+
+    def incr(self, key, index, window):
+        with self._lock:
+            previous, current = self._counts(key, index)
+            if key not in self._counters and len(self._counters) >= self.max_entries:
+                self._prune(index)
+            self._counters[key] = (index, current + 1, previous)
+
+    def _prune(self, index):
+        # Counters older than the previous window no longer affect any check
+        self._counters = {key: value for key, value in self._counters.items() if value[0] >= index - 1}
+        if len(self._counters) >= self.max_entries:
+            self._counters.clear()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Return the process-wide backend configured by ``RATELIMIT_BACKEND``.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_path = getattr(settings, 'RATELIMIT_BACKEND', 'core.ratelimit.CacheRateLimitBackend')
+                _backend = import_string(backend_path)()
+    return _backend
+
+
+def get_client_ip(request):
+    """
+    Return the address of the client that sent ``request``.
+
+    Without RATELIMIT_TRUSTED_PROXIES this is REMOTE_ADDR. Behind N trusted
+    proxies that each append to the RATELIMIT_IP_META_KEY header (such as
+    X-Forwarded-For), it is the Nth entry from the right. Entries further
+    left were sent by the client and can be anything.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    proxies = getattr(settings, 'RATELIMIT_TRUSTED_PROXIES', 0)
+    if not proxies:
+        return remote_addr
+    header = request.META.get(getattr(settings, 'RATELIMIT_IP_META_KEY', 'HTTP_X_FORWARDED_FOR'), '')
+    chain = [part.strip() for part in header.split(',') if part.strip()]
+    if len(chain) < proxies:
+        # Did not come through every proxy
+        return remote_addr
+    return chain[-proxies]
+
+
+def get_key_value(request, key):
+    """
+    Resolve a key spec ('ip', 'user', 'post:<field>' or a callable) to the
+    value requests are counted by. Returns '' when there is nothing to count.
+    """
+    if callable(key):
+        return str(key(request) or '')
+    if key == 'ip':
+        return get_client_ip(request)
+    if key == 'user':
+        return str(request.user.pk) if request.user.is_authenticated else ''
+    if key.startswith('post:'):
+        return request.POST.get(key[5:], '').strip().lower()
+    raise ValueError(f"Unknown rate limit key '{key}'")
+
+
+def check_rate(scope, value, rate):
+    """
+    Count one request against a sliding window and return the number of
+    seconds to wait if the limit is exceeded, else 0.
+
+    The window is approximated from two fixed windows: the previous count is
+    weighted by how much of it still overlaps the sliding window. Rejected
+    requests are not counted, so a locked-out client cannot extend its own
+    lockout and every rejection costs a single cache read.
+    """
+    limit, window = parse_rate(rate)
+    key = f"{scope}:{hashlib.sha256(value.encode()).hexdigest()[:32]}"
+    now = time.time()
+    index = int(now // window)
+    elapsed = now - index * window
+
+    backend = get_backend()
+    previous, current = backend.get_counts(key, index)
+    weight = 1 - elapsed / window
+    if previous * weight + current >= limit:
+        return retry_after(limit, window, elapsed, previous, current)
+    backend.incr(key, index, window)
+    return 0
+
+
+def retry_after(limit, window, elapsed, previous, current):
+    """
+    Seconds until the sliding count drops back below ``limit``.
+    """
+    if current >= limit:
+        # Wait for this window to become the previous one and decay enough
+        wait = window - elapsed + window * (1 - limit / current)
+    else:
+        wait = window * (1 - (limit - current) / previous) - elapsed
+    return max(1, math.ceil(wait))
+
+
+def ratelimited_response(retry_seconds):
+    response = HttpResponse('Too many attempts. Please try again later.', status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_seconds)
+    return response
+
+
+def ratelimit(scope, key='ip', rate='10/m', method=('POST',)):
+    """
+    Reject requests over ``rate`` with a 429 before the view runs.
+
+    Stack the decorator to limit the same view by several keys, for example
+    by IP and by the submitted account. Requests whose method is not in
+    ``method`` or whose key resolves to nothing are not counted.
+    """
+    methods = (method,) if isinstance(method, str) else method
+    # Keep counters for different keys of the same scope apart
+    bucket = scope if callable(key) else f'{scope}:{key}'
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if getattr(settings, 'RATELIMIT_ENABLE', True) and (not methods or request.method in methods):
+                value = get_key_value(request, key)
+                if value:
+                    wait = check_rate(bucket, value, rate)
+                    if wait:
+                        return ratelimited_response(wait)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
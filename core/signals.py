@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from .slowqueries import dump_log, install
+
+
+@receiver(connection_created)
+def log_slow_queries(sender, connection, **kwargs):
+    """
+    Time every query on new connections when SLOW_QUERY_THRESHOLD_MS is set.
+    """
+    if getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None):
+        install(connection)
+
+
+@receiver(request_finished)
+def dump_slow_queries(sender, **kwargs):
+    """
+    Write the slow query table once it is due, so a quiet process doesn't
+    hold on to entries until its next slow query.
+    """
+    if getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None):
+        dump_log()
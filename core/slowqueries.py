@@ -0,0 +1,265 @@
+import atexit
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Distinct fingerprints remembered per process; the least recently seen go first
+DEFAULT_MAX_FINGERPRINTS = 500
+
+# Call sites remembered per fingerprint
+MAX_CALL_SITES = 5
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'(?<![\w."])-?\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint_sql(sql):
+    """
+    Normalize SQL so queries differing only in literal values or IN-list
+    length share a fingerprint. Returns (fingerprint, normalized SQL).
+    """
+    normalized = STRING_RE.sub('?', sql)
+    normalized = NUMBER_RE.sub('?', normalized)
+    normalized = PLACEHOLDER_LIST_RE.sub('(...)', normalized.replace('%s', '?'))
+    normalized = WHITESPACE_RE.sub(' ', normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16], normalized
+
+
+_project_dirs = None
+
+
+def get_project_dirs():
+    """
+    Directories of the apps that live in this project, not in site-packages.
+    """
+    global _project_dirs
+    if _project_dirs is None:
+        base_dir = os.path.join(str(settings.BASE_DIR), '')
+        _project_dirs = tuple(
+            os.path.join(config.path, '') for config in apps.get_app_configs()
+            if config.path.startswith(base_dir) and 'site-packages' not in config.path
+        )
+    return _project_dirs
+
+
+def find_call_site():
+    """
+    Return 'path:line in function' of the innermost frame in a project app,
+    skipping this module.
+    """
+    project_dirs = get_project_dirs()
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(project_dirs) and filename != __file__:
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class SlowQueryLog:
+    """
+    Bounded LRU table of slow query fingerprints with counts, timings, the
+    call sites that issued them and one EXPLAIN plan each.
+    """
+    def __init__(self, max_fingerprints=DEFAULT_MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.dumped_at = time.monotonic()
+        # Set when the table changed since the last dump
+        self.dirty = False
+
+    def record(self, fingerprint, sql, seconds, call_site):
+        """
+        Count one slow execution. Returns True the first time a fingerprint
+        is seen, when its plan should be captured.
+        """
+        with self.lock:
+            entry = self.entries.get(fingerprint)
+            is_new = entry is None
+            if is_new:
+                entry = self.entries[fingerprint] = {
+                    'fingerprint': fingerprint,
+                    'sql': sql,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'call_sites': {},
+                    'explain': None,
+                    'first_seen': time.time(),
+                }
+                if len(self.entries) > self.max_fingerprints:
+                    self.entries.popitem(last=False)
+            else:
+                self.entries.move_to_end(fingerprint)
+            ms = seconds * 1000
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['last_seen'] = time.time()
+            sites = entry['call_sites']
+            if call_site in sites or len(sites) < MAX_CALL_SITES:
+                sites[call_site] = sites.get(call_site, 0) + 1
+            self.dirty = True
+            return is_new
+
+    def set_explain(self, fingerprint, plan):
+        with self.lock:
+            if fingerprint in self.entries:
+                self.entries[fingerprint]['explain'] = plan
+                self.dirty = True
+
+    def snapshot(self):
+        with self.lock:
+            return [dict(entry, call_sites=dict(entry['call_sites'])) for entry in self.entries.values()]
+
+    def dump(self, path):
+        """
+        Write the table to ``path`` atomically as JSON.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.dirty = False
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'written_at': time.time(), 'queries': self.snapshot()}, f)
+        os.replace(tmp_path, path)
+        self.dumped_at = time.monotonic()
+
+
+log = SlowQueryLog(getattr(settings, 'SLOW_QUERY_MAX_FINGERPRINTS', DEFAULT_MAX_FINGERPRINTS))
+_local = threading.local()
+
+
+def get_log_dir():
+    return getattr(settings, 'SLOW_QUERY_DIR', os.path.join(settings.BASE_DIR, 'slowqueries'))
+
+
+def get_dump_path():
+    return os.path.join(get_log_dir(), f'{socket.gethostname()}-{os.getpid()}.json')
+
+
+def explain(connection, sql, params):
+    """
+    Return the plan of a query as text, or None if it can't be explained.
+    Runs in a savepoint so a failing EXPLAIN can't break the transaction.
+    """
+    prefix = connection.ops.explain_query_prefix()
+    _local.explaining = True
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {sql}', params)
+                rows = cursor.fetchall()
+    except Exception:
+        logger.debug('Could not explain %s', sql, exc_info=True)
+        return None
+    finally:
+        _local.explaining = False
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """
+    Database execute wrapper that logs queries slower than
+    SLOW_QUERY_THRESHOLD_MS with their call site and plan.
+    """
+    started = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    except Exception:
+        # The transaction may be aborted (PostgreSQL refuses everything until
+        # a rollback), so nothing else is sent on this connection
+        elapsed = time.perf_counter() - started
+        if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS and not getattr(_local, 'explaining', False):
+            logger.warning('Slow query failed after %.1f ms [%s]', elapsed * 1000, fingerprint_sql(sql)[0])
+        raise
+    elapsed = time.perf_counter() - started
+    if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS and not getattr(_local, 'explaining', False):
+        record_slow_query(context['connection'], sql, params, many, elapsed)
+    return result
+
+
+def record_slow_query(connection, sql, params, many, seconds):
+    fingerprint, normalized = fingerprint_sql(sql)
+    call_site = find_call_site()
+    logger.warning('Slow query (%.1f ms) at %s [%s]: %s', seconds * 1000, call_site, fingerprint, normalized)
+    if log.record(fingerprint, normalized, seconds, call_site):
+        # Plans are only meaningful for reads and cost another round-trip
+        if not many and normalized.lstrip('( ').upper().startswith(('SELECT', 'WITH')):
+            log.set_explain(fingerprint, explain(connection, sql, params))
+    dump_log()
+
+
+def dump_log(force=False):
+    """
+    Write this process's table if it changed and SLOW_QUERY_DUMP_INTERVAL
+    seconds have passed since the last dump, or right away with ``force``.
+    """
+    if not log.dirty:
+        return
+    if not force and time.monotonic() - log.dumped_at < getattr(settings, 'SLOW_QUERY_DUMP_INTERVAL', 30):
+        return
+    try:
+        log.dump(get_dump_path())
+    except OSError:
+        logger.exception('Could not write the slow query log')
+
+
+# Whatever was recorded since the last dump would otherwise be lost on exit
+atexit.register(dump_log, force=True)
+
+
+def install(connection):
+    """
+    Attach the slow query wrapper to a connection for its whole lifetime.
+    """
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+def read_logs(directory=None):
+    """
+    Merge the tables dumped by every process into one list of entries.
+    """
+    directory = directory or get_log_dir()
+    merged = {}
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                entries = json.load(f)['queries']
+        except (OSError, ValueError, KeyError):
+            continue
+        for entry in entries:
+            total = merged.get(entry['fingerprint'])
+            if total is None:
+                merged[entry['fingerprint']] = dict(entry, call_sites=dict(entry['call_sites']))
+                continue
+            total['count'] += entry['count']
+            total['total_ms'] += entry['total_ms']
+            total['max_ms'] = max(total['max_ms'], entry['max_ms'])
+            total['explain'] = total['explain'] or entry['explain']
+            for site, count in entry['call_sites'].items():
+                total['call_sites'][site] = total['call_sites'].get(site, 0) + count
+    return list(merged.values())
@@ -0,0 +1,69 @@
+import hashlib
+import os
+from django.conf import settings
+from django.contrib.staticfiles.storage import HashedFilesMixin
+from django.core.files.storage import FileSystemStorage
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class ContentHashedStorage(FileSystemStorage):
+    """
+    File storage that names files after a SHA-256 of their content, so the
+    same image uploaded twice is stored once.
+
+    Uses the digest computed while streaming by GuardedUploadHandler when
+    there is one, and hashes the file otherwise. Files go under
+    CKEDITOR_5_UPLOAD_PATH.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('location', os.path.join(settings.MEDIA_ROOT, getattr(settings, 'CKEDITOR_5_UPLOAD_PATH', '')))
+        kwargs.setdefault('base_url', settings.MEDIA_URL + getattr(settings, 'CKEDITOR_5_UPLOAD_PATH', ''))
+        super().__init__(**kwargs)
+
+    def content_name(self, name, content):
+        digest = getattr(content, 'sha256', None)
+        if not digest:
+            hasher = hashlib.sha256()
+            for chunk in content.chunks():
+                hasher.update(chunk)
+            digest = hasher.hexdigest()
+            content.seek(0)
+        extension = os.path.splitext(name)[1].lower()
+        return f'{digest[:32]}{extension}'
+
+    def save(self, name, content, max_length=None):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def _without_source_maps(patterns):
+    return tuple(
+        (extension, tuple(
+            pattern for pattern in extension_patterns
+            if 'sourceMappingURL' not in (pattern[0] if isinstance(pattern, tuple) else pattern)
+        ))
+        for extension, extension_patterns in patterns
+    )
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's hashed, precompressed storage, leaving source map comments
+    alone: several installed packages ship minified files that point at
+    maps they don't include, which would otherwise abort collectstatic.
+
+    With WHITENOISE_MANIFEST_STRICT off, files that haven't been built or
+    collected yet (a fresh checkout, the test runner) get their plain URL
+    instead of raising while the template renders.
+    """
+    patterns = _without_source_maps(CompressedManifestStaticFilesStorage.patterns)
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            if self.manifest_strict:
+                raise
+            return super(HashedFilesMixin, self).url(name)
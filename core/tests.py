@@ -1,3 +1,816 @@
-from django.test import TestCase
+import hashlib
+import json
+import logging
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from io import StringIO
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.signals import request_finished
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from accounts.models import User, UserProfile
+from benchmarks.dataset import email_for
+from benchmarks.runner import compare, measure, percentile, summarize
+from core import profiling, ratelimit, slowqueries
+from core.metrics import LATENCY_BUCKETS, UNRESOLVED_VIEW, MetricsRegistry, registry, render_prometheus
+from core.management.commands.generate_load_data import existing_users
+from core.ratelimit import check_rate, get_client_ip, parse_rate
+from core.management.commands import build_assets
+from core.middleware import MetricsMiddleware, ProfilerMiddleware
+from core.models import RequestProfile
+from core.profiling import StackSampler, profile_call
+from core.storage import ContentHashedStorage, StaticFilesStorage
+from core.uploadhandlers import get_upload_errors, sniff_image_format
+from core.slowqueries import SlowQueryLog, dump_log, fingerprint_sql, get_dump_path, read_logs
+from staking.models import AssetWallet, Stake, Transaction
 
-# Create your tests here.
+
+@override_settings(RATELIMIT_BACKEND='core.ratelimit.InMemoryRateLimitBackend', RATELIMIT_ENABLE=True)
+class RateLimitTestCase(SimpleTestCase):
+    """
+    Gives every test a fresh, process-local rate limit backend.
+    """
+    def setUp(self):
+        ratelimit._backend = None
+        self.addCleanup(setattr, ratelimit, '_backend', None)
+
+
+class ParseRateTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('5/15m'), (5, 900))
+        self.assertEqual(parse_rate('100/h'), (100, 3600))
+        self.assertEqual(parse_rate('3/2d'), (3, 172800))
+
+    def test_invalid_rate(self):
+        for rate in ('10', '10/x', 'm/10', '/m'):
+            with self.assertRaises(ValueError):
+                parse_rate(rate)
+
+
+class CheckRateTests(RateLimitTestCase):
+    def test_limit_then_reject(self):
+        with mock.patch('core.ratelimit.time.time', return_value=6000.0):
+            for _ in range(3):
+                self.assertEqual(check_rate('test', 'a', '3/m'), 0)
+            self.assertGreater(check_rate('test', 'a', '3/m'), 0)
+            # Other values have their own counters
+            self.assertEqual(check_rate('test', 'b', '3/m'), 0)
+
+    def test_rejections_are_not_counted(self):
+        with mock.patch('core.ratelimit.time.time', return_value=6000.0):
+            for _ in range(3):
+                check_rate('test', 'a', '3/m')
+            for _ in range(10):
+                check_rate('test', 'a', '3/m')
+        # Half of the previous window still counts (1.5); had the rejections
+        # been counted it would be 6.5 and everything would be refused
+        with mock.patch('core.ratelimit.time.time', return_value=6090.0):
+            self.assertEqual(check_rate('test', 'a', '3/m'), 0)
+            self.assertEqual(check_rate('test', 'a', '3/m'), 0)
+            self.assertGreater(check_rate('test', 'a', '3/m'), 0)
+
+    def test_window_slides(self):
+        with mock.patch('core.ratelimit.time.time', return_value=6000.0):
+            for _ in range(3):
+                check_rate('test', 'a', '3/m')
+        with mock.patch('core.ratelimit.time.time', return_value=6059.0):
+            self.assertGreater(check_rate('test', 'a', '3/m'), 0)
+        # Two windows later nothing is left of the earlier requests
+        with mock.patch('core.ratelimit.time.time', return_value=6120.0):
+            self.assertEqual(check_rate('test', 'a', '3/m'), 0)
+
+
+class ClientIPTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def request(self, forwarded=None):
+        extra = {'REMOTE_ADDR': '10.0.0.2'}
+        if forwarded is not None:
+            extra['HTTP_X_FORWARDED_FOR'] = forwarded
+        return self.factory.get('/', **extra)
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=0)
+    def test_header_ignored_without_trusted_proxies(self):
+        self.assertEqual(get_client_ip(self.request('203.0.113.9')), '10.0.0.2')
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=1)
+    def test_rightmost_entry_behind_one_proxy(self):
+        self.assertEqual(get_client_ip(self.request('1.2.3.4, 203.0.113.9')), '203.0.113.9')
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=2)
+    def test_counts_hops_from_the_right(self):
+        self.assertEqual(get_client_ip(self.request('1.2.3.4, 203.0.113.9, 10.0.0.1')), '203.0.113.9')
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=2)
+    def test_short_chain_falls_back_to_remote_addr(self):
+        self.assertEqual(get_client_ip(self.request('203.0.113.9')), '10.0.0.2')
+        self.assertEqual(get_client_ip(self.request()), '10.0.0.2')
+
+
+class RateLimitDecoratorTests(RateLimitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.view = ratelimit.ratelimit('test_view', key='ip', rate='3/m')(lambda request: HttpResponse('ok'))
+
+    def post(self, forwarded, remote_addr='10.0.0.2'):
+        return self.view(self.factory.post('/', REMOTE_ADDR=remote_addr, HTTP_X_FORWARDED_FOR=forwarded))
+
+    def test_over_limit_gets_429(self):
+        for _ in range(3):
+            self.assertEqual(self.post('203.0.113.9').status_code, 200)
+        response = self.post('203.0.113.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_other_methods_not_counted(self):
+        for _ in range(5):
+            self.assertEqual(self.view(self.factory.get('/', REMOTE_ADDR='10.0.0.2')).status_code, 200)
+        self.assertEqual(self.post('').status_code, 200)
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=0)
+    def test_spoofed_header_without_proxy_does_not_reset_counter(self):
+        for i in range(3):
+            self.assertEqual(self.post(f'198.51.100.{i}').status_code, 200)
+        self.assertEqual(self.post('198.51.100.99').status_code, 429)
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=1)
+    def test_spoofed_header_behind_proxy_does_not_reset_counter(self):
+        # The proxy appends the real client; whatever the client sent stays on the left
+        for i in range(3):
+            self.assertEqual(self.post(f'198.51.100.{i}, 203.0.113.9').status_code, 200)
+        self.assertEqual(self.post('198.51.100.99, 203.0.113.9').status_code, 429)
+        self.assertEqual(self.post('198.51.100.99, 203.0.113.10').status_code, 200)
+
+    @override_settings(RATELIMIT_ENABLE=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertEqual(self.post('203.0.113.9').status_code, 200)
+
+
+@override_settings(
+    RATELIMIT_BACKEND='core.ratelimit.InMemoryRateLimitBackend',
+    RATELIMIT_ENABLE=True,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class LoginRateLimitTests(TestCase):
+    def setUp(self):
+        ratelimit._backend = None
+        self.addCleanup(setattr, ratelimit, '_backend', None)
+        User.objects.create_user(email='user@example.com', password='Correct-horse-1', is_email_verified=True)
+
+    def test_failed_logins_for_one_account_are_throttled(self):
+        url = reverse('accounts:login')
+        for i in range(10):
+            response = self.client.post(
+                url, {'username': 'user@example.com', 'password': 'wrong'}, REMOTE_ADDR=f'10.0.0.{i}'
+            )
+            self.assertEqual(response.status_code, 200)
+        # Throttled by account from any address, even with the right password
+        response = self.client.post(
+            url, {'username': 'USER@example.com', 'password': 'Correct-horse-1'}, REMOTE_ADDR='10.0.1.1'
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_password_reset_is_throttled_per_email(self):
+        url = reverse('accounts:password_reset')
+        for _ in range(3):
+            self.assertEqual(self.client.post(url, {'email': 'user@example.com'}).status_code, 302)
+        self.assertEqual(self.client.post(url, {'email': 'user@example.com'}).status_code, 429)
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def test_observe_and_collect(self):
+        registry = MetricsRegistry()
+        registry.observe('dashboard', 0.003, 200, 4, 0.001)
+        registry.observe('dashboard', 0.2, 500, 6, 0.05)
+        registry.observe('swap', 30.0, 200, 1, 0.0)
+        stats = registry.collect()
+        self.assertEqual(stats['dashboard'].requests, 2)
+        self.assertEqual(stats['dashboard'].errors, 1)
+        self.assertEqual(stats['dashboard'].queries, 10)
+        self.assertEqual(stats['dashboard'].buckets[0], 1)
+        self.assertEqual(stats['dashboard'].buckets[LATENCY_BUCKETS.index(0.25)], 1)
+        # Beyond the last bound lands in +Inf
+        self.assertEqual(stats['swap'].buckets[-1], 1)
+
+    def test_threads_are_summed_and_kept_after_exit(self):
+        registry = MetricsRegistry()
+        registry.observe('dashboard', 0.01, 200, 1, 0.0)
+        thread = threading.Thread(target=registry.observe, args=('dashboard', 0.01, 200, 2, 0.0))
+        thread.start()
+        thread.join()
+        self.assertEqual(registry.collect()['dashboard'].requests, 2)
+        # The exited thread's counts were folded into the retired totals
+        self.assertEqual(len(registry.buffers), 1)
+        self.assertEqual(registry.collect()['dashboard'].queries, 3)
+
+    def test_exited_threads_are_retired_without_a_scrape(self):
+        registry = MetricsRegistry()
+        for _ in range(20):
+            thread = threading.Thread(target=registry.observe, args=('dashboard', 0.01, 200, 1, 0.0))
+            thread.start()
+            thread.join()
+        self.assertLessEqual(len(registry.buffers), 1)
+        self.assertEqual(registry.retired['dashboard'].requests, 19)
+        self.assertEqual(registry.collect()['dashboard'].requests, 20)
+
+    def test_render_prometheus(self):
+        registry = MetricsRegistry()
+        registry.observe('acc"ounts:login', 0.01, 200, 2, 0.0)
+        text = render_prometheus(registry.collect())
+        self.assertIn('django_http_requests_total{view="acc\\"ounts:login"} 1', text)
+        self.assertIn('django_http_request_duration_seconds_bucket{view="acc\\"ounts:login",le="+Inf"} 1', text)
+        self.assertIn('django_db_queries_total{view="acc\\"ounts:login"} 2', text)
+        self.assertTrue(text.endswith('\n'))
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1', '10.0.0.0/8'], RATELIMIT_TRUSTED_PROXIES=0)
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        registry.reset()
+
+    def test_middleware_records_view(self):
+        self.client.get(reverse('home'))
+        stats = registry.collect()
+        self.assertEqual(stats['home'].requests, 1)
+        self.client.get('/no-such-page/')
+        self.assertEqual(registry.collect()[UNRESOLVED_VIEW].requests, 1)
+
+    async def test_async_requests(self):
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(self.async_view)))
+        self.assertFalse(iscoroutinefunction(MetricsMiddleware(lambda request: HttpResponse())))
+        for _ in range(20):
+            await self.async_client.get(reverse('home'))
+        await self.async_client.get('/no-such-page/')
+        stats = registry.collect()
+        self.assertEqual(stats['home'].requests, 20)
+        self.assertEqual(stats[UNRESOLVED_VIEW].requests, 1)
+        # Sync code runs in a new thread per request; those buffers don't pile up
+        self.assertLessEqual(len(registry.buffers), 3)
+
+    async def async_view(self, request):
+        return HttpResponse()
+
+    def test_async_requests_count_queries(self):
+        # The first request also fills caches
+        self.client.get(reverse('home'))
+        registry.reset()
+        self.client.get(reverse('home'))
+        queries = registry.collect()['home'].queries
+        registry.reset()
+        async_to_sync(self.async_client.get)(reverse('home'))
+        self.assertEqual(registry.collect()['home'].queries, queries)
+
+    def test_internal_address_allowed(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE django_http_requests_total counter', response.content.decode())
+
+    def test_external_address_forbidden(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5').status_code, 403)
+
+    def test_spoofed_forwarded_header_forbidden(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5', HTTP_X_FORWARDED_FOR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=1)
+    def test_spoofed_forwarded_header_behind_proxy_forbidden(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.3', HTTP_X_FORWARDED_FOR='10.0.0.1, 203.0.113.5'
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.3', HTTP_X_FORWARDED_FOR='10.0.0.7')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_staff_allowed_from_anywhere(self):
+        staff = User.objects.create_user(email='staff@example.com', password='x', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5').status_code, 200)
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_literals_and_in_lists_share_a_fingerprint(self):
+        a = fingerprint_sql("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x'")
+        b = fingerprint_sql("SELECT  *  FROM t WHERE id IN (%s) AND name = 'it''s'")
+        self.assertEqual(a, b)
+        self.assertEqual(a[1], 'SELECT * FROM t WHERE id IN (...) AND name = ?')
+
+    def test_identifiers_with_digits_are_kept(self):
+        _, normalized = fingerprint_sql('SELECT "t1"."col2" FROM t1 LIMIT 21')
+        self.assertEqual(normalized, 'SELECT "t1"."col2" FROM t1 LIMIT ?')
+
+
+class SlowQueryWrapperTests(TestCase):
+    def setUp(self):
+        self.log = SlowQueryLog()
+        self.enterContext(mock.patch.object(slowqueries, 'log', self.log))
+        # Every query counts as slow here; keep the warnings out of the test output
+        self.enterContext(mock.patch.object(slowqueries.logger, 'handlers', [logging.NullHandler()]))
+        self.enterContext(mock.patch.object(slowqueries.logger, 'propagate', False))
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # Enabled for the test body only, not the surrounding savepoints
+        self.enterContext(override_settings(
+            SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_DUMP_INTERVAL=30, SLOW_QUERY_DIR=self.directory,
+        ))
+        slowqueries.install(connection)
+
+    def test_successful_query_is_recorded_with_plan(self):
+        User.objects.filter(email='nobody@example.com').exists()
+        entries = self.log.snapshot()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['count'], 1)
+        self.assertIsNotNone(entries[0]['explain'])
+        self.assertIn('accounts_user', entries[0]['sql'])
+        self.assertTrue(entries[0]['call_sites'])
+
+    def test_failed_query_is_not_recorded_or_explained(self):
+        with mock.patch.object(slowqueries, 'explain') as explain:
+            with self.assertLogs('core.slowqueries', 'WARNING') as logs:
+                with self.assertRaises(DatabaseError):
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT * FROM no_such_table WHERE id = 1')
+        explain.assert_not_called()
+        self.assertEqual(self.log.snapshot(), [])
+        self.assertIn('failed', logs.output[0])
+
+    def test_dump_waits_for_the_interval(self):
+        path = get_dump_path()
+        dump_log()
+        self.assertFalse(os.path.exists(path))
+        self.log.record('abc', 'SELECT ?', 0.5, 'core/views.py:1 in home')
+        dump_log()
+        self.assertFalse(os.path.exists(path))
+        dump_log(force=True)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['queries'][0]['fingerprint'], 'abc')
+        self.assertFalse(self.log.dirty)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=200, SLOW_QUERY_DUMP_INTERVAL=0)
+    def test_finished_request_dumps_when_due(self):
+        self.log.record('abc', 'SELECT ?', 0.5, 'core/views.py:1 in home')
+        request_finished.send(sender=self.__class__)
+        self.assertEqual([entry['fingerprint'] for entry in read_logs(self.directory)], ['abc'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class GenerateLoadDataTests(TestCase):
+    def load(self, users, offset=0):
+        call_command(
+            'generate_load_data', users=users, offset=offset, workers=1, interactive=False,
+            stakes_per_user=1, transactions_per_user=2, stdout=StringIO(),
+        )
+
+    def test_overlapping_range_refused(self):
+        self.load(3, offset=10)
+        self.assertEqual(existing_users(0, 100).count(), 3)
+        # Only the middle user overlaps, neither end does
+        with self.assertRaises(CommandError):
+            self.load(1, offset=11)
+        with self.assertRaises(CommandError):
+            self.load(5, offset=8)
+        self.load(2, offset=13)
+        self.assertEqual(existing_users(10, 15).count(), 5)
+
+    def test_rows_match_the_models(self):
+        call_command(
+            'generate_load_data', users=5, workers=1, interactive=False, stakes_per_user=2,
+            transactions_per_user=4, mix='SWAP:CONFIRMED=1,DEPOSIT:CONFIRMED=1', stdout=StringIO(),
+        )
+        user = existing_users(0, 5).first()
+        self.assertEqual(AssetWallet.objects.filter(user=user).count(), len(AssetWallet.ASSET_CHOICES))
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+        for stake in Stake.objects.all():
+            self.assertTrue(stake.is_active)
+            self.assertEqual(stake.status, 'ACTIVE')
+            self.assertGreater(stake.end_date, stake.start_date)
+        for swap in Transaction.objects.filter(transaction_type='SWAP'):
+            self.assertEqual(swap.to_amount, (swap.amount * swap.exchange_rate).quantize(Decimal('1E-8')))
+            self.assertEqual(swap.to_asset_wallet.user_id, swap.user_id)
+        self.assertTrue(Transaction.objects.filter(transaction_type='SWAP').exists())
+        self.assertFalse(Transaction.objects.filter(amount__lte=0).exists())
+
+    def test_range_across_email_widths(self):
+        for index in (9999998, 9999999, 10000000):
+            User.objects.create_user(email=email_for(index, 'load'), password='x')
+        User.objects.create_user(email=email_for(9999999, 'user'), password='x')
+        self.assertEqual(existing_users(9999999, 10000001).count(), 2)
+        self.assertEqual(existing_users(0, 9999998).count(), 0)
+        self.assertEqual(existing_users(10000001, 20000000).count(), 0)
+
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(100)
+
+
+class SniffImageFormatTests(SimpleTestCase):
+    def test_known_signatures(self):
+        self.assertEqual(sniff_image_format(PNG), 'PNG')
+        self.assertEqual(sniff_image_format(b'\xff\xd8\xff\xe0rest'), 'JPEG')
+        self.assertEqual(sniff_image_format(b'RIFF\x00\x00\x00\x00WEBPVP8 '), 'WEBP')
+        self.assertEqual(sniff_image_format(b'GIF89a'), 'GIF')
+
+    def test_unknown(self):
+        self.assertIsNone(sniff_image_format(b'<svg xmlns="http://www.w3.org/2000/svg">'))
+        self.assertIsNone(sniff_image_format(b'RIFF\x00\x00\x00\x00WAVE'))
+        self.assertIsNone(sniff_image_format(b''))
+
+
+@override_settings(
+    FILE_UPLOAD_HANDLERS=['core.uploadhandlers.GuardedUploadHandler'],
+    FILE_UPLOAD_MAX_MEMORY_SIZE=2048,
+    UPLOAD_MAX_REQUEST_SIZE=64 * 1024,
+    UPLOAD_DEFAULT_LIMIT=32 * 1024,
+    UPLOAD_FIELD_LIMITS={'avatar': 1024},
+    UPLOAD_IMAGE_FIELDS=['avatar', 'upload'],
+)
+class GuardedUploadHandlerTests(SimpleTestCase):
+    def upload(self, **files):
+        request = RequestFactory().post('/', {
+            name: SimpleUploadedFile(f'{name}.bin', content) for name, content in files.items()
+        })
+        return request, get_upload_errors(request)
+
+    def test_accepted_image_is_hashed(self):
+        request, errors = self.upload(avatar=PNG)
+        self.assertEqual(errors, {})
+        upload = request.FILES['avatar']
+        self.assertIsInstance(upload, InMemoryUploadedFile)
+        self.assertEqual(upload.read(), PNG)
+        self.assertEqual(upload.sha256, hashlib.sha256(PNG).hexdigest())
+
+    def test_non_image_refused(self):
+        request, errors = self.upload(avatar=b'<svg></svg>')
+        self.assertEqual(errors, {'avatar': 'Upload a valid image file.'})
+        self.assertNotIn('avatar', request.FILES)
+
+    def test_field_limit(self):
+        request, errors = self.upload(avatar=PNG + bytes(2000))
+        self.assertIn('larger than', errors['avatar'])
+        self.assertNotIn('avatar', request.FILES)
+
+    def test_large_file_spills_to_disk(self):
+        content = bytes(range(256)) * 40
+        request, errors = self.upload(attachment=content)
+        self.assertEqual(errors, {})
+        upload = request.FILES['attachment']
+        self.assertIsInstance(upload, TemporaryUploadedFile)
+        self.assertEqual(upload.size, len(content))
+        self.assertEqual(upload.read(), content)
+        self.assertEqual(upload.sha256, hashlib.sha256(content).hexdigest())
+
+    def test_oversized_request_refused_at_first_file(self):
+        request, errors = self.upload(attachment=bytes(70 * 1024))
+        self.assertEqual(errors, {'attachment': 'The upload is too large.'})
+
+    def test_editor_upload_reports_refusal(self):
+        response = self.client.post(reverse('ck_editor_5_upload_file'), {
+            'upload': SimpleUploadedFile('x.png', b'not an image'),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': {'message': 'Upload a valid image file.'}})
+
+
+class ContentHashedStorageTests(SimpleTestCase):
+    def test_same_content_stored_once(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        storage = ContentHashedStorage(location=location, base_url='/media/')
+        first = storage.save('photo.PNG', ContentFile(PNG))
+        second = storage.save('other.png', ContentFile(PNG))
+        self.assertEqual(first, second)
+        self.assertEqual(first, hashlib.sha256(PNG).hexdigest()[:32] + '.png')
+        self.assertEqual(os.listdir(location), [first])
+
+    def test_streamed_digest_is_used(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        storage = ContentHashedStorage(location=location, base_url='/media/')
+        content = ContentFile(PNG)
+        content.sha256 = 'ab' * 32
+        self.assertEqual(storage.save('photo.png', content), 'ab' * 16 + '.png')
+
+
+class StaticFilesStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(os.path.join(self.source, 'app.css'), 'w') as f:
+            # Large enough for WhiteNoise to bother compressing
+            f.write('body{background:url("bg.png")}\n' + '.p{padding:0}\n' * 100)
+            f.write('/*# sourceMappingURL=app.css.map */\n')
+        with open(os.path.join(self.source, 'bg.png'), 'wb') as f:
+            f.write(PNG)
+        self.enterContext(override_settings(STATICFILES_DIRS=[self.source], STATIC_ROOT=self.root))
+
+    def test_collectstatic_ignores_missing_source_maps(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        storage = StaticFilesStorage()
+        css = storage.stored_name('app.css')
+        self.assertNotEqual(css, 'app.css')
+        for name in (css, css + '.gz', css + '.br'):
+            self.assertTrue(storage.exists(name), name)
+        with storage.open(css) as f:
+            content = f.read().decode()
+        self.assertIn(storage.stored_name('bg.png'), content)
+        self.assertIn('sourceMappingURL=app.css.map', content)
+
+    def test_url_of_uncollected_file(self):
+        self.assertEqual(StaticFilesStorage().url('missing.js'), '/static/missing.js')
+        with override_settings(WHITENOISE_MANIFEST_STRICT=True):
+            with self.assertRaises(ValueError):
+                StaticFilesStorage().url('missing.js')
+
+
+# Stands in for the Tailwind CLI: writes a stylesheet to --output
+FAKE_TAILWIND = """
+import sys
+with open(sys.argv[sys.argv.index('--output') + 1], 'w') as f:
+    f.write('body{margin:0}')
+"""
+
+
+class BuildAssetsTests(SimpleTestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        script = os.path.join(self.base_dir, 'tailwind.py')
+        with open(script, 'w') as f:
+            f.write(FAKE_TAILWIND)
+        self.enterContext(override_settings(BASE_DIR=self.base_dir, TAILWIND_CLI=f'{sys.executable} {script}'))
+        self.output_dir = os.path.join(self.base_dir, 'static', 'dist')
+
+    def build(self, *args):
+        stdout = StringIO()
+        call_command('build_assets', '--no-collect', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_builds_bundles_and_vendors_alpine(self):
+        response = mock.MagicMock()
+        response.__enter__.return_value.read.return_value = b'/* alpine */'
+        with mock.patch.object(build_assets.urllib.request, 'urlopen', return_value=response) as urlopen:
+            output = self.build()
+            self.build()
+        urlopen.assert_called_once()
+        for bundle in build_assets.CSS_BUNDLES:
+            self.assertIn(f'{bundle}.css:', output)
+            with open(os.path.join(self.output_dir, 'css', f'{bundle}.css')) as f:
+                self.assertEqual(f.read(), 'body{margin:0}')
+        with open(os.path.join(self.output_dir, 'js', 'alpine.min.js'), 'rb') as f:
+            self.assertEqual(f.read(), b'/* alpine */')
+
+    def test_missing_tailwind_cli(self):
+        with override_settings(TAILWIND_CLI='no-such-tailwind-binary'):
+            with self.assertRaisesMessage(CommandError, 'Tailwind CLI not found'):
+                self.build()
+
+    def test_download_failure(self):
+        with mock.patch.object(build_assets.urllib.request, 'urlopen', side_effect=OSError('offline')):
+            with self.assertRaisesMessage(CommandError, 'Could not download Alpine.js'):
+                self.build('--skip-css')
+
+
+class ProfilerTestCase(TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        self.enterContext(override_settings(PROFILER_DIR=self.profile_dir))
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+    return 'done'
+
+
+class ProfileCallTests(ProfilerTestCase):
+    def test_cprofile(self):
+        result, mode, name, elapsed = profile_call('cprofile', busy_wait, 0.01)
+        self.assertEqual((result, mode), ('done', 'cprofile'))
+        self.assertTrue(name.endswith('.pstats'))
+        self.assertGreaterEqual(elapsed, 0.01)
+        stats = pstats.Stats(profiling.profile_path(name))
+        self.assertTrue(any(func[2] == 'busy_wait' for func in stats.stats))
+
+    def test_sampler_writes_collapsed_stacks(self):
+        result, mode, name, _ = profile_call('sampler', busy_wait, 0.05)
+        self.assertEqual((result, mode), ('done', 'sampler'))
+        with open(profiling.profile_path(name), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        # Rooted at the profiled call, not the test runner
+        self.assertTrue(stack.startswith('busy_wait (tests.py:'), stack)
+
+    def test_concurrent_cprofile_falls_back_to_sampler(self):
+        with profiling._cprofile_lock:
+            self.assertEqual(profile_call('cprofile', busy_wait, 0)[1], 'sampler')
+        self.assertEqual(profile_call('cprofile', busy_wait, 0)[1], 'cprofile')
+
+    def test_stack_depth_is_bounded(self):
+        def recurse(n):
+            return recurse(n - 1) if n else busy_wait(0.05)
+
+        sampler = StackSampler(0.001)
+        sampler.run(recurse, profiling.MAX_STACK_DEPTH + 50)
+        for stack in sampler.stacks:
+            self.assertLessEqual(stack.count(';') + 1, profiling.MAX_STACK_DEPTH)
+
+
+@override_settings(PROFILER_ENABLED=True, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProfilerMiddlewareTests(ProfilerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(email='staff@example.com', password='x', is_staff=True)
+        self.user = User.objects.create_user(email='user@example.com', password='x')
+
+    def test_disabled_by_default(self):
+        with override_settings(PROFILER_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilerMiddleware(lambda request: HttpResponse())
+
+    def test_staff_request_is_profiled(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('home'), {'_profile': '1'})
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual(profile.mode, 'cprofile')
+        self.assertEqual(profile.view_name, 'home')
+        self.assertEqual(profile.user, self.staff)
+        self.assertFalse(profile.sampled)
+        self.assertTrue(os.path.exists(profiling.profile_path(profile.file_name)))
+
+        response = self.client.get(reverse('home'), HTTP_X_PROFILE='sampler')
+        self.assertTrue(RequestProfile.objects.get(pk=response['X-Profile-Id']).file_name.endswith('.folded'))
+
+    def test_other_users_cannot_profile(self):
+        self.client.get(reverse('home'), {'_profile': '1'})
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'), {'_profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    @override_settings(PROFILER_SAMPLE_RATE=3, PROFILER_SAMPLE_MODE='sampler')
+    def test_sample_rate(self):
+        for _ in range(6):
+            response = self.client.get(reverse('home'))
+            self.assertNotIn('X-Profile-Id', response)
+        profiles = RequestProfile.objects.all()
+        self.assertEqual(len(profiles), 2)
+        self.assertTrue(all(profile.sampled and profile.mode == 'sampler' for profile in profiles))
+
+    def test_recording_failure_does_not_fail_request(self):
+        self.client.force_login(self.staff)
+        with mock.patch.object(ProfilerMiddleware, 'record', side_effect=DatabaseError), \
+                self.assertLogs('core.middleware', 'ERROR'):
+            response = self.client.get(reverse('home'), {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RequestProfileAdminTests(ProfilerTestCase):
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_superuser(email='admin@example.com', password='x')
+        self.client.force_login(admin)
+        _, mode, name, elapsed = profile_call('sampler', busy_wait, 0.01)
+        self.profile = RequestProfile.objects.create(
+            method='GET', path='/', view_name='home', status_code=200,
+            duration_ms=elapsed * 1000, mode=mode, file_name=name,
+        )
+
+    def test_download(self):
+        url = reverse('admin:core_requestprofile_download', args=[self.profile.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.profile.file_name, response['Content-Disposition'])
+        with open(profiling.profile_path(self.profile.file_name), 'rb') as f:
+            self.assertEqual(b''.join(response.streaming_content), f.read())
+
+        os.remove(profiling.profile_path(self.profile.file_name))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_delete_removes_file(self):
+        url = reverse('admin:core_requestprofile_delete', args=[self.profile.pk])
+        self.client.post(url, {'post': 'yes'})
+        self.assertFalse(RequestProfile.objects.exists())
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+
+class BenchmarkRunnerTests(SimpleTestCase):
+    def test_percentile_and_summary(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 0.5), 2.5)
+        self.assertEqual(percentile([7], 0.99), 7)
+        summary = summarize([0.003, 0.001, 0.002])
+        self.assertEqual(summary['iterations'], 3)
+        self.assertAlmostEqual(summary['min_ms'], 1)
+        self.assertAlmostEqual(summary['p50_ms'], 2)
+        self.assertAlmostEqual(summary['max_ms'], 3)
+
+    def test_compare(self):
+        baseline = {
+            'dashboard': {'queries': 5, 'p50_ms': 10.0, 'p95_ms': 20.0, 'peak_memory_kib': 100},
+            'swap_get': {'queries': 3, 'p50_ms': 0.1, 'p95_ms': 0.2, 'peak_memory_kib': 100},
+        }
+        results = {
+            'dashboard': {'queries': 6, 'p50_ms': 13.0, 'p95_ms': 21.0, 'peak_memory_kib': 100},
+            # Doubled, but by less than MIN_REGRESSION_MS
+            'swap_get': {'queries': 3, 'p50_ms': 0.2, 'p95_ms': 0.4, 'peak_memory_kib': 100},
+            'login': {'queries': 9, 'p50_ms': 50.0, 'p95_ms': 60.0, 'peak_memory_kib': 500},
+        }
+        self.assertEqual(compare(results, baseline, 0.2), [
+            ('dashboard', 'queries', 5, 6),
+            ('dashboard', 'p50_ms', 10.0, 13.0),
+        ])
+
+
+class BenchmarkMeasureTests(TestCase):
+    def test_writes_rolled_back_and_queries_counted(self):
+        calls = []
+
+        def create_profile():
+            calls.append(1)
+            RequestProfile.objects.create(
+                method='GET', path='/', status_code=200, duration_ms=1, mode='sampler', file_name='x.folded',
+            )
+
+        result = measure(create_profile, iterations=4, warmup=1, rollback=True)
+        self.assertEqual(len(calls), 6)
+        self.assertEqual(result['iterations'], 4)
+        self.assertEqual(result['queries'], 1)
+        self.assertGreater(result['peak_memory_kib'], 0)
+        self.assertFalse(RequestProfile.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RunBenchmarksTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.output = os.path.join(self.directory, 'results.json')
+
+    def run_benchmarks(self, *args):
+        stdout = StringIO()
+        call_command(
+            'run_benchmarks', '--sizes', '4', '--batch-sizes', '1', '--iterations', '2', '--warmup', '0',
+            '--output', self.output, *args, stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def test_results_written_and_data_rolled_back(self):
+        self.run_benchmarks()
+        with open(self.output, encoding='utf-8') as f:
+            run = json.load(f)
+        self.assertEqual(run['meta']['sizes'], '4')
+        self.assertEqual(set(run['results']), {
+            'dashboard[users=4]', 'swap_get[users=4]', 'swap_post[users=4]', 'transactions[users=4]',
+            'login[users=4]', 'two_factor_middleware[users=4]',
+            'complete_stakes[users=4,batch=1]', 'approve_transactions[users=4,batch=1]',
+        })
+        self.assertEqual(run['results']['dashboard[users=4]']['iterations'], 2)
+        self.assertFalse(User.objects.exists())
+
+    def test_only_and_missing_rows(self):
+        output = self.run_benchmarks('--only', 'complete_stakes', '--batch-sizes', '1,1000')
+        with open(self.output, encoding='utf-8') as f:
+            self.assertEqual(list(json.load(f)['results']), ['complete_stakes[users=4,batch=1]'])
+        self.assertIn('complete_stakes[users=4,batch=1000]: skipped, not enough rows', output)
+
+    def test_regression_against_baseline(self):
+        self.run_benchmarks('--only', 'dashboard')
+        with open(self.output, encoding='utf-8') as f:
+            run = json.load(f)
+        baseline = os.path.join(self.directory, 'baseline.json')
+        run['results']['dashboard[users=4]']['queries'] = 0
+        with open(baseline, 'w', encoding='utf-8') as f:
+            json.dump(run, f)
+        with self.assertRaisesMessage(CommandError, '1 regression(s) against the baseline.'):
+            self.run_benchmarks('--only', 'dashboard', '--compare', baseline, '--threshold', '1000')
+
+    def test_invalid_arguments(self):
+        with self.assertRaisesMessage(CommandError, 'Sizes must be positive integers'):
+            self.run_benchmarks('--sizes', '0')
+        with self.assertRaisesMessage(CommandError, 'Could not read baseline'):
+            self.run_benchmarks('--compare', os.path.join(self.directory, 'missing.json'))
@@ -0,0 +1,135 @@
+import hashlib
+import os
+from io import BytesIO
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+# Leading bytes of the image formats accepted anywhere on the site
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+]
+
+DEFAULT_UPLOAD_LIMIT = 10 * 1024 * 1024
+
+
+def sniff_image_format(header):
+    """
+    Return the image format named by the first bytes of a file, or None.
+    """
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, image_format in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    return None
+
+
+def get_upload_limit(field_name):
+    limits = getattr(settings, 'UPLOAD_FIELD_LIMITS', {})
+    return limits.get(field_name, getattr(settings, 'UPLOAD_DEFAULT_LIMIT', DEFAULT_UPLOAD_LIMIT))
+
+
+def get_upload_errors(request):
+    """
+    Return {field_name: message} for files the upload handler refused.
+    Reading request.FILES first makes sure the body has been parsed.
+    """
+    request.FILES
+    return getattr(request, 'upload_errors', {})
+
+
+class GuardedUploadHandler(FileUploadHandler):
+    """
+    Upload handler that checks files while they stream in instead of after
+    the whole body has been written somewhere.
+
+    - a request whose declared size exceeds UPLOAD_MAX_REQUEST_SIZE is
+      refused at its first file
+    - each file is capped at its field's limit from UPLOAD_FIELD_LIMITS
+    - files for UPLOAD_IMAGE_FIELDS must start with a known image signature,
+      which is checked on the first chunk
+    - content is SHA-256 hashed as it arrives; the digest is available as
+      ``uploaded_file.sha256``
+
+    Refusing a file stops parsing without reading the rest of the body and
+    records the reason in ``request.upload_errors``. Files are kept in memory
+    up to FILE_UPLOAD_MAX_MEMORY_SIZE and spill to a temporary file beyond
+    that, so this replaces Django's two default handlers.
+    """
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Raising here would escape the parser; refuse at the first file instead
+        max_size = getattr(settings, 'UPLOAD_MAX_REQUEST_SIZE', None)
+        self.request_too_large = bool(max_size) and content_length > max_size
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.memory_file = BytesIO()
+        self.temporary_file = None
+        self.size = 0
+        self.hasher = hashlib.sha256()
+        self.limit = get_upload_limit(field_name)
+        self.sniff = field_name in getattr(settings, 'UPLOAD_IMAGE_FIELDS', ())
+        if getattr(self, 'request_too_large', False):
+            self.reject('The upload is too large.')
+
+    def reject(self, message):
+        if self.request is not None:
+            if not hasattr(self.request, 'upload_errors'):
+                self.request.upload_errors = {}
+            self.request.upload_errors[self.field_name] = message
+        self.upload_interrupted()
+        raise StopUpload(connection_reset=True)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0 and self.sniff and sniff_image_format(raw_data) is None:
+            self.reject('Upload a valid image file.')
+        self.size += len(raw_data)
+        if self.size > self.limit:
+            self.reject(f'The file is larger than {self.limit // (1024 * 1024)}MB.')
+        self.hasher.update(raw_data)
+
+        if self.temporary_file is None and self.size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            self.temporary_file = TemporaryUploadedFile(
+                self.file_name, self.content_type, 0, self.charset, self.content_type_extra,
+            )
+            self.temporary_file.write(self.memory_file.getvalue())
+            self.memory_file = None
+        target = self.temporary_file if self.temporary_file is not None else self.memory_file
+        target.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.temporary_file is not None:
+            uploaded = self.temporary_file
+            uploaded.seek(0)
+            uploaded.size = file_size
+        else:
+            self.memory_file.seek(0)
+            uploaded = InMemoryUploadedFile(
+                file=self.memory_file,
+                field_name=self.field_name,
+                name=self.file_name,
+                content_type=self.content_type,
+                size=file_size,
+                charset=self.charset,
+                content_type_extra=self.content_type_extra,
+            )
+        uploaded.sha256 = self.hasher.hexdigest()
+        self.temporary_file = self.memory_file = None
+        return uploaded
+
+    def upload_interrupted(self):
+        if self.temporary_file is not None:
+            temp_location = self.temporary_file.temporary_file_path()
+            try:
+                self.temporary_file.close()
+                os.remove(temp_location)
+            except FileNotFoundError:
+                pass
+            self.temporary_file = None
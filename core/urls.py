@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('', views.HomePageView.as_view(), name='home'),
     path('pages/<slug:slug>/', views.StaticPageView.as_view(), name='static_page'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,8 +1,16 @@
+import ipaddress
 from django.views.generic import DetailView
 from .models import StaticPage
 from django.views.generic import TemplateView
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_POST
+from django_ckeditor_5.views import upload_file
+from .metrics import render_prometheus
+from .ratelimit import get_client_ip
+from .uploadhandlers import get_upload_errors
 
 User = get_user_model()
 
@@ -23,3 +31,38 @@ class HomePageView(TemplateView):
         context = super().get_context_data(**kwargs)
         context['active_users'] = User.objects.filter(is_active=True).count()  # Example stat
         return context
+
+
+@require_POST
+def editor_image_upload(request):
+    """
+    CKEditor image upload that reports files refused while streaming
+    before handing over to django-ckeditor-5.
+    """
+    upload_errors = get_upload_errors(request)
+    if upload_errors:
+        return JsonResponse({'error': {'message': next(iter(upload_errors.values()))}}, status=400)
+    return upload_file(request)
+
+
+def is_internal_ip(ip):
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    )
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for this process, open to staff and to
+    METRICS_ALLOWED_IPS.
+    """
+    # get_client_ip only believes X-Forwarded-For entries added by the
+    # RATELIMIT_TRUSTED_PROXIES; a header the client wrote is never used here
+    if not (request.user.is_staff or is_internal_ip(get_client_ip(request))):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
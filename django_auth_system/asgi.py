@@ -3,6 +3,10 @@ ASGI config for django_auth_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live rate/balance stream (the ``live_events`` URL) is a long-lived
+server-sent events response, so serve it through this callable, e.g.
+``daphne django_auth_system.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -44,11 +44,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.UserSessionMiddleware',
+    'core.middleware.ProfilerMiddleware',
     'twofactor.middleware.TwoFactorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -103,7 +107,8 @@ AUTH_PASSWORD_VALIDATORS = [
         }
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        # Breached password index; Django's common password list until it is built
+        'NAME': 'accounts.validators.BreachedPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
@@ -130,6 +135,22 @@ STATIC_URL = "/static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# `python manage.py build_assets` compiles Tailwind into static/dist, vendors
+# Alpine.js and runs collectstatic. WhiteNoise serves the content-hashed
+# files with far-future immutable cache headers, plus .br/.gz variants.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.storage.StaticFilesStorage',
+    },
+}
+# Fall back to unhashed URLs for files that haven't been collected yet
+WHITENOISE_MANIFEST_STRICT = False
+TAILWIND_CLI = config('TAILWIND_CLI', default='npx --yes tailwindcss@3.4.17')
+ALPINE_JS_URL = 'https://cdn.jsdelivr.net/npm/alpinejs@3.14.9/dist/cdn.min.js'
+
 # Media files settings
 MEDIA_URL = '/media/'  # URL to access media files in templates
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Directory to store uploaded media files
@@ -148,15 +169,45 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'accounts.User'
 
 # Authentication backends
+# EmailBackend subclasses ModelBackend and is the only model backend, so a
+# failed login hashes the password once instead of once per backend.
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
-    'accounts.backends.EmailBackend',  
+    'accounts.backends.EmailBackend',
     'social_core.backends.github.GithubOAuth2',
     'social_core.backends.discord.DiscordOAuth2',
     'social_core.backends.google.GoogleOAuth2',
     'social_core.backends.facebook.FacebookOAuth2',
 ]
 
+# Password hashing
+# ALGORITHM is used for new passwords; stored hashes made with another
+# algorithm or cost are rewritten on the next successful login. Use
+# `python manage.py benchmark_hashers` to pick a cost for the auth nodes.
+PASSWORD_HASHING = {
+    'ALGORITHM': config('PASSWORD_HASHER', default='pbkdf2_sha256'),
+    'PBKDF2_ITERATIONS': config('PASSWORD_PBKDF2_ITERATIONS', default=1_000_000, cast=int),
+    'SCRYPT_WORK_FACTOR': config('PASSWORD_SCRYPT_WORK_FACTOR', default=2 ** 14, cast=int),
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+    'ARGON2_TIME_COST': config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int),
+    'ARGON2_MEMORY_COST': config('PASSWORD_ARGON2_MEMORY_COST', default=102400, cast=int),  # KiB
+    'ARGON2_PARALLELISM': config('PASSWORD_ARGON2_PARALLELISM', default=8, cast=int),
+}
+
+_POLICY_HASHERS = {
+    'pbkdf2_sha256': 'accounts.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.ScryptPasswordHasher',
+    'argon2': 'accounts.hashers.Argon2PasswordHasher',  # needs argon2-cffi
+}
+
+# The first entry hashes new passwords, the rest only verify existing hashes
+PASSWORD_HASHERS = [_POLICY_HASHERS[PASSWORD_HASHING['ALGORITHM']]] + [
+    path for algorithm, path in _POLICY_HASHERS.items() if algorithm != PASSWORD_HASHING['ALGORITHM']
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 # # Email Settings (Development - MailHog)
 # EMAIL_BACKEND= 'django.core.mail.backends.smtp.EmailBackend'
 # EMAIL_HOST= 'localhost'
@@ -227,9 +278,119 @@ SOCIAL_AUTH_PIPELINE = (
 # Two-factor authentication settings
 TWO_FACTOR_VERIFICATION_WINDOW_DAYS = 14  # Number of days before re-verification is required
 TWO_FACTOR_EMAIL_OTP_EXPIRY_MINUTES = 10  # Minutes before email OTP expires
+TWO_FACTOR_QR_CODE_CACHE_SECONDS = 300  # Seconds a rendered setup QR code is cached
 # TWO_FACTOR_CALL_GATEWAY = None  # Disable call gateway
 # TWO_FACTOR_SMS_GATEWAY = None   # Disable SMS gateway (you can enable later with a provider)
 
+# Rate limiting for login, password reset and OTP views (core.ratelimit).
+# The cache backend is only shared between workers when CACHES points at a
+# shared cache such as Redis or Memcached.
+RATELIMIT_ENABLE = True
+RATELIMIT_BACKEND = 'core.ratelimit.CacheRateLimitBackend'
+RATELIMIT_CACHE = 'default'
+# Number of reverse proxies in front of the app that append the client address
+# to RATELIMIT_IP_META_KEY; 0 uses REMOTE_ADDR and ignores the header
+RATELIMIT_TRUSTED_PROXIES = config('RATELIMIT_TRUSTED_PROXIES', default=0, cast=int)
+RATELIMIT_IP_META_KEY = 'HTTP_X_FORWARDED_FOR'
+
+# Profile images are re-encoded without metadata and resized into
+# renditions by a thread pool after upload (0 processes them inline)
+PROFILE_IMAGE_FORMAT = 'WEBP'  # or 'JPEG'
+PROFILE_IMAGE_WORKERS = 2
+
+# Uploads are size-checked, sniffed and hashed while they stream in;
+# refused files stop the request body from being read any further
+FILE_UPLOAD_HANDLERS = ['core.uploadhandlers.GuardedUploadHandler']
+UPLOAD_MAX_REQUEST_SIZE = 12 * 1024 * 1024
+UPLOAD_DEFAULT_LIMIT = 10 * 1024 * 1024
+UPLOAD_FIELD_LIMITS = {
+    'avatar': 2 * 1024 * 1024,
+    'cover_photo': 5 * 1024 * 1024,
+    'upload': 5 * 1024 * 1024,  # CKEditor image uploads
+}
+UPLOAD_IMAGE_FIELDS = ['avatar', 'cover_photo', 'upload']
+
+# Login notifications are recorded per login and emailed by the
+# send_login_notifications worker. Logins from the same browser within this
+# window are coalesced into one email.
+LOGIN_NOTIFICATION_WINDOW_SECONDS = 600
+
+# Logged-in sessions are indexed in accounts.UserSession for the device list;
+# each worker writes their last-seen times at most once per this many seconds
+USER_SESSION_FLUSH_INTERVAL = 60
+
+# IP range database built by `python manage.py import_geoip_ranges`; login
+# emails show 'Unknown' locations until it exists
+GEOIP_DATABASE = os.path.join(BASE_DIR, 'geoip', 'ranges.bin')
+
+# Breached password index built by `python manage.py build_breached_index`,
+# memory-mapped by accounts.validators.BreachedPasswordValidator
+BREACHED_PASSWORDS_INDEX = config(
+    'BREACHED_PASSWORDS_INDEX', default=os.path.join(BASE_DIR, 'breached', 'passwords.bin')
+)
+
+# Per-view request metrics (core.middleware.MetricsMiddleware), scraped from
+# /metrics by staff or from these addresses/networks. The address is resolved
+# like the rate limiter's: behind a proxy set RATELIMIT_TRUSTED_PROXIES, or
+# every request will appear to come from the proxy
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1', '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
+
+# On-demand request profiling (core.middleware.ProfilerMiddleware): staff add
+# ?_profile=1 or 'X-Profile: sampler'; PROFILER_SAMPLE_RATE = N also profiles
+# one in N requests. Disabled, the middleware is removed at startup.
+PROFILER_ENABLED = config('PROFILER_ENABLED', default=False, cast=bool)
+PROFILER_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILER_SAMPLE_RATE = config('PROFILER_SAMPLE_RATE', default=0, cast=int)
+PROFILER_SAMPLE_MODE = 'sampler'
+PROFILER_SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+
+# Queries slower than this are logged with their call site, counted per
+# normalized fingerprint and EXPLAINed once; each process dumps its table to
+# SLOW_QUERY_DIR for `python manage.py slow_queries`. 0 disables it.
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=200, cast=int)
+SLOW_QUERY_DIR = os.path.join(BASE_DIR, 'slowqueries')
+SLOW_QUERY_MAX_FINGERPRINTS = 500
+SLOW_QUERY_DUMP_INTERVAL = 30  # seconds
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'verbose': {
+            'format': '{asctime} {levelname} {name} {process:d} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'verbose',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': config('LOG_LEVEL', default='INFO'),
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['console'],
+            'level': config('DJANGO_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Absolute site URL for links in emails sent outside a request
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+
+# Live updates (server-sent events). Swap for a broker backed by an external
+# bus to fan out across several ASGI workers.
+STAKING_EVENT_BROKER = 'staking.events.InMemoryBroker'
+
+# Seconds a swap quote keeps its locked rate
+SWAP_QUOTE_TTL_SECONDS = 30
+
 # Django flash message storage in cookies
 MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 
@@ -286,6 +447,10 @@ customColorPalette = [
 
 CKEDITOR_5_CUSTOM_CSS = 'css/ckeditor.css' 
 CKEDITOR_5_UPLOAD_PATH = "posts/post_images/" 
+CKEDITOR_5_MAX_FILE_SIZE = 5  # MB
+# Editor images are stored once per distinct content
+CKEDITOR_5_FILE_STORAGE = 'core.storage.ContentHashedStorage'
+
 CKEDITOR_5_CONFIGS = {
     'default': {
         'toolbar': {
@@ -3,12 +3,15 @@ from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.static import serve 
+from core.views import editor_image_upload
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
     path('2fa/', include('twofactor.urls')),
     path('accounts/', include('accounts.urls')),
+    # Ahead of the package's own route so refused uploads get a clean error
+    path('ckeditor5/image_upload/', editor_image_upload, name='ck_editor_5_upload_file'),
     path('ckeditor5/', include('django_ckeditor_5.urls')),
     path('staking/', include('staking.urls')),
     path('social-auth/', include('social_django.urls', namespace='social')),
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Plan, AssetWallet, Transaction, Stake, Card, WalletConnection, DepositAddress, ExchangeRate
+from django.utils import timezone
 from decimal import Decimal
 
 
@@ -15,7 +16,7 @@ class AssetWalletAdmin(admin.ModelAdmin):
 
 @admin.register(Stake)
 class StakeAdmin(admin.ModelAdmin):
-    list_display = ('user', 'plan', 'amount', 'start_date', 'end_date', 'is_active')
+    list_display = ('user', 'plan', 'amount', 'start_date', 'end_date', 'completed_at', 'is_active')
     list_filter = ('plan', 'is_active', 'start_date')
     search_fields = ('user__username',)
     actions = ['complete_stakes']
@@ -46,8 +47,11 @@ class StakeAdmin(admin.ModelAdmin):
                     status='CONFIRMED',
                 )
                 
-                # Mark the stake as inactive
+                # Mark the stake as inactive; statements return the
+                # principal at completed_at, when the wallet got it
                 stake.is_active = False
+                stake.status = 'COMPLETED'
+                stake.completed_at = timezone.now()
                 stake.save()
                 
                 completed_count += 1
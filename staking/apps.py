@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StakingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'staking'
+
+    def ready(self):
+        import staking.signals
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Channel carrying every ExchangeRate change
+RATES_CHANNEL = 'rates'
+
+
+def user_channel(user_id):
+    """
+    Name of the channel carrying balance changes for a single user.
+    """
+    return f'user:{user_id}'
+
+
+def format_event(event, payload):
+    """
+    Encode a payload as a server-sent event frame.
+    """
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """
+    A set of channels a single connected client listens to.
+
+    Messages are delivered on the event loop the subscription was created on,
+    so the queue is only ever touched from that loop.
+    """
+    def __init__(self, broker, channels, maxsize=100):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, channel, payload):
+        """
+        Queue a message, dropping the oldest one if the client is too slow.
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait((channel, payload))
+
+    async def get(self, timeout=None):
+        """
+        Wait for the next (channel, payload) pair. Raises TimeoutError.
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    """
+    Process-local pub/sub used to fan out events to connected clients.
+
+    Subscribers are grouped by event loop so publishing costs one thread-safe
+    callback per loop regardless of how many clients are connected. Brokers
+    backed by an external bus should subclass this, hold a single upstream
+    subscription per worker and hand incoming messages to ``fanout``.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # loop -> channel -> set of subscriptions
+        self._loops = {}
+
+    def subscribe(self, channels, maxsize=100):
+        subscription = Subscription(self, channels, maxsize=maxsize)
+        with self._lock:
+            by_channel = self._loops.setdefault(subscription.loop, {})
+            for channel in subscription.channels:
+                by_channel.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            by_channel = self._loops.get(subscription.loop)
+            if by_channel is None:
+                return
+            for channel in subscription.channels:
+                subscribers = by_channel.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del by_channel[channel]
+            if not by_channel:
+                del self._loops[subscription.loop]
+
+    def publish(self, channel, payload):
+        """
+        Publish a JSON-serializable payload. Safe to call from any thread.
+        """
+        self.fanout(channel, payload)
+
+    def fanout(self, channel, payload):
+        with self._lock:
+            loops = [loop for loop, by_channel in self._loops.items() if channel in by_channel]
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._dispatch, loop, channel, payload)
+            except RuntimeError:
+                # The loop has been closed; its subscribers are gone
+                pass
+
+    def _dispatch(self, loop, channel, payload):
+        with self._lock:
+            subscribers = tuple(self._loops.get(loop, {}).get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(channel, payload)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({
+                subscription
+                for by_channel in self._loops.values()
+                for subscribers in by_channel.values()
+                for subscription in subscribers
+            })
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Return the process-wide broker configured by ``STAKING_EVENT_BROKER``.
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_path = getattr(settings, 'STAKING_EVENT_BROKER', 'staking.events.InMemoryBroker')
+                _broker = import_string(broker_path)()
+    return _broker
+
+
+def publish_rate(rate):
+    """
+    Publish an ExchangeRate change to every connected client.
+    """
+    get_broker().publish(RATES_CHANNEL, {
+        'from': rate.from_asset,
+        'to': rate.to_asset,
+        'rate': float(rate.rate),
+    })
+
+
+def publish_balance(wallet):
+    """
+    Publish a wallet balance change to the wallet owner.
+    """
+    get_broker().publish(user_channel(wallet.user_id), {
+        'wallet': wallet.pk,
+        'asset': wallet.asset_type,
+        'balance': str(wallet.balance),
+    })
+
+
+def publish_prices(prices):
+    """
+    Publish a whole {asset: price} vector after a bulk rate refresh.
+    """
+    get_broker().publish(RATES_CHANNEL, {'prices': prices})
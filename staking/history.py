@@ -0,0 +1,171 @@
+import datetime
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from .models import ExchangeRateRollup, ExchangeRateTick
+
+# Bucket width in seconds for each rollup interval
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# Each rollup is built from the next finer one, ticks feed the 1m bars
+ROLLUP_SOURCES = {
+    '1m': None,
+    '1h': '1m',
+    '1d': '1h',
+}
+
+
+def to_epoch(value):
+    return int(value.timestamp())
+
+
+def from_epoch(seconds):
+    return datetime.datetime.fromtimestamp(int(seconds), tz=datetime.timezone.utc)
+
+
+def record_ticks(prices, ts=None):
+    """
+    Append one tick per asset from a {asset: usd_price} vector.
+    """
+    ts = ts or timezone.now()
+    ExchangeRateTick.objects.bulk_create([
+        ExchangeRateTick(asset=asset, ts=ts, day=ts.date(), price=float(price))
+        for asset, price in prices.items()
+    ])
+
+
+def price_series(asset, start, end, interval=None):
+    """
+    Return (timestamps, prices) NumPy arrays for an asset in [start, end).
+
+    Timestamps are int64 epoch seconds. With ``interval`` the closing prices
+    of that rollup are returned instead of raw ticks.
+    """
+    if interval:
+        rows = ExchangeRateRollup.objects.filter(
+            asset=asset, interval=interval, bucket__gte=start, bucket__lt=end,
+        ).order_by('bucket').values_list('bucket', 'close')
+    else:
+        rows = ExchangeRateTick.objects.filter(
+            asset=asset, ts__gte=start, ts__lt=end,
+        ).order_by('ts').values_list('ts', 'price')
+
+    data = np.fromiter(
+        ((to_epoch(ts), price) for ts, price in rows.iterator(chunk_size=10000)),
+        dtype=[('ts', np.int64), ('price', np.float64)],
+    )
+    return data['ts'], data['price']
+
+
+def price_matrix(assets, start, end, interval='1d', carry_in=False):
+    """
+    Return (buckets, prices) for several assets on a shared time axis.
+
+    ``prices`` has shape (len(buckets), len(assets)); gaps are forward-filled
+    from the previous bucket. Leading gaps are NaN unless ``carry_in`` is set,
+    in which case they take the last close before ``start``.
+    """
+    assets = list(assets)
+    width = INTERVAL_SECONDS[interval]
+    first = to_epoch(start) // width * width
+    buckets = np.arange(first, to_epoch(end), width, dtype=np.int64)
+    prices = np.full((len(buckets), len(assets)), np.nan)
+    if not len(buckets):
+        return buckets, prices
+
+    column = {asset: i for i, asset in enumerate(assets)}
+    rows = ExchangeRateRollup.objects.filter(
+        asset__in=assets, interval=interval, bucket__gte=from_epoch(first), bucket__lt=end,
+    ).values_list('asset', 'bucket', 'close')
+    for asset, bucket, close in rows.iterator(chunk_size=10000):
+        prices[(to_epoch(bucket) - first) // width, column[asset]] = close
+
+    if carry_in:
+        for asset, i in column.items():
+            if np.isnan(prices[0, i]):
+                previous = ExchangeRateRollup.objects.filter(
+                    asset=asset, interval=interval, bucket__lt=from_epoch(first),
+                ).order_by('-bucket').values_list('close', flat=True).first()
+                if previous is not None:
+                    prices[0, i] = previous
+
+    # Forward-fill each column: carry the index of the last seen value down
+    seen = np.where(np.isnan(prices), 0, np.arange(len(buckets))[:, None])
+    np.maximum.accumulate(seen, axis=0, out=seen)
+    prices = prices[seen, np.arange(len(assets))]
+    return buckets, prices
+
+
+def portfolio_value_series(holdings, start, end, interval='1d'):
+    """
+    Return (buckets, values) for a fixed {asset: quantity} portfolio.
+
+    Assets without a known price contribute nothing to the total.
+    """
+    assets = list(holdings)
+    buckets, prices = price_matrix(assets, start, end, interval)
+    quantities = np.array([float(holdings[asset]) for asset in assets])
+    return buckets, np.nan_to_num(prices) @ quantities
+
+
+def _load_bars(interval, start, end):
+    """
+    Load the source bars for ``interval`` as per-asset arrays of
+    (ts, open, high, low, close), ordered by time.
+    """
+    source = ROLLUP_SOURCES[interval]
+    bars = {}
+    if source is None:
+        rows = ExchangeRateTick.objects.filter(ts__gte=start, ts__lt=end).order_by('asset', 'ts').values_list(
+            'asset', 'ts', 'price',
+        )
+        for asset, ts, price in rows.iterator(chunk_size=10000):
+            bars.setdefault(asset, []).append((to_epoch(ts), price, price, price, price))
+    else:
+        rows = ExchangeRateRollup.objects.filter(
+            interval=source, bucket__gte=start, bucket__lt=end,
+        ).order_by('asset', 'bucket').values_list('asset', 'bucket', 'open', 'high', 'low', 'close')
+        for asset, ts, open_, high, low, close in rows.iterator(chunk_size=10000):
+            bars.setdefault(asset, []).append((to_epoch(ts), open_, high, low, close))
+
+    dtype = [('ts', np.int64), ('open', np.float64), ('high', np.float64), ('low', np.float64), ('close', np.float64)]
+    return {asset: np.array(values, dtype=dtype) for asset, values in bars.items()}
+
+
+def build_rollups(interval, start, end):
+    """
+    (Re)build the OHLC bars of ``interval`` whose buckets start in [start, end).
+
+    Returns the number of bars written.
+    """
+    width = INTERVAL_SECONDS[interval]
+    start = from_epoch(to_epoch(start) // width * width)
+    rollups = []
+    for asset, bars in _load_bars(interval, start, end).items():
+        buckets = bars['ts'] // width * width
+        # Index of the first bar of every bucket; bars are sorted by time
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(bars)] - 1
+        highs = np.maximum.reduceat(bars['high'], starts)
+        lows = np.minimum.reduceat(bars['low'], starts)
+        for bucket, open_, high, low, close in zip(
+            buckets[starts].tolist(), bars['open'][starts].tolist(), highs.tolist(),
+            lows.tolist(), bars['close'][ends].tolist(),
+        ):
+            rollups.append(ExchangeRateRollup(
+                asset=asset, interval=interval, bucket=from_epoch(bucket),
+                open=open_, high=high, low=low, close=close,
+            ))
+
+    with transaction.atomic():
+        ExchangeRateRollup.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=['asset', 'interval', 'bucket'],
+            update_fields=['open', 'high', 'low', 'close'],
+        )
+    return len(rollups)
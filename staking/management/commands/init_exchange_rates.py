@@ -1,63 +1,121 @@
-from django.core.management.base import BaseCommand
-from staking.models import ExchangeRate, AssetWallet
-from decimal import Decimal
+import csv
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from staking.rates import bulk_upsert_rates
+
+# Real-world exchange rates (as of your example)
+# These are rates for converting TO USDT (USD equivalent)
+DEFAULT_USDT_RATES = {
+    'BTC': Decimal('97305.60'),  # 1 BTC = $97,305.60
+    'ETH': Decimal('3000.00'),   # 1 ETH = $3,000.00
+    'USDT': Decimal('1.00'),     # 1 USDT = $1.00
+    'LTC': Decimal('85.00'),
+    'XRP': Decimal('0.50'),
+    'ADA': Decimal('0.40'),
+    'SOL': Decimal('150.00'),
+    'DOT': Decimal('6.50'),
+    'BNB': Decimal('550.00'),
+    'DOGE': Decimal('0.15'),
+    'LINK': Decimal('15.00'),
+    'MATIC': Decimal('0.60'),
+    'EOS': Decimal('0.70'),
+}
 
 class Command(BaseCommand):
-    help = 'Initialize exchange rates for cryptocurrencies'
+    help = 'Initialize exchange rates for cryptocurrencies from a USD price vector'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            help='CSV (asset,price) or JSON ({"BTC": 97305.6, ...}) price file; use "-" for stdin. '
+                 'Defaults to the built-in price table.',
+        )
+        parser.add_argument('--format', choices=['csv', 'json'], help='Input format (guessed from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows per upsert statement')
 
     def handle(self, *args, **options):
-        # Real-world exchange rates (as of your example)
-        # These are rates for converting TO USDT (USD equivalent)
-        usdt_rates = {
-            'BTC': Decimal('97305.60'),  # 1 BTC = $97,305.60
-            'ETH': Decimal('3000.00'),   # 1 ETH = $3,000.00
-            'USDT': Decimal('1.00'),     # 1 USDT = $1.00
-            'LTC': Decimal('85.00'),
-            'XRP': Decimal('0.50'),
-            'ADA': Decimal('0.40'),
-            'SOL': Decimal('150.00'),
-            'DOT': Decimal('6.50'),
-            'BNB': Decimal('550.00'),
-            'DOGE': Decimal('0.15'),
-            'LINK': Decimal('15.00'),
-            'MATIC': Decimal('0.60'),
-            'EOS': Decimal('0.70'),
-        }
-        
-        # Get all asset types
-        asset_types = [choice[0] for choice in AssetWallet.ASSET_CHOICES]
-        
-        created_count = 0
-        updated_count = 0
-        
-        # Create rates for all pairs
-        for from_asset in asset_types:
-            for to_asset in asset_types:
-                if from_asset != to_asset:
-                    # Calculate rate based on USD values
-                    if from_asset in usdt_rates and to_asset in usdt_rates:
-                        # Rate = (USD value of from_asset) / (USD value of to_asset)
-                        # For example: BTC to ETH rate = $97,305.60 / $3,000 = 32.435
-                        if to_asset == 'USDT':
-                            # Direct rate to USDT
-                            rate = usdt_rates[from_asset]
-                        elif from_asset == 'USDT':
-                            # USDT to other crypto
-                            rate = Decimal('1') / usdt_rates[to_asset]
-                        else:
-                            # Crypto to crypto
-                            rate = usdt_rates[from_asset] / usdt_rates[to_asset]
-                        
-                        # Create or update the exchange rate
-                        exchange_rate, created = ExchangeRate.objects.update_or_create(
-                            from_asset=from_asset,
-                            to_asset=to_asset,
-                            defaults={'rate': rate}
-                        )
-                        
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully created {created_count} and updated {updated_count} exchange rates'))
\ No newline at end of file
+        prices = self.load_prices(options['file'], options['format']) if options['file'] else DEFAULT_USDT_RATES
+
+        db_timings = []
+
+        def time_query(execute, sql, params, many, context):
+            query_started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_timings.append(time.perf_counter() - query_started)
+
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(time_query):
+                count = bulk_upsert_rates(prices, batch_size=options['batch_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully upserted {count} exchange rates for {len(prices)} assets '
+            f'in {elapsed:.3f}s ({len(db_timings)} queries, {sum(db_timings):.3f}s DB time)'
+        ))
+
+    def load_prices(self, path, fmt):
+        fmt = fmt or ('csv' if path.endswith('.csv') else 'json')
+        if path == '-':
+            return self.parse_prices(sys.stdin, fmt)
+        try:
+            with open(path, newline='') as f:
+                return self.parse_prices(f, fmt)
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+
+    def parse_prices(self, f, fmt):
+        prices = {}
+        for where, asset, price in self.read_items(f, fmt):
+            if not isinstance(asset, str) or not asset.strip() or len(asset.strip()) > 10:
+                raise CommandError(f'Invalid asset symbol on {where}: {asset!r}')
+            asset = asset.strip().upper()
+            try:
+                prices[asset] = Decimal(str(price).strip())
+            except InvalidOperation:
+                raise CommandError(f'Invalid price for {asset} on {where}: {price!r}')
+        if len(prices) < 2:
+            raise CommandError('At least two assets are needed to compute exchange rates.')
+        return prices
+
+    def read_items(self, f, fmt):
+        """
+        Yield (position, asset, price) for each price in the file, raising
+        CommandError for rows of the wrong shape.
+        """
+        if fmt == 'json':
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise CommandError(f'Invalid JSON price file: {e}')
+            if isinstance(data, dict):
+                for asset, price in data.items():
+                    yield f'key {asset!r}', asset, price
+            elif isinstance(data, list):
+                for i, row in enumerate(data, start=1):
+                    if not isinstance(row, dict) or 'asset' not in row or 'price' not in row:
+                        raise CommandError(f'Item {i} of the JSON price list is not an object with "asset" and "price"')
+                    yield f'item {i}', row['asset'], row['price']
+            else:
+                raise CommandError(
+                    'A JSON price file holds an object ({"BTC": 97305.6, ...}) '
+                    'or a list of {"asset": ..., "price": ...} objects'
+                )
+            return
+
+        reader = csv.reader(f)
+        for row in reader:
+            # Skip blank lines and the header
+            if not row or row[0].strip().lower() == 'asset':
+                continue
+            if len(row) != 2:
+                raise CommandError(f'Line {reader.line_num} of the CSV price file has {len(row)} fields, expected asset,price')
+            yield f'line {reader.line_num}', row[0], row[1]
@@ -0,0 +1,39 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from staking.history import INTERVAL_SECONDS, build_rollups
+
+class Command(BaseCommand):
+    help = 'Downsample exchange-rate ticks into 1m/1h/1d OHLC rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', choices=list(INTERVAL_SECONDS), action='append',
+            help='Interval to build; repeatable. Defaults to all, finest first.',
+        )
+        parser.add_argument('--since', help='Start date or datetime (default: two days ago)')
+        parser.add_argument('--until', help='End date or datetime, exclusive (default: now)')
+
+    def parse_moment(self, value):
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError(f'Invalid date: {value!r}')
+            moment = datetime.datetime.combine(day, datetime.time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, datetime.timezone.utc)
+        return moment
+
+    def handle(self, *args, **options):
+        until = self.parse_moment(options['until']) if options['until'] else timezone.now()
+        since = self.parse_moment(options['since']) if options['since'] else until - datetime.timedelta(days=2)
+        if since >= until:
+            raise CommandError('--since must be before --until.')
+
+        # Coarser rollups are built from finer ones, so keep them in order
+        intervals = [interval for interval in INTERVAL_SECONDS if interval in (options['interval'] or INTERVAL_SECONDS)]
+        for interval in intervals:
+            count = build_rollups(interval, since, until)
+            self.stdout.write(self.style.SUCCESS(f'Built {count} {interval} rollups from {since} to {until}'))
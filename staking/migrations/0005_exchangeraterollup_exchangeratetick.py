@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-19 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staking', '0004_stake_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRateRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asset', models.CharField(max_length=10)),
+                ('interval', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('bucket', models.DateTimeField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+            ],
+            options={
+                'unique_together': {('asset', 'interval', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ExchangeRateTick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asset', models.CharField(max_length=10)),
+                ('ts', models.DateTimeField()),
+                ('day', models.DateField()),
+                ('price', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['asset', 'ts', 'price'], name='staking_tick_asset_ts_cover'), models.Index(fields=['day'], name='staking_tick_day')],
+            },
+        ),
+    ]
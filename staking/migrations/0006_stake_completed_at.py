@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 05:47
+
+from django.db import migrations, models
+
+
+def backfill_completed_at(apps, schema_editor):
+    # The payout time of earlier completions wasn't kept; end_date is the
+    # best estimate
+    Stake = apps.get_model('staking', 'Stake')
+    Stake.objects.filter(is_active=False, completed_at__isnull=True).exclude(status='CANCELLED').update(
+        completed_at=models.F('end_date'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staking', '0005_exchangeraterollup_exchangeratetick'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stake',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
@@ -57,6 +57,8 @@ class Stake(models.Model):
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ACTIVE')
+    # When complete_stakes paid the principal and reward back
+    completed_at = models.DateTimeField(null=True, blank=True)
     
     def save(self, *args, **kwargs):
         # Calculate end date based on plan duration if not set
@@ -150,4 +152,56 @@ class Transaction(models.Model):
     exchange_rate = models.DecimalField(max_digits=24, decimal_places=12, null=True, blank=True)
     
     def __str__(self):
-        return f"{self.user.username} - {self.transaction_type} - {self.amount}"
\ No newline at end of file
+        return f"{self.user.username} - {self.transaction_type} - {self.amount}"
+
+class ExchangeRateTick(models.Model):
+    """
+    Append-only USD price of a single asset at a point in time.
+
+    One row per asset per tick (cross rates are derived), keyed by ``day`` so
+    old data can be pruned or partitioned a day at a time.
+    """
+    asset = models.CharField(max_length=10)
+    ts = models.DateTimeField()
+    day = models.DateField()
+    price = models.FloatField()
+
+    class Meta:
+        indexes = [
+            # Covers range scans of (ts, price) for one asset without touching the table
+            models.Index(fields=['asset', 'ts', 'price'], name='staking_tick_asset_ts_cover'),
+            models.Index(fields=['day'], name='staking_tick_day'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.day:
+            self.day = self.ts.date()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.asset} @ {self.ts}: {self.price}"
+
+
+class ExchangeRateRollup(models.Model):
+    """
+    OHLC price bar for an asset, downsampled from ExchangeRateTick.
+    """
+    INTERVAL_CHOICES = [
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+
+    asset = models.CharField(max_length=10)
+    interval = models.CharField(max_length=2, choices=INTERVAL_CHOICES)
+    bucket = models.DateTimeField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+
+    class Meta:
+        unique_together = ['asset', 'interval', 'bucket']
+
+    def __str__(self):
+        return f"{self.asset} {self.interval} @ {self.bucket}"
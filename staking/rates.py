@@ -0,0 +1,223 @@
+import json
+import secrets
+import threading
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from .events import publish_prices
+from .history import record_ticks
+from .models import ExchangeRate
+
+RATE_VERSION_KEY = 'staking:rate_version'
+RATE_PAYLOAD_KEY = 'staking:rate_payload:{version}'
+QUOTE_KEY = 'staking:quote:{quote_id}'
+
+# Other workers pick up a rate change within this many seconds
+RATE_VERSION_TIMEOUT = 60
+
+# The asset every other asset is priced against on the swap page
+QUOTE_ASSET = 'USDT'
+
+# ExchangeRate.rate is DecimalField(max_digits=24, decimal_places=12)
+RATE_DECIMAL_PLACES = 12
+RATE_QUANTUM = Decimal(10) ** -RATE_DECIMAL_PLACES
+MAX_RATE = Decimal(10) ** (24 - RATE_DECIMAL_PLACES)
+
+# Digits of a float64 quotient that are meaningful; the rest is noise
+RATE_SIGNIFICANT_DIGITS = 15
+
+
+class RateIndex:
+    """
+    In-memory (from_asset, to_asset) -> rate lookup for one rate version.
+    """
+    def __init__(self, version, rates):
+        self.version = version
+        self.rates = rates
+        self.prices = {from_asset: rate for (from_asset, to_asset), rate in rates.items() if to_asset == QUOTE_ASSET}
+        self.prices[QUOTE_ASSET] = Decimal('1')
+
+    def get(self, from_asset, to_asset):
+        return self.rates.get((from_asset, to_asset))
+
+    def __len__(self):
+        return len(self.rates)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_rate_version():
+    """
+    Return the current rate version, computing it from the table if needed.
+    """
+    version = cache.get(RATE_VERSION_KEY)
+    if version is None:
+        stats = ExchangeRate.objects.aggregate(latest=Max('last_updated'), total=Count('id'))
+        latest = stats['latest'].timestamp() if stats['latest'] else 0
+        version = f"{int(latest * 1000)}-{stats['total']}"
+        cache.set(RATE_VERSION_KEY, version, RATE_VERSION_TIMEOUT)
+    return version
+
+
+def invalidate_rates():
+    """
+    Drop the cached rate version so the next lookup rebuilds the index.
+    """
+    global _index
+    cache.delete(RATE_VERSION_KEY)
+    with _index_lock:
+        _index = None
+
+
+def get_rate_index():
+    """
+    Return the rate index for the current version, loading it once per version.
+    """
+    global _index
+    version = get_rate_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            rates = {
+                (from_asset, to_asset): rate
+                for from_asset, to_asset, rate in ExchangeRate.objects.values_list('from_asset', 'to_asset', 'rate')
+            }
+            _index = RateIndex(version, rates)
+        return _index
+
+
+def get_rate_payload():
+    """
+    Compact JSON price vector for the swap page, cached per rate version.
+
+    Prices are quoted against ``QUOTE_ASSET`` so the payload grows linearly
+    with the number of assets; exact pair rates come from ``create_quote``.
+    """
+    index = get_rate_index()
+    key = RATE_PAYLOAD_KEY.format(version=index.version)
+    payload = cache.get(key)
+    if payload is None:
+        payload = json.dumps({
+            'version': index.version,
+            'quote': QUOTE_ASSET,
+            'prices': {asset: float(price) for asset, price in sorted(index.prices.items())},
+        }, separators=(',', ':'))
+        cache.set(key, payload, None)
+    return payload
+
+
+def get_quote_ttl():
+    return getattr(settings, 'SWAP_QUOTE_TTL_SECONDS', 30)
+
+
+def create_quote(user, from_asset, to_asset, amount=None):
+    """
+    Lock the current rate for a pair and return the quote, or None if the
+    pair has no rate.
+    """
+    rate = get_rate_index().get(from_asset, to_asset)
+    if rate is None:
+        return None
+
+    ttl = get_quote_ttl()
+    quote = {
+        'quote_id': secrets.token_urlsafe(12),
+        'user_id': user.pk,
+        'from': from_asset,
+        'to': to_asset,
+        'rate': str(rate),
+        'expires_at': (timezone.now() + timezone.timedelta(seconds=ttl)).isoformat(),
+    }
+    if amount is not None:
+        quote['amount'] = str(amount)
+        quote['to_amount'] = str(amount * rate)
+    cache.set(QUOTE_KEY.format(quote_id=quote['quote_id']), quote, ttl)
+    return quote
+
+
+def redeem_quote(quote_id, user, from_asset, to_asset):
+    """
+    Consume a quote and return its locked rate, or None if it has expired,
+    was already used or does not match the requested swap.
+    """
+    key = QUOTE_KEY.format(quote_id=quote_id)
+    quote = cache.get(key)
+    if quote is None:
+        return None
+    # A mismatched request leaves the quote to its owner
+    if quote['user_id'] != user.pk or quote['from'] != from_asset or quote['to'] != to_asset:
+        return None
+    # Only one of several concurrent redemptions actually deletes the key
+    if not cache.delete(key):
+        return None
+    return Decimal(quote['rate'])
+
+
+def cross_rates(prices):
+    """
+    Compute every ordered cross rate from a {asset: price} vector.
+
+    Returns (from_assets, to_assets, rates) where ``rates`` are strings with
+    ``RATE_DECIMAL_PLACES`` decimals, ready for a DecimalField. Quotients are
+    rounded to ``RATE_SIGNIFICANT_DIGITS`` first so float noise doesn't end
+    up in the stored digits.
+    """
+    assets = list(prices)
+    vector = np.array([float(prices[asset]) for asset in assets], dtype=np.float64)
+    if not np.all(vector > 0):
+        raise ValueError('Prices must be positive numbers.')
+
+    # rate(from, to) = price(from) / price(to), excluding the diagonal
+    matrix = vector[:, None] / vector[None, :]
+    from_idx, to_idx = np.nonzero(~np.eye(len(assets), dtype=bool))
+    rates = matrix[from_idx, to_idx]
+    if np.any(rates >= float(MAX_RATE)):
+        raise ValueError(f'Cross rates must stay below {MAX_RATE}.')
+
+    names = np.array(assets, dtype=object)
+    rounded = np.char.mod(f'%.{RATE_SIGNIFICANT_DIGITS}g', rates)
+    formatted = [f'{Decimal(rate).quantize(RATE_QUANTUM):f}' for rate in rounded.tolist()]
+    return names[from_idx].tolist(), names[to_idx].tolist(), formatted
+
+
+def bulk_upsert_rates(prices, batch_size=None):
+    """
+    Upsert the cross rates of a price vector.
+
+    All pairs are written with a single upsert per batch inside one
+    transaction, alongside one history tick per asset, and caches plus live
+    clients are notified once at the end.
+    Returns the number of pairs written.
+    """
+    from_assets, to_assets, rates = cross_rates(prices)
+    rows = [
+        ExchangeRate(from_asset=from_asset, to_asset=to_asset, rate=Decimal(rate))
+        for from_asset, to_asset, rate in zip(from_assets, to_assets, rates)
+    ]
+
+    with transaction.atomic():
+        ExchangeRate.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['from_asset', 'to_asset'],
+            update_fields=['rate', 'last_updated'],
+        )
+        record_ticks(prices)
+
+        def notify():
+            invalidate_rates()
+            if QUOTE_ASSET in prices:
+                quote_price = float(prices[QUOTE_ASSET])
+                publish_prices({asset: float(price) / quote_price for asset, price in prices.items()})
+        transaction.on_commit(notify)
+
+    return len(rows)
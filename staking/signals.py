@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .events import publish_balance, publish_rate
+from .models import AssetWallet, ExchangeRate
+from .rates import invalidate_rates
+
+@receiver(post_save, sender=ExchangeRate)
+def broadcast_exchange_rate(sender, instance, **kwargs):
+    """
+    Refresh the rate index and push the change to live clients once committed.
+    """
+    def on_commit():
+        invalidate_rates()
+        publish_rate(instance)
+    transaction.on_commit(on_commit)
+
+@receiver(post_delete, sender=ExchangeRate)
+def drop_exchange_rate(sender, instance, **kwargs):
+    """
+    Refresh the rate index once a deleted rate is committed.
+    """
+    transaction.on_commit(invalidate_rates)
+
+@receiver(post_save, sender=AssetWallet)
+def broadcast_wallet_balance(sender, instance, created, **kwargs):
+    """
+    Push balance changes to the wallet owner once the change is committed.
+    """
+    if created:
+        return
+    transaction.on_commit(lambda: publish_balance(instance))
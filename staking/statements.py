@@ -0,0 +1,163 @@
+import csv
+import datetime
+import functools
+import numpy as np
+from .history import price_matrix, to_epoch
+from .models import AssetWallet, Stake, Transaction
+from .rates import QUOTE_ASSET
+
+SECONDS_PER_DAY = 86400
+
+STATEMENT_HEADER = ['user_id', 'date', 'asset', 'balance', 'price_usd', 'value_usd']
+
+# Label of the per-day portfolio total row
+TOTAL_ASSET = 'TOTAL'
+
+
+def ledger_entries(transaction_type, status, asset, to_asset, amount, to_amount):
+    """
+    Yield the (asset, delta) balance changes a transaction made.
+
+    Mirrors how the views and admin actions move balances: withdrawals and
+    swaps are deducted when requested and refunded if rejected, deposits only
+    land once confirmed.
+    """
+    if status == 'REJECTED':
+        return
+    if transaction_type == 'DEPOSIT':
+        if status == 'CONFIRMED':
+            yield asset, amount
+    elif transaction_type in ('WITHDRAWAL', 'STAKE'):
+        yield asset, -amount
+    elif transaction_type in ('UNSTAKE', 'REWARD'):
+        yield asset, amount
+    elif transaction_type == 'SWAP':
+        yield asset, -amount
+        if to_asset and to_amount:
+            yield to_asset, to_amount
+
+
+def statement_days(start, end):
+    """
+    Return the dates covered by a statement period [start, end).
+    """
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days)]
+
+
+def _period_bounds(start, end):
+    start_at = datetime.datetime.combine(start, datetime.time.min, tzinfo=datetime.timezone.utc)
+    end_at = datetime.datetime.combine(end, datetime.time.min, tzinfo=datetime.timezone.utc)
+    return start_at, end_at
+
+
+@functools.lru_cache(maxsize=8)
+def _daily_prices(assets, start, end):
+    """
+    End-of-day USD prices with shape (days, assets), loaded once per process.
+    """
+    start_at, end_at = _period_bounds(start, end)
+    _, prices = price_matrix(assets, start_at, end_at, interval='1d', carry_in=True)
+    if QUOTE_ASSET in assets:
+        quote = prices[:, assets.index(QUOTE_ASSET)]
+        quote[np.isnan(quote)] = 1.0
+    return prices
+
+
+def daily_balances(user_ids, start, end):
+    """
+    Reconstruct end-of-day balances from the transaction ledger.
+
+    Returns (assets, balances) where ``balances`` has shape
+    (len(user_ids), len(assets), days). Everything before ``start`` is
+    folded into the opening balance, then deltas are summed per day and
+    accumulated in one vectorized pass. The principal of a completed stake
+    is returned at its ``completed_at``, when the admin action paid it.
+    """
+    user_ids = list(user_ids)
+    start_at, end_at = _period_bounds(start, end)
+    start_epoch = to_epoch(start_at)
+    days = (end - start).days
+
+    assets = [code for code, _ in AssetWallet.ASSET_CHOICES]
+    asset_index = {asset: i for i, asset in enumerate(assets)}
+    user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+
+    rows = Transaction.objects.filter(user_id__in=user_ids, timestamp__lt=end_at).values_list(
+        'user_id', 'transaction_type', 'status', 'asset_wallet__asset_type',
+        'to_asset_wallet__asset_type', 'amount', 'to_amount', 'timestamp',
+    )
+    users, slots, buckets, deltas = [], [], [], []
+
+    def add(user_id, entry_asset, delta, timestamp):
+        # Bucket 0 is the opening balance, bucket d + 1 is day d of the period
+        if entry_asset not in asset_index:
+            asset_index[entry_asset] = len(assets)
+            assets.append(entry_asset)
+        users.append(user_index[user_id])
+        slots.append(asset_index[entry_asset])
+        buckets.append(max((to_epoch(timestamp) - start_epoch) // SECONDS_PER_DAY + 1, 0))
+        deltas.append(float(delta))
+
+    for user_id, transaction_type, status, asset, to_asset, amount, to_amount, timestamp in rows.iterator(chunk_size=10000):
+        for entry_asset, delta in ledger_entries(transaction_type, status, asset, to_asset, amount, to_amount):
+            add(user_id, entry_asset, delta, timestamp)
+
+    # Completing a stake pays the principal back without a transaction of its
+    # own (only the reward is recorded), so it is taken from the stake itself
+    stakes = Stake.objects.filter(user_id__in=user_ids, is_active=False, completed_at__lt=end_at).exclude(
+        status='CANCELLED',
+    ).values_list('user_id', 'asset_wallet__asset_type', 'amount', 'completed_at')
+    for user_id, asset, amount, completed_at in stakes.iterator(chunk_size=10000):
+        add(user_id, asset, amount, completed_at)
+
+    shape = (len(user_ids), len(assets), days + 1)
+    flat = np.ravel_multi_index(
+        (np.array(users, dtype=np.intp), np.array(slots, dtype=np.intp), np.array(buckets, dtype=np.intp)),
+        shape,
+    )
+    totals = np.bincount(flat, weights=np.array(deltas, dtype=np.float64), minlength=int(np.prod(shape)))
+    balances = np.cumsum(totals.reshape(shape), axis=2)[:, :, 1:]
+    # Drop float noise below the 8 decimals amounts are stored with
+    return assets, np.round(balances, 8)
+
+
+def statement_rows(user_ids, start, end):
+    """
+    Yield CSV/PDF-ready rows (see ``STATEMENT_HEADER``) for every user and day.
+
+    Assets with a zero balance on a day are skipped; each day ends with a
+    ``TOTAL`` row carrying the portfolio value.
+    """
+    user_ids = list(user_ids)
+    assets, balances = daily_balances(user_ids, start, end)
+    prices = _daily_prices(tuple(assets), start, end)
+    # (users, assets, days) * (assets, days) -> values per asset and day
+    values = balances * np.nan_to_num(prices.T)[None, :, :]
+    totals = values.sum(axis=1)
+    days = [day.isoformat() for day in statement_days(start, end)]
+
+    for u, user_id in enumerate(user_ids):
+        for d, day in enumerate(days):
+            for a in np.flatnonzero(balances[u, :, d]):
+                price = prices[d, a]
+                yield [
+                    user_id, day, assets[a], f'{balances[u, a, d]:.8f}',
+                    '' if np.isnan(price) else f'{price:.8f}', f'{values[u, a, d]:.2f}',
+                ]
+            yield [user_id, day, TOTAL_ASSET, '', '', f'{totals[u, d]:.2f}']
+
+
+def write_statements(user_ids, start, end, path):
+    """
+    Stream statement rows for a batch of users to a CSV file.
+
+    Returns the number of rows written.
+    """
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(STATEMENT_HEADER)
+        for row in statement_rows(user_ids, start, end):
+            writer.writerow(row)
+            count += 1
+    return count
@@ -1,3 +1,369 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+import numpy as np
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from . import events
+from .events import RATES_CHANNEL, InMemoryBroker, format_event, user_channel
+from .history import build_rollups, portfolio_value_series, price_matrix, price_series, record_ticks
+from .models import AssetWallet, ExchangeRate, ExchangeRateRollup, ExchangeRateTick, Plan, Stake, Transaction
+from .rates import bulk_upsert_rates, create_quote, cross_rates, invalidate_rates, redeem_quote
+from .statements import daily_balances
+from .views import _event_stream
 
-# Create your tests here.
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def at(day, hour=12):
+    return datetime.datetime(2025, 4, day, hour, tzinfo=datetime.timezone.utc)
+
+
+class StakingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='x')
+        self.plan = Plan.objects.create(
+            name='Flexible', duration_days=3, roi_percentage=Decimal('10'), minimum_amount=Decimal('1'),
+        )
+        self.btc = AssetWallet.objects.create(user=self.user, asset_type='BTC', balance=Decimal('0'))
+
+    def transaction(self, transaction_type, amount, timestamp, status='CONFIRMED', **kwargs):
+        tx = Transaction.objects.create(
+            user=self.user, asset_wallet=self.btc, transaction_type=transaction_type,
+            amount=Decimal(amount), status=status, **kwargs,
+        )
+        # timestamp is auto_now_add
+        Transaction.objects.filter(pk=tx.pk).update(timestamp=timestamp)
+        return tx
+
+    def stake(self, amount, end_date, **kwargs):
+        return Stake.objects.create(
+            user=self.user, plan=self.plan, asset_wallet=self.btc, amount=Decimal(amount), end_date=end_date, **kwargs,
+        )
+
+
+class DailyBalancesTests(StakingTestCase):
+    def balances(self, start=datetime.date(2025, 4, 1), end=datetime.date(2025, 4, 6)):
+        assets, balances = daily_balances([self.user.pk], start, end)
+        return list(balances[0, assets.index('BTC')])
+
+    def test_ledger_entries(self):
+        self.transaction('DEPOSIT', '10', at(1))
+        self.transaction('DEPOSIT', '5', at(2), status='PENDING')
+        self.transaction('WITHDRAWAL', '3', at(3))
+        self.transaction('WITHDRAWAL', '1', at(3), status='REJECTED')
+        self.assertEqual(self.balances(), [10, 10, 7, 7, 7])
+
+    def test_opening_balance(self):
+        self.transaction('DEPOSIT', '10', at(1))
+        self.assertEqual(self.balances(start=datetime.date(2025, 4, 3)), [10, 10, 10])
+
+    def test_completed_stake_returns_principal_when_completed(self):
+        self.transaction('DEPOSIT', '10', at(1))
+        self.transaction('STAKE', '4', at(2))
+        self.stake('4', at(30), is_active=False, completed_at=at(4, 13))
+        self.transaction('REWARD', '0.4', at(4, 13))
+        self.assertEqual(self.balances(), [10, 6, 6, 10.4, 10.4])
+
+    def test_active_and_cancelled_stakes_stay_locked(self):
+        self.transaction('DEPOSIT', '10', at(1))
+        self.transaction('STAKE', '4', at(2))
+        self.stake('4', at(3))
+        self.transaction('STAKE', '2', at(2))
+        self.stake('2', at(3), is_active=False, status='CANCELLED')
+        self.assertEqual(self.balances(), [10, 4, 4, 4, 4])
+
+    def test_stake_completed_after_the_period_is_not_returned(self):
+        self.transaction('DEPOSIT', '10', at(1))
+        self.transaction('STAKE', '4', at(2))
+        self.stake('4', at(3), is_active=False, completed_at=at(20))
+        self.assertEqual(self.balances(), [10, 6, 6, 6, 6])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CompleteStakesActionTests(StakingTestCase):
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_superuser(email='admin@example.com', password='x')
+        self.client.force_login(admin)
+
+    def complete(self, stake):
+        response = self.client.post(reverse('admin:staking_stake_changelist'), {
+            'action': 'complete_stakes', '_selected_action': [stake.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        stake.refresh_from_db()
+        self.btc.refresh_from_db()
+
+    def stake_from_deposit(self, end_date):
+        # Deposit 10 a week ago and stake 4 of it, as the views would
+        now = timezone.now()
+        self.transaction('DEPOSIT', '10', now - datetime.timedelta(days=7))
+        self.transaction('STAKE', '4', now - datetime.timedelta(days=6))
+        self.btc.balance = Decimal('6')
+        self.btc.save()
+        return self.stake('4', end_date)
+
+    def statement(self):
+        today = timezone.now().date()
+        assets, balances = daily_balances([self.user.pk], today - datetime.timedelta(days=7), today + datetime.timedelta(days=1))
+        return list(balances[0, assets.index('BTC')])
+
+    def test_reward_is_the_only_new_transaction(self):
+        self.btc.balance = Decimal('6')
+        self.btc.save()
+        stake = self.stake('4', at(4))
+        self.complete(stake)
+        self.assertEqual(self.btc.balance, Decimal('10.4'))
+        self.assertFalse(stake.is_active)
+        self.assertEqual(stake.status, 'COMPLETED')
+        self.assertIsNotNone(stake.completed_at)
+        self.assertEqual(
+            list(Transaction.objects.values_list('transaction_type', 'amount')),
+            [('REWARD', Decimal('0.4'))],
+        )
+
+    def test_completed_before_end_date(self):
+        stake = self.stake_from_deposit(timezone.now() + datetime.timedelta(days=30))
+        self.complete(stake)
+        balances = self.statement()
+        self.assertEqual(balances[-1], float(self.btc.balance))
+        self.assertEqual(balances[-2], 6)
+
+    def test_completed_after_end_date(self):
+        stake = self.stake_from_deposit(timezone.now() - datetime.timedelta(days=3))
+        self.complete(stake)
+        balances = self.statement()
+        # Not returned on the end date, only when the wallet was paid
+        self.assertEqual(balances[1:-1], [6] * 6)
+        self.assertEqual(balances[-1], float(self.btc.balance))
+
+
+class QuoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='x')
+        self.other = User.objects.create_user(email='other@example.com', password='x')
+        ExchangeRate.objects.create(from_asset='BTC', to_asset='USDT', rate=Decimal('60000'))
+        invalidate_rates()
+
+    def test_quote_is_redeemed_once(self):
+        quote = create_quote(self.user, 'BTC', 'USDT', Decimal('2'))
+        self.assertEqual(quote['to_amount'], '120000.000000000000')
+        self.assertEqual(redeem_quote(quote['quote_id'], self.user, 'BTC', 'USDT'), Decimal('60000'))
+        self.assertIsNone(redeem_quote(quote['quote_id'], self.user, 'BTC', 'USDT'))
+
+    def test_unknown_pair_has_no_quote(self):
+        self.assertIsNone(create_quote(self.user, 'USDT', 'BTC'))
+
+    def test_mismatched_redeem_leaves_quote_to_its_owner(self):
+        quote = create_quote(self.user, 'BTC', 'USDT')
+        self.assertIsNone(redeem_quote(quote['quote_id'], self.other, 'BTC', 'USDT'))
+        self.assertIsNone(redeem_quote(quote['quote_id'], self.user, 'BTC', 'ETH'))
+        self.assertEqual(redeem_quote(quote['quote_id'], self.user, 'BTC', 'USDT'), Decimal('60000'))
+
+    def test_lost_race_is_refused(self):
+        quote = create_quote(self.user, 'BTC', 'USDT')
+        # Another request deleted the key between our get and delete
+        with mock.patch.object(cache, 'delete', return_value=False):
+            self.assertIsNone(redeem_quote(quote['quote_id'], self.user, 'BTC', 'USDT'))
+
+
+class CrossRatesTests(SimpleTestCase):
+    def test_rates_have_no_float_noise(self):
+        from_assets, to_assets, rates = cross_rates({'BTC': Decimal('60000.1'), 'USDT': Decimal('1')})
+        self.assertEqual(list(zip(from_assets, to_assets, rates)), [
+            ('BTC', 'USDT', '60000.100000000000'),
+            ('USDT', 'BTC', '0.000016666639'),
+        ])
+
+    def test_every_ordered_pair(self):
+        from_assets, to_assets, rates = cross_rates({'BTC': 3, 'ETH': 7, 'USDT': 1})
+        self.assertEqual(len(rates), 6)
+        pairs = dict(zip(zip(from_assets, to_assets), rates))
+        self.assertEqual(pairs['BTC', 'ETH'], '0.428571428571')
+        self.assertEqual(pairs['ETH', 'BTC'], '2.333333333333')
+
+    def test_invalid_prices(self):
+        with self.assertRaises(ValueError):
+            cross_rates({'BTC': Decimal('0'), 'USDT': Decimal('1')})
+        with self.assertRaises(ValueError):
+            cross_rates({'BTC': Decimal('1e13'), 'USDT': Decimal('1')})
+
+
+class InitExchangeRatesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def load(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        call_command('init_exchange_rates', '--file', path, stdout=StringIO())
+
+    def rate(self, from_asset, to_asset):
+        return ExchangeRate.objects.get(from_asset=from_asset, to_asset=to_asset).rate
+
+    def test_csv_and_json(self):
+        self.load('prices.csv', 'asset,price\nbtc,60000\n\nUSDT,1\n')
+        self.assertEqual(self.rate('BTC', 'USDT'), Decimal('60000'))
+        self.load('prices.json', '[{"asset": "ETH", "price": 3000}, {"asset": "USDT", "price": "1"}]')
+        self.assertEqual(self.rate('ETH', 'USDT'), Decimal('3000'))
+        self.load('prices.json', '{"BTC": 50000, "ETH": 2500}')
+        self.assertEqual(self.rate('BTC', 'ETH'), Decimal('20'))
+
+    def test_malformed_files(self):
+        cases = [
+            ('prices.csv', 'BTC,60000\nETH\n', 'Line 2 of the CSV price file has 1 fields'),
+            ('prices.csv', 'BTC,60000,USD\nETH,3000\n', 'Line 1 of the CSV price file has 3 fields'),
+            ('prices.csv', 'BTC,60000\nETH,lots\n', "Invalid price for ETH on line 2: 'lots'"),
+            ('prices.json', '[{"asset": "BTC", "price": 1}, {"asset": "ETH"}]', 'Item 2 of the JSON price list'),
+            ('prices.json', '["BTC", "ETH"]', 'Item 1 of the JSON price list'),
+            ('prices.json', '[{"asset": 7, "price": 1}, {"asset": "ETH", "price": 1}]', 'Invalid asset symbol on item 1'),
+            ('prices.json', '42', 'A JSON price file holds an object'),
+            ('prices.json', '{"BTC": 1', 'Invalid JSON price file'),
+        ]
+        for name, content, message in cases:
+            with self.subTest(content=content):
+                with self.assertRaisesMessage(CommandError, message):
+                    self.load(name, content)
+        self.assertFalse(ExchangeRate.objects.exists())
+
+
+class BrokerTests(SimpleTestCase):
+    def test_format_event(self):
+        self.assertEqual(format_event('rate', {'from': 'BTC', 'rate': 1.5}), 'event: rate\ndata: {"from":"BTC","rate":1.5}\n\n')
+
+    async def test_publish_from_another_thread(self):
+        broker = InMemoryBroker()
+        mine = broker.subscribe([RATES_CHANNEL, user_channel(1)])
+        theirs = broker.subscribe([user_channel(2)])
+        thread = threading.Thread(target=broker.publish, args=(user_channel(1), {'balance': '1'}))
+        thread.start()
+        thread.join()
+        self.assertEqual(await mine.get(timeout=1), (user_channel(1), {'balance': '1'}))
+        with self.assertRaises(TimeoutError):
+            await theirs.get(timeout=0.01)
+
+    async def test_slow_client_keeps_newest(self):
+        broker = InMemoryBroker()
+        subscription = broker.subscribe([RATES_CHANNEL], maxsize=2)
+        for i in range(3):
+            broker.publish(RATES_CHANNEL, i)
+        await asyncio.sleep(0)
+        self.assertEqual([(await subscription.get(timeout=1))[1] for _ in range(2)], [1, 2])
+
+    async def test_unsubscribe(self):
+        broker = InMemoryBroker()
+        subscription = broker.subscribe([RATES_CHANNEL, user_channel(1)])
+        self.assertEqual(broker.subscriber_count(), 1)
+        subscription.close()
+        self.assertEqual(broker.subscriber_count(), 0)
+        self.assertEqual(broker._loops, {})
+
+    async def test_event_stream(self):
+        broker = InMemoryBroker()
+        with mock.patch.object(events, '_broker', broker):
+            stream = _event_stream(7)
+            self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+            next_frame = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            broker.publish(user_channel(8), {'balance': 'other user'})
+            broker.publish(user_channel(7), {'balance': '2.5'})
+            self.assertEqual(await next_frame, 'event: balance\ndata: {"balance":"2.5"}\n\n')
+            await stream.aclose()
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class LiveEventsTests(TestCase):
+    def test_login_required(self):
+        response = self.client.get(reverse('live_events'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_changes_published_on_commit(self):
+        user = User.objects.create_user(email='user@example.com', password='x')
+        wallet = AssetWallet.objects.create(user=user, asset_type='BTC')
+        with mock.patch.object(events, 'get_broker') as get_broker:
+            with self.captureOnCommitCallbacks(execute=True):
+                ExchangeRate.objects.create(from_asset='BTC', to_asset='USDT', rate=Decimal('60000'))
+                wallet.balance = Decimal('1.5')
+                wallet.save()
+                get_broker.return_value.publish.assert_not_called()
+        get_broker.return_value.publish.assert_has_calls([
+            mock.call(RATES_CHANNEL, {'from': 'BTC', 'to': 'USDT', 'rate': 60000.0}),
+            mock.call(user_channel(user.pk), {'wallet': wallet.pk, 'asset': 'BTC', 'balance': '1.5'}),
+        ])
+
+
+def minute(day, hour, minute_, second=0):
+    return datetime.datetime(2025, 4, day, hour, minute_, second, tzinfo=datetime.timezone.utc)
+
+
+class RateHistoryTests(TestCase):
+    def setUp(self):
+        for ts, btc, eth in [
+            (minute(1, 10, 0, 5), 100, 10),
+            (minute(1, 10, 0, 30), 120, 11),
+            (minute(1, 10, 0, 50), 90, 9),
+            (minute(1, 10, 1, 10), 110, 12),
+            (minute(2, 9, 0), 200, None),
+        ]:
+            record_ticks({'BTC': btc, **({'ETH': eth} if eth else {})}, ts=ts)
+
+    def test_bulk_upsert_records_a_tick_per_asset(self):
+        bulk_upsert_rates({'BTC': Decimal('60000'), 'USDT': Decimal('1')})
+        self.assertEqual(ExchangeRate.objects.count(), 2)
+        self.assertEqual(ExchangeRateTick.objects.filter(asset__in=['BTC', 'USDT']).count(), 7)
+        # Updated in place the second time
+        bulk_upsert_rates({'BTC': Decimal('61000'), 'USDT': Decimal('1')})
+        self.assertEqual(ExchangeRate.objects.get(from_asset='BTC').rate, Decimal('61000'))
+
+    def test_price_series(self):
+        ts, prices = price_series('BTC', minute(1, 0, 0), minute(2, 0, 0))
+        self.assertEqual(prices.tolist(), [100, 120, 90, 110])
+        self.assertEqual(int(ts[0]), int(minute(1, 10, 0, 5).timestamp()))
+
+    def test_rollups_chain(self):
+        self.assertEqual(build_rollups('1m', minute(1, 0, 0), minute(3, 0, 0)), 5)
+        bar = ExchangeRateRollup.objects.get(asset='BTC', interval='1m', bucket=minute(1, 10, 0))
+        self.assertEqual((bar.open, bar.high, bar.low, bar.close), (100, 120, 90, 90))
+        build_rollups('1h', minute(1, 0, 0), minute(3, 0, 0))
+        build_rollups('1d', minute(1, 0, 0), minute(3, 0, 0))
+        day = ExchangeRateRollup.objects.get(asset='BTC', interval='1d', bucket=minute(1, 0, 0))
+        self.assertEqual((day.open, day.high, day.low, day.close), (100, 120, 90, 110))
+        # Rebuilding updates bars instead of duplicating them
+        build_rollups('1m', minute(1, 0, 0), minute(3, 0, 0))
+        self.assertEqual(ExchangeRateRollup.objects.filter(interval='1m').count(), 5)
+
+    def test_rollup_command(self):
+        call_command('rollup_rate_ticks', since='2025-04-01', until='2025-04-03', stdout=StringIO())
+        self.assertEqual(ExchangeRateRollup.objects.filter(interval='1d').count(), 3)
+
+    def test_price_matrix_forward_fills(self):
+        call_command('rollup_rate_ticks', since='2025-04-01', until='2025-04-03', stdout=StringIO())
+        buckets, prices = price_matrix(['BTC', 'ETH'], minute(1, 0, 0), minute(4, 0, 0))
+        self.assertEqual(len(buckets), 3)
+        self.assertEqual(prices[:, 0].tolist(), [110, 200, 200])
+        self.assertEqual(prices[:, 1].tolist(), [12, 12, 12])
+
+        _, prices = price_matrix(['ETH'], minute(2, 0, 0), minute(3, 0, 0))
+        self.assertTrue(np.isnan(prices[0, 0]))
+        _, prices = price_matrix(['ETH'], minute(2, 0, 0), minute(3, 0, 0), carry_in=True)
+        self.assertEqual(prices[0, 0], 12)
+
+    def test_portfolio_value_series(self):
+        call_command('rollup_rate_ticks', since='2025-04-01', until='2025-04-03', stdout=StringIO())
+        _, values = portfolio_value_series({'BTC': Decimal('2'), 'ETH': 10, 'DOGE': 5}, minute(1, 0, 0), minute(3, 0, 0))
+        self.assertEqual(values.tolist(), [340, 520])
@@ -10,5 +10,7 @@ urlpatterns = [
     path('withdrawal/', views.withdrawal, name='withdrawal'),
     path('transactions/', views.transactions, name='transactions'),
     path('swap/', views.swap, name='swap'),
+    path('swap/quote/', views.swap_quote, name='swap_quote'),
     path('buy_crypto', views.buy_crypto, name='buy_crypto'),
+    path('events/', views.live_events, name='live_events'),
 ]
\ No newline at end of file
@@ -1,14 +1,19 @@
-import json
 import datetime 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from django.db.models import Q
 from django.contrib import messages
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from .events import RATES_CHANNEL, format_event, get_broker, user_channel
 from .models import AssetWallet, Transaction, Plan, Stake, Card, WalletConnection, DepositAddress, ExchangeRate
+from .rates import QUOTE_ASSET, create_quote, get_quote_ttl, get_rate_index, get_rate_payload, redeem_quote
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_HEARTBEAT = 15
 
 @login_required
 def dashboard(request):
@@ -24,13 +29,8 @@ def dashboard(request):
         )
         wallets.append(wallet)
     
-    # Get exchange rates to USDT (as our USD equivalent)
-    exchange_rates = {}
-    for rate in ExchangeRate.objects.filter(to_asset='USDT'):
-        exchange_rates[rate.from_asset] = rate.rate
-    
-    # Add USDT to USD rate (typically 1:1)
-    exchange_rates['USDT'] = Decimal('1.0')
+    # Get exchange rates to USDT (as our USD equivalent), USDT itself included
+    exchange_rates = get_rate_index().prices
     
     # Calculate USD value for each wallet and total balance
     total_balance_usd = Decimal('0')
@@ -261,18 +261,29 @@ def deposit(request):
     })
 
 
+def _swap_context(wallets, **extra):
+    index = get_rate_index()
+    context = {
+        'wallets': wallets,
+        'asset_prices': sorted(index.prices.items()),
+        'quote_asset': QUOTE_ASSET,
+        'rate_data_json': get_rate_payload(),
+        'quote_ttl': get_quote_ttl(),
+    }
+    context.update(extra)
+    return context
+
+
 @login_required
 def swap(request):
     # Get user's wallets
     wallets = AssetWallet.objects.filter(user=request.user)
     
-    # Get all available exchange rates
-    exchange_rates = ExchangeRate.objects.all()
-    
     if request.method == 'POST':
         from_wallet_id = request.POST.get('from_wallet')
         to_wallet_id = request.POST.get('to_wallet')
         amount = Decimal(request.POST.get('amount'))
+        quote_id = request.POST.get('quote_id')
         
         from_wallet = AssetWallet.objects.get(id=from_wallet_id)
         to_wallet = AssetWallet.objects.get(id=to_wallet_id)
@@ -280,22 +291,19 @@ def swap(request):
         # Validate amount
         if from_wallet.balance < amount:
             messages.error(request, 'Insufficient balance for swap.')
-            return render(request, 'staking/swap.html', {
-                'wallets': wallets,
-                'exchange_rates': exchange_rates,
-                'error': 'Insufficient balance'
-            })
-        
-        # Get exchange rate
-        try:
-            rate = ExchangeRate.objects.get(from_asset=from_wallet.asset_type, to_asset=to_wallet.asset_type).rate
-        except ExchangeRate.DoesNotExist:
-            messages.error(request, 'Exchange rate not available for this pair.')
-            return render(request, 'staking/swap.html', {
-                'wallets': wallets,
-                'exchange_rates': exchange_rates,
-                'error': 'Exchange rate not available'
-            })
+            return render(request, 'staking/swap.html', _swap_context(wallets, error='Insufficient balance'))
+        
+        # Execute against the locked quote if one was issued, otherwise the current rate
+        if quote_id:
+            rate = redeem_quote(quote_id, request.user, from_wallet.asset_type, to_wallet.asset_type)
+            if rate is None:
+                messages.error(request, 'Your quote has expired. Please review the updated rate.')
+                return render(request, 'staking/swap.html', _swap_context(wallets, error='Quote expired'))
+        else:
+            rate = get_rate_index().get(from_wallet.asset_type, to_wallet.asset_type)
+            if rate is None:
+                messages.error(request, 'Exchange rate not available for this pair.')
+                return render(request, 'staking/swap.html', _swap_context(wallets, error='Exchange rate not available'))
         
         # Calculate to_amount
         to_amount = amount * rate
@@ -322,18 +330,28 @@ def swap(request):
         messages.success(request, f'Successfully swapped {amount} {from_wallet.asset_type} to {to_amount} {to_wallet.asset_type}.')
         return redirect('dashboard')
     
-    # Prepare exchange rate data for JavaScript
-    rate_data = {}
-    for rate in exchange_rates:
-        if rate.from_asset not in rate_data:
-            rate_data[rate.from_asset] = {}
-        rate_data[rate.from_asset][rate.to_asset] = float(rate.rate)
+    return render(request, 'staking/swap.html', _swap_context(wallets))
+
+
+@login_required
+def swap_quote(request):
+    """
+    Lock the current rate for a pair and return a short-lived quote.
+    """
+    from_asset = request.GET.get('from', '')
+    to_asset = request.GET.get('to', '')
+    try:
+        amount = Decimal(request.GET['amount']) if request.GET.get('amount') else None
+    except InvalidOperation:
+        return JsonResponse({'error': 'Invalid amount'}, status=400)
     
-    return render(request, 'staking/swap.html', {
-        'wallets': wallets,
-        'exchange_rates': exchange_rates,
-        'rate_data_json': json.dumps(rate_data)
-    })
+    quote = create_quote(request.user, from_asset, to_asset, amount)
+    if quote is None:
+        return JsonResponse({'error': 'Exchange rate not available'}, status=404)
+    
+    quote.pop('user_id')
+    quote['expires_in'] = get_quote_ttl()
+    return JsonResponse(quote)
 
 
 @login_required
@@ -395,4 +413,33 @@ def transactions(request):
     })
 
 def buy_crypto(request):
-    return render(request, 'staking/buy_crypto.html')
\ No newline at end of file
+    return render(request, 'staking/buy_crypto.html')
+
+
+async def _event_stream(user_id):
+    # Subscribe lazily so the subscription is bound to the serving event loop
+    subscription = get_broker().subscribe([RATES_CHANNEL, user_channel(user_id)])
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                channel, payload = await subscription.get(timeout=EVENT_STREAM_HEARTBEAT)
+            except TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            event = 'rate' if channel == RATES_CHANNEL else 'balance'
+            yield format_event(event, payload)
+    finally:
+        subscription.close()
+
+
+@login_required
+async def live_events(request):
+    """
+    Server-sent events stream of rate changes and the user's balance changes.
+    """
+    user = await request.auser()
+    response = StreamingHttpResponse(_event_stream(user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
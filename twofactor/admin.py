@@ -26,10 +26,10 @@ class UserTwoFactorSettingsAdmin(admin.ModelAdmin):
 
 @admin.register(EmailOTP)
 class EmailOTPAdmin(admin.ModelAdmin):
-    list_display = ('user', 'code', 'is_used', 'created_at', 'expires_at')
+    list_display = ('user', 'is_used', 'created_at', 'expires_at')
     list_filter = ('is_used', 'created_at')
-    search_fields = ('user__email', 'code')
-    readonly_fields = ('created_at',)
+    search_fields = ('user__email',)
+    readonly_fields = ('created_at', 'code_hash')
 
     def has_add_permission(self, request):
         # Usually, OTPs are generated through views, not manually.
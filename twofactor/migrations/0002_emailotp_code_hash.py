@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+from django.utils.crypto import salted_hmac
+
+
+def hash_codes(apps, schema_editor):
+    # Unexpired codes keep working; used and expired ones are dropped
+    EmailOTP = apps.get_model('twofactor', 'EmailOTP')
+    for otp in EmailOTP.objects.filter(is_used=False).iterator():
+        otp.code_hash = salted_hmac('twofactor.EmailOTP', f'{otp.user_id}:{otp.code}', algorithm='sha256').hexdigest()
+        otp.save(update_fields=['code_hash'])
+    EmailOTP.objects.filter(code_hash='').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twofactor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailotp',
+            name='code_hash',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_codes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='emailotp',
+            name='code',
+        ),
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(fields=['user', 'is_used', 'expires_at', 'created_at'], name='twofactor_otp_lookup'),
+        ),
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(fields=['expires_at'], name='twofactor_otp_expires'),
+        ),
+    ]
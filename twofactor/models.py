@@ -46,14 +46,23 @@ class UserTwoFactorSettings(models.Model):
 
 class EmailOTP(models.Model):
     """
-    Stores email one-time password codes.
+    Stores email one-time password codes. Only an HMAC of the code is kept;
+    see twofactor.utils.hash_otp_code.
     """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='email_otps')
-    code = models.CharField(max_length=6)
+    code_hash = models.CharField(max_length=64)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_used = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Validation and invalidation filter on all of these
+            models.Index(fields=['user', 'is_used', 'expires_at', 'created_at'], name='twofactor_otp_lookup'),
+            # Purging walks expired rows
+            models.Index(fields=['expires_at'], name='twofactor_otp_expires'),
+        ]
+
     def __str__(self):
         return f"OTP for {self.user.email}"
     
@@ -68,4 +77,4 @@ class EmailOTP(models.Model):
         Mark the OTP as used.
         """
         self.is_used = True
-        self.save(update_fields=['is_used'])
\ No newline at end of file
+        self.save(update_fields=['is_used'])
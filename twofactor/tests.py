@@ -1,3 +1,188 @@
-from django.test import TestCase
+import re
+from datetime import timedelta
+from unittest import mock
+import pyotp
+from django.core.cache import cache
+from io import StringIO
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from core import ratelimit
+from .models import EmailOTP, UserTwoFactorSettings
+from . import utils
+from .utils import (
+    generate_email_otp, generate_qr_code, get_totp_uri, hash_otp_code, purge_expired_otps, validate_email_otp,
+)
 
-# Create your tests here.
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class EmailOTPTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='x')
+        self.other = User.objects.create_user(email='other@example.com', password='x')
+
+    def test_only_a_hash_is_stored(self):
+        otp = generate_email_otp(self.user)
+        self.assertRegex(otp.code, r'^\d{6}$')
+        stored = EmailOTP.objects.get(pk=otp.pk)
+        self.assertNotIn(otp.code, stored.code_hash)
+        self.assertEqual(stored.code_hash, hash_otp_code(self.user.pk, otp.code))
+        # Bound to the user
+        self.assertNotEqual(hash_otp_code(self.user.pk, otp.code), hash_otp_code(self.other.pk, otp.code))
+
+    def test_code_is_accepted_once_in_one_query(self):
+        otp = generate_email_otp(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(validate_email_otp(self.user, otp.code))
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(validate_email_otp(self.user, otp.code))
+
+    def test_wrong_user_or_code_rejected(self):
+        otp = generate_email_otp(self.user)
+        wrong = '000000' if otp.code != '000000' else '111111'
+        self.assertFalse(validate_email_otp(self.user, wrong))
+        self.assertFalse(validate_email_otp(self.other, otp.code))
+        self.assertTrue(validate_email_otp(self.user, otp.code))
+
+    def test_expired_code_rejected(self):
+        otp = generate_email_otp(self.user)
+        EmailOTP.objects.filter(pk=otp.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(validate_email_otp(self.user, otp.code))
+
+    def test_new_code_replaces_earlier_ones(self):
+        first = generate_email_otp(self.user)
+        second = generate_email_otp(self.user)
+        self.assertTrue(EmailOTP.objects.get(pk=first.pk).is_used)
+        self.assertTrue(validate_email_otp(self.user, second.code))
+
+    def test_purge_expired_otps(self):
+        now = timezone.now()
+        used = generate_email_otp(self.user)
+        validate_email_otp(self.user, used.code)
+        expired = generate_email_otp(self.other)
+        EmailOTP.objects.filter(pk=expired.pk).update(expires_at=now - timedelta(minutes=1))
+        pending = generate_email_otp(self.user)
+
+        self.assertEqual(purge_expired_otps(batch_size=1), 2)
+        self.assertEqual(list(EmailOTP.objects.values_list('pk', flat=True)), [pending.pk])
+
+    def test_purge_command(self):
+        otp = generate_email_otp(self.user)
+        validate_email_otp(self.user, otp.code)
+        stdout = StringIO()
+        call_command('purge_expired_otps', stdout=stdout)
+        self.assertIn('Deleted 1 email OTPs', stdout.getvalue())
+        self.assertFalse(EmailOTP.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, RATELIMIT_ENABLE=False)
+class EmailOTPSetupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='x', is_email_verified=True)
+        self.client.force_login(self.user)
+
+    def sent_code(self):
+        return re.search(r'>(\d{6})</span>', mail.outbox[-1].body).group(1)
+
+    def test_setup_with_emailed_code(self):
+        self.client.get(reverse('twofactor:request_email_otp'))
+        self.assertEqual(len(mail.outbox), 1)
+        code = self.sent_code()
+        self.assertEqual(EmailOTP.objects.get(user=self.user).code_hash, hash_otp_code(self.user.pk, code))
+
+        response = self.client.post(reverse('twofactor:verify_email_otp'), {'code': code})
+        self.assertRedirects(response, reverse('twofactor:security_settings'), fetch_redirect_response=False)
+        settings = UserTwoFactorSettings.objects.get(user=self.user)
+        self.assertTrue(settings.is_enabled)
+        self.assertEqual(settings.method, 'email')
+
+    def test_wrong_code_does_not_enable(self):
+        self.client.get(reverse('twofactor:request_email_otp'))
+        wrong = '000000' if self.sent_code() != '000000' else '111111'
+        response = self.client.post(reverse('twofactor:verify_email_otp'), {'code': wrong})
+        self.assertRedirects(response, reverse('twofactor:request_email_otp'), fetch_redirect_response=False)
+        self.assertFalse(UserTwoFactorSettings.objects.filter(user=self.user, is_enabled=True).exists())
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    RATELIMIT_BACKEND='core.ratelimit.InMemoryRateLimitBackend',
+    RATELIMIT_ENABLE=True,
+)
+class OTPRateLimitTests(TestCase):
+    def setUp(self):
+        ratelimit._backend = None
+        self.addCleanup(setattr, ratelimit, '_backend', None)
+        self.user = User.objects.create_user(email='user@example.com', password='x', is_email_verified=True)
+        self.client.force_login(self.user)
+
+    def test_code_guessing_is_throttled_per_user(self):
+        url = reverse('twofactor:verify_email_otp')
+        for i in range(5):
+            response = self.client.post(url, {'code': '000000'}, REMOTE_ADDR=f'10.0.0.{i}')
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.post(url, {'code': '000000'}, REMOTE_ADDR='10.0.1.1').status_code, 429)
+
+    def test_sending_codes_is_throttled(self):
+        url = reverse('twofactor:request_email_otp')
+        for _ in range(5):
+            self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertEqual(self.client.get(url).status_code, 429)
+        self.assertEqual(len(mail.outbox), 5)
+
+
+class QRCodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.uri = get_totp_uri(pyotp.random_base32(), 'user@example.com')
+
+    def test_png_and_svg(self):
+        self.assertTrue(generate_qr_code(self.uri).startswith(b'\x89PNG\r\n\x1a\n'))
+        self.assertIn(b'<svg', generate_qr_code(self.uri, 'svg'))
+
+    def test_render_is_cached(self):
+        first = generate_qr_code(self.uri)
+        with mock.patch.object(utils.qrcode, 'QRCode') as qr:
+            self.assertEqual(generate_qr_code(self.uri), first)
+        qr.assert_not_called()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, RATELIMIT_ENABLE=False)
+class TOTPSetupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='x', is_email_verified=True)
+        self.client.force_login(self.user)
+
+    def start_setup(self):
+        response = self.client.post(reverse('twofactor:setup_2fa'), {'method': 'totp'})
+        self.assertRedirects(response, reverse('twofactor:setup_totp'), fetch_redirect_response=False)
+        return self.client.session['2fa_setup_secret']
+
+    def test_qr_code_needs_setup_secret(self):
+        self.assertEqual(self.client.get(reverse('twofactor:qr_code')).status_code, 404)
+
+    def test_qr_code_served_from_session_secret(self):
+        self.start_setup()
+        response = self.client.get(reverse('twofactor:qr_code'))
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('no-store', response['Cache-Control'])
+        response = self.client.get(reverse('twofactor:qr_code'), {'format': 'svg'})
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertEqual(self.client.get(reverse('twofactor:qr_code'), {'format': 'gif'}).status_code, 404)
+
+    def test_setup_with_authenticator_code(self):
+        secret = self.start_setup()
+        response = self.client.post(reverse('twofactor:setup_totp'), {'code': pyotp.TOTP(secret).now()})
+        self.assertRedirects(response, reverse('twofactor:security_settings'), fetch_redirect_response=False)
+        settings = UserTwoFactorSettings.objects.get(user=self.user)
+        self.assertTrue(settings.is_enabled)
+        self.assertEqual(settings.totp_secret, secret)
+        self.assertNotIn('2fa_setup_secret', self.client.session)
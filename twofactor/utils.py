@@ -1,13 +1,18 @@
-import os
+import hashlib
+import io
 import pyotp
 import qrcode
+import qrcode.image.svg
 import random
+import secrets
 import string
-import tempfile
 from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import EmailMessage
+from django.db import models
+from django.utils.crypto import salted_hmac
 from django.template.loader import render_to_string
 from .models import EmailOTP
 
@@ -23,10 +28,23 @@ def get_totp_uri(secret, email, issuer="YourApp"):
     """
     return pyotp.totp.TOTP(secret).provisioning_uri(name=email, issuer_name=issuer)
 
-def generate_qr_code(totp_uri):
+QR_CODE_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+def generate_qr_code(totp_uri, image_format='png'):
     """
-    Generate a QR code image for the TOTP URI and return the file path.
+    Render a QR code for the TOTP URI in memory and return its bytes.
+
+    Renders are cached briefly under a hash of the URI, so page reloads
+    during setup don't redraw it and any app server can answer.
     """
+    cache_key = f"twofactor:qr:{image_format}:{hashlib.sha256(totp_uri.encode()).hexdigest()}"
+    data = cache.get(cache_key)
+    if data is not None:
+        return data
+
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -36,16 +54,17 @@ def generate_qr_code(totp_uri):
     qr.add_data(totp_uri)
     qr.make(fit=True)
     
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Create a temporary file
-    fd, filepath = tempfile.mkstemp(suffix='.png')
-    os.close(fd)
+    if image_format == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
     
-    # Save the image to the temporary file
-    img.save(filepath)
+    buffer = io.BytesIO()
+    img.save(buffer)
+    data = buffer.getvalue()
     
-    return filepath
+    cache.set(cache_key, data, getattr(settings, 'TWO_FACTOR_QR_CODE_CACHE_SECONDS', 300))
+    return data
 
 def verify_totp_code(secret, code):
     """
@@ -64,22 +83,37 @@ def generate_backup_codes(count=8):
         codes.append(code)
     return codes
 
+def hash_otp_code(user_id, code):
+    """
+    HMAC of an email OTP code, bound to the user so equal codes issued to
+    different users don't share a hash.
+    """
+    return salted_hmac('twofactor.EmailOTP', f'{user_id}:{code}', algorithm='sha256').hexdigest()
+
 def generate_email_otp(user, expiry_minutes=10):
     """
-    Generate a new email OTP for the user.
+    Generate a new email OTP for the user, replacing any earlier ones.
+
+    The plain code is only available as ``otp.code`` on the returned object,
+    for sending; the database keeps its hash.
     """
     # Generate a 6-digit code
-    code = ''.join(random.choices(string.digits, k=6))
+    code = ''.join(secrets.choice(string.digits) for _ in range(6))
     
     # Calculate expiry time
-    expires_at = timezone.now() + timedelta(minutes=expiry_minutes)
+    now = timezone.now()
+    expires_at = now + timedelta(minutes=expiry_minutes)
+    
+    # Only the newest code is accepted
+    EmailOTP.objects.filter(user=user, is_used=False, expires_at__gt=now).update(is_used=True)
     
     # Create and save the OTP
     otp = EmailOTP.objects.create(
         user=user,
-        code=code,
+        code_hash=hash_otp_code(user.pk, code),
         expires_at=expires_at
     )
+    otp.code = code
     
     return otp
 
@@ -102,19 +136,28 @@ def send_otp_email(user, otp):
 
 def validate_email_otp(user, code):
     """
-    Validate an email OTP code.
-    """
-    try:
-        # Get the latest unused OTP for the user
-        otp = EmailOTP.objects.filter(
-            user=user,
-            is_used=False,
-            expires_at__gt=timezone.now()
-        ).latest('created_at')
-        
-        if otp.code == code:
-            otp.mark_as_used()
-            return True
-        return False
-    except EmailOTP.DoesNotExist:
-        return False
\ No newline at end of file
+    Validate an email OTP code, consuming it.
+
+    A single conditional UPDATE both checks and marks the code, so it is one
+    query and a code can't be used twice by concurrent requests.
+    """
+    return EmailOTP.objects.filter(
+        user=user,
+        is_used=False,
+        expires_at__gt=timezone.now(),
+        code_hash=hash_otp_code(user.pk, code),
+    ).update(is_used=True) == 1
+
+def purge_expired_otps(before=None, batch_size=1000):
+    """
+    Delete used and expired email OTPs in batches of ``batch_size`` rows,
+    keeping each delete short. Returns the number of rows deleted.
+    """
+    before = before or timezone.now()
+    stale = EmailOTP.objects.filter(models.Q(expires_at__lte=before) | models.Q(is_used=True))
+    deleted = 0
+    while True:
+        ids = list(stale.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += EmailOTP.objects.filter(pk__in=ids).delete()[0]
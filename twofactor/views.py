@@ -1,4 +1,3 @@
-import os
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -6,13 +5,15 @@ from django.http import HttpResponse, Http404
 from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.http import require_POST
-# from ratelimit.decorators import ratelimit
+from accounts.sessions import active_sessions, revoke_sessions
+from core.ratelimit import ratelimit
 
 from .models import UserTwoFactorSettings, EmailOTP
 from .forms import TwoFactorSetupForm, TOTPVerificationForm, EmailOTPVerificationForm, DisableTwoFactorForm
 from .utils import (
     generate_totp_secret, get_totp_uri, generate_qr_code, verify_totp_code,
-    generate_backup_codes, generate_email_otp, send_otp_email, validate_email_otp
+    generate_backup_codes, generate_email_otp, send_otp_email, validate_email_otp,
+    QR_CODE_FORMATS,
 )
 
 @login_required
@@ -25,6 +26,8 @@ def security_settings(request):
     
     context = {
         'two_factor_settings': two_factor_settings,
+        'user_sessions': active_sessions(request.user),
+        'current_session_key': request.session.session_key,
     }
     
     return render(request, 'twofactor/security_settings.html', context)
@@ -55,13 +58,6 @@ def setup_2fa(request):
                 secret = generate_totp_secret()
                 request.session['2fa_setup_secret'] = secret
                 
-                # Generate QR code
-                totp_uri = get_totp_uri(secret, request.user.email)
-                qr_code_path = generate_qr_code(totp_uri)
-                
-                # Store the QR code path in the session
-                request.session['2fa_qr_code_path'] = qr_code_path
-                
                 return redirect('twofactor:setup_totp')
             elif method == 'email':
                 # Generate and send OTP
@@ -80,22 +76,17 @@ def setup_2fa(request):
     return render(request, 'twofactor/setup_2fa.html', context)
 
 @login_required
+@ratelimit('otp_verify', key='user', rate='5/5m')
 def setup_totp(request):
     """
     View for setting up TOTP-based 2FA.
     """
     # Check if we have the necessary session data
-    if '2fa_setup_secret' not in request.session or '2fa_qr_code_path' not in request.session:
+    if '2fa_setup_secret' not in request.session:
         messages.error(request, "Setup session expired. Please start again.")
         return redirect('twofactor:setup_2fa')
     
     secret = request.session['2fa_setup_secret']
-    qr_code_path = request.session['2fa_qr_code_path']
-    
-    # Check if the QR code file exists
-    if not os.path.exists(qr_code_path):
-        messages.error(request, "QR code not found. Please try again.")
-        return redirect('twofactor:setup_2fa')
     
     if request.method == 'POST':
         form = TOTPVerificationForm(request.POST)
@@ -119,15 +110,6 @@ def setup_totp(request):
                 if '2fa_setup_secret' in request.session:
                     del request.session['2fa_setup_secret']
                 
-                # Delete the QR code file
-                try:
-                    os.remove(qr_code_path)
-                except OSError:
-                    pass  # Ignore errors
-                
-                if '2fa_qr_code_path' in request.session:
-                    del request.session['2fa_qr_code_path']
-                
                 messages.success(request, "Two-factor authentication has been enabled successfully.")
                 return redirect('twofactor:security_settings')
             else:
@@ -146,20 +128,25 @@ def setup_totp(request):
 @login_required
 def qr_code(request):
     """
-    View for serving the QR code image.
+    View for serving the QR code image, rendered from the setup secret in
+    the session. Pass ?format=svg for a vector image.
     """
-    if '2fa_qr_code_path' not in request.session:
+    secret = request.session.get('2fa_setup_secret')
+    if not secret:
         raise Http404("QR code not found")
     
-    qr_code_path = request.session['2fa_qr_code_path']
+    image_format = request.GET.get('format', 'png')
+    if image_format not in QR_CODE_FORMATS:
+        raise Http404("Unsupported QR code format")
     
-    if not os.path.exists(qr_code_path):
-        raise Http404("QR code not found")
-    
-    with open(qr_code_path, 'rb') as f:
-        return HttpResponse(f.read(), content_type='image/png')
+    totp_uri = get_totp_uri(secret, request.user.email)
+    response = HttpResponse(generate_qr_code(totp_uri, image_format), content_type=QR_CODE_FORMATS[image_format])
+    # The image encodes the secret; keep it out of shared and browser caches
+    response['Cache-Control'] = 'no-store, private'
+    return response
 
 @login_required
+@ratelimit('otp_verify', key='user', rate='5/5m')
 def verify_email_otp(request):
     """
     View for verifying email OTP during setup.
@@ -196,6 +183,7 @@ def verify_email_otp(request):
     return render(request, 'twofactor/verify_email_otp.html', context)
 
 @login_required
+@ratelimit('otp_send', key='user', rate='5/15m', method=None)
 def request_email_otp(request):
     """
     View for requesting a new email OTP.
@@ -208,6 +196,7 @@ def request_email_otp(request):
     return redirect('twofactor:verify_email_otp')
 
 @login_required
+@ratelimit('otp_verify', key='user', rate='5/5m')
 def verify_2fa(request):
     """
     View for verifying 2FA during login.
@@ -297,6 +286,7 @@ def verify_2fa(request):
         return render(request, 'twofactor/verify_2fa.html', context)
 
 @login_required
+@ratelimit('otp_send', key='user', rate='5/15m', method=None)
 def request_verification_otp(request):
     """
     View for requesting a new email OTP during verification.
@@ -326,6 +316,9 @@ def disable_2fa(request):
             two_factor_settings.backup_codes = []
             two_factor_settings.save()
             
+            # A stolen session must not outlive the second factor
+            revoke_sessions(request.user, keep=request.session.session_key)
+            
             messages.success(request, "Two-factor authentication has been disabled.")
             return redirect('twofactor:security_settings')
     else:
@@ -394,13 +387,6 @@ def change_2fa_method(request):
                 secret = generate_totp_secret()
                 request.session['2fa_setup_secret'] = secret
                 
-                # Generate QR code
-                totp_uri = get_totp_uri(secret, request.user.email)
-                qr_code_path = generate_qr_code(totp_uri)
-                
-                # Store the QR code path in the session
-                request.session['2fa_qr_code_path'] = qr_code_path
-                
                 return redirect('twofactor:setup_totp')
             elif method == 'email':
                 # Generate and send OTP